@@ -9,7 +9,8 @@ a = Analysis(
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
-    runtime_hooks=[],
+    # Only active with DOCUMENT_FORMS_STARTUP_PROBE set, see benchmarks/bench_startup.py
+    runtime_hooks=['benchmarks/startup_probe.py'],
     excludes=[],
     noarchive=False,
 )
@@ -0,0 +1,242 @@
+from typing import List, Dict, Tuple, Any
+
+from form_template import FormTemplate
+from image_export import map_paragraphs, normalize
+
+import os
+import re
+
+
+class AcroForm:
+    """
+    A fillable PDF (AcroForm) of a form template: the PDF of the document with a text field or checkbox
+    widget over every field found on its pages, named 'f<field index>'.
+
+    It is built once per template (see build) and filled by writing the values straight into the widgets,
+    so a filled PDF takes milliseconds and needs no word processor. The widgets start with the original
+    values of the document, so only the changed fields are written.
+
+    Fields are found by searching their original text on the pages their paragraph lands on
+    (see image_export.map_paragraphs). Fields whose text is not found have no widget and are listed in missing.
+    Widgets the document already had are kept and never filled, see field_index.
+    """
+    PREFIX = 'f'
+    KEYWORDS = 'document-forms:'
+
+    def __init__(self, data: bytes, source_hash: str = '', missing: List[int] = None):
+        self.data: bytes = data
+        self.source_hash: str = source_hash
+        self.missing: List[int] = missing or []
+
+    @classmethod
+    def build(cls, pdf_path: str | bytes, template: FormTemplate, path: str = '') -> 'AcroForm':
+        """
+        Adds the widgets of the template fields to the PDF of the document.
+
+        Parameters:
+        ----------
+        - pdf_path (str | bytes): The PDF of the unfilled document, or its bytes.
+        - template (FormTemplate): The compiled form of the document.
+        - path (str): Where the fillable PDF is saved for the next time, see load. Not saved by default.
+        """
+        import fitz
+
+        with (fitz.open(stream=pdf_path, filetype='pdf') if isinstance(pdf_path, bytes) else fitz.open(pdf_path)) as document:
+            for page in document:
+                for item in page.widgets():
+                    # A widget of the document named like ours would be filled with the value of a field
+                    if cls.field_index(item.field_name) is not None:
+                        item.field_name = f'{item.field_name}-original'
+                        item.update()
+
+            rects = locate(document, template)
+
+            for field in template.fields:
+                if field['index'] not in rects:
+                    continue
+
+                page, rect = rects[field['index']]
+                document[page].add_widget(widget(field, rect))
+
+            document.set_metadata({**document.metadata, 'keywords': cls.KEYWORDS + template.source_hash})
+            data = document.tobytes(garbage=3, deflate=True)
+
+        acroform = cls(data=data, source_hash=template.source_hash, missing=[field['index'] for field in template.fields if field['index'] not in rects])
+
+        if path:
+            acroform.save(path)
+
+        return acroform
+
+    @classmethod
+    def load(cls, path: str, template: FormTemplate) -> 'AcroForm | None':
+        """ Loads a saved fillable PDF. Returns None if it does not exist or was built for another document. """
+        import fitz
+
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            with fitz.open(stream=data, filetype='pdf') as document:
+                keywords = document.metadata.get('keywords') or ''
+        except (OSError, RuntimeError, ValueError):
+            return None
+
+        if keywords != cls.KEYWORDS + template.source_hash:
+            return None
+
+        return cls(data=data, source_hash=template.source_hash)
+
+    @classmethod
+    def field_index(cls, name: str) -> int | None:
+        """ The field index of a widget named 'f<field index>', or None for any other widget. """
+        match = re.fullmatch(re.escape(cls.PREFIX) + r'(\d+)', name or '')
+        return int(match.group(1)) if match else None
+
+    def save(self, path: str) -> bool:
+        """ Saves the fillable PDF atomically. Returns False if it could not be written. """
+        temp = f'{path}.{os.getpid()}.tmp'
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(temp, 'wb') as file:
+                file.write(self.data)
+            os.replace(temp, path)
+            return True
+        except OSError:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            return False
+
+    def fill(self, values: Dict[int, Any], output_path: str = '') -> bytes:
+        """
+        Writes values, by field index, into the widgets and returns the filled PDF, also saved in output_path when given.
+        Checkboxes take bools, text fields strings. Fields without a value keep the original one.
+        """
+        import fitz
+
+        with fitz.open(stream=self.data, filetype='pdf') as document:
+            for page in document:
+                for item in page.widgets():
+                    index = self.field_index(item.field_name)
+
+                    if index is None or index not in values or values[index] is None:
+                        continue
+
+                    if item.field_type == fitz.PDF_WIDGET_TYPE_CHECKBOX:
+                        item.field_value = bool(values[index])
+                    else:
+                        item.field_value = display_text(str(values[index]))
+                    item.update()
+
+            data = document.tobytes(deflate=True)
+
+        if output_path:
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+            with open(output_path, 'wb') as file:
+                file.write(data)
+
+        return data
+
+
+def display_text(text: str) -> str:
+    """ The text a widget shows for a field text: without the ':' before values and the '_' of blanks. """
+    return re.sub(r'_{2,}', '', text.lstrip(':')).strip()
+
+
+def search_text(field: Dict[str, Any]) -> str:
+    """ The text of a field searched on the page: the value itself, without the ':' before it. """
+    if field['kind'] == '@CB':
+        return field['value'].strip()
+    return field['value'].lstrip(':').strip()
+
+
+def locate(document, template: FormTemplate) -> Dict[int, Tuple[int, Any]]:
+    """
+    Finds the page and rectangle of every field of the template in the PDF.
+
+    Fields with a box on the page (templates compiled from the PDF) are placed there. The others are
+    searched in document order on the pages of their paragraph, and each match is used once,
+    so repeated texts like '____' go to consecutive fields. Empty fields after a ':' are placed right after
+    their label.
+
+    Returns:
+    -------
+    - Dict[int, Tuple[int, fitz.Rect]]: The page index and rectangle of each found field, by field index.
+    """
+    import fitz
+
+    texts = [normalize(page.get_text()) for page in document]
+    pages_of = map_paragraphs([paragraph['text'] for paragraph in template.paragraphs], texts)
+    found: Dict[Tuple[int, str], List] = {}
+    used: Dict[Tuple[int, str], int] = {}
+    rects = {}
+
+    for field in template.fields:
+        if 'rect' in field:
+            # Forms compiled from the PDF already know where their fields are, see pdf_form.field_box
+            rect = fitz.Rect(field['rect'])
+            if field['kind'] == '@TF' and rect.width < 60:
+                rect.x1 = rect.x0 + 60
+            rects[field['index']] = (field['page'], rect)
+            continue
+
+        needle = search_text(field)
+        after_label = not needle and bool(field['label'])
+
+        if after_label:
+            # ':    ' fields have no text of their own, the widget goes after '<label>:'
+            needle = field['label'] + ':'
+
+        if not needle:
+            continue
+
+        for page in pages_of[field['row']]:
+            if (page, needle) not in found:
+                found[(page, needle)] = document[page].search_for(needle)
+
+            hits = found[(page, needle)]
+            count = used.get((page, needle), 0)
+
+            if count >= len(hits):
+                continue
+
+            used[(page, needle)] = count + 1
+            rect = hits[count]
+
+            if after_label:
+                rect = fitz.Rect(rect.x1 + 2, rect.y0, rect.x1 + 122, rect.y1)
+            elif field['kind'] == '@TF' and rect.width < 60:
+                rect = fitz.Rect(rect.x0, rect.y0, rect.x0 + 60, rect.y1)
+
+            rects[field['index']] = (page, rect)
+            break
+
+    return rects
+
+
+def widget(field: Dict[str, Any], rect) -> Any:
+    """ The widget of a field, showing its original value. Widgets over text hide it with a white background. """
+    import fitz
+
+    item = fitz.Widget()
+    item.field_name = f"{AcroForm.PREFIX}{field['index']}"
+    item.rect = rect
+    item.border_width = 0
+
+    if field['kind'] == '@CB':
+        item.field_type = fitz.PDF_WIDGET_TYPE_CHECKBOX
+        item.field_value = 'x' in field['value'].lower()
+        item.fill_color = (1, 1, 1)
+        return item
+
+    item.field_type = fitz.PDF_WIDGET_TYPE_TEXT
+    item.field_value = display_text(field['value'])
+    item.text_fontsize = 0
+
+    # Blanks stay visible under the typed text, like writing on a line
+    if item.field_value:
+        item.fill_color = (1, 1, 1)
+
+    return item
@@ -0,0 +1,58 @@
+from typing import List, Dict, Any
+
+import json
+import os
+import re
+
+
+class ProfileStore:
+    """
+    Autofill profiles, saved as one JSON file per profile in folder.
+
+    A profile maps field keys, usually labels like "nome" or "cpf" (see form_fields.FieldStore), to values,
+    so the same profile fills every form with fields of the same labels.
+    """
+    EXT = '.profile.json'
+
+    def __init__(self, folder: str = './_internal/.profiles/'):
+        self.folder: str = os.path.abspath(folder)
+
+    def path(self, name: str) -> str:
+        # Only the characters allowed in file names on Windows
+        return os.path.join(self.folder, re.sub(r'[<>:"/\\|?*\x00-\x1f]', '_', name.strip()) + self.EXT)
+
+    def names(self) -> List[str]:
+        try:
+            files = os.listdir(self.folder)
+        except OSError:
+            return []
+
+        return sorted(file[:-len(self.EXT)] for file in files if file.endswith(self.EXT))
+
+    def load(self, name: str) -> Dict[str, Any]:
+        """ Returns the values of a profile, or an empty profile if it does not exist or is not valid. """
+        try:
+            with open(self.path(name), encoding='utf-8') as file:
+                record = json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+        return record if isinstance(record, dict) else {}
+
+    def save(self, name: str, record: Dict[str, Any]) -> str:
+        """ Saves a profile atomically, replacing the one with the same name. Returns its path. """
+        path = self.path(name)
+        temp = f'{path}.{os.getpid()}.tmp'
+        os.makedirs(self.folder, exist_ok=True)
+
+        with open(temp, 'w', encoding='utf-8') as file:
+            json.dump(record, file, ensure_ascii=False, indent=2)
+        os.replace(temp, path)
+
+        return path
+
+    def delete(self, name: str) -> None:
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,250 @@
+"""
+Fills a form template for every record of a CSV or JSONL file, without the user interface.
+
+The template is parsed once and the records are streamed to a pool of worker processes. Every record
+is saved as a Word file (and optionally as PDF and images) and gets a line in the report.
+With --acroform every record is saved as a filled fillable PDF instead, without converting anything
+per record (see acroform.AcroForm).
+
+Record keys are field labels, the text just before a field (e.g. "Nome" for "Nome: ____"),
+"label#2" for the second field with the same label, or the field position starting from 0.
+
+Usage:
+-----
+    python batch_fill.py template.docx records.csv -o filled/ [--pdf] [--images] [--workers 8]
+    python batch_fill.py template.docx records.csv --images --image-format jpeg --dpi 150 --grayscale
+    python batch_fill.py template.pdf records.csv --acroform
+"""
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing.util import Finalize
+from typing import List, Tuple, Dict, Set, Iterator, Any
+
+from document_manager import DocumentManager
+from acroform import AcroForm
+from conversion_backend import create_backend
+from form_template import FormTemplate
+from form_fields import FieldStore
+from render_profile import RenderProfile
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import tempfile
+
+
+# State of each worker process, set once by init_worker
+_template: Dict[str, Any] = {}
+
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """ Streams the records of a .csv or .jsonl file. """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8-sig') as file:
+            yield from csv.DictReader(file)
+    else:
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def init_worker(word_path: str, template: FormTemplate, options: Dict[str, Any]) -> None:
+    _template['word_path'] = word_path
+    _template['template'] = template
+    _template['store'] = FieldStore.build(template.rows)
+    _template['options'] = options
+
+    if not options['acroform'] and (options['pdf'] or options['images']):
+        # The worker is already a separate process, so it keeps its own warm converter until the pool
+        # shuts it down. Pool workers skip atexit when forked, multiprocessing finalizers always run
+        DocumentManager.backend = create_backend(pool=False)
+        Finalize(None, DocumentManager.close_backend, exitpriority=10)
+
+
+def output_name(number: int, record: Dict[str, Any], options: Dict[str, Any], used: Set[str]) -> str:
+    """
+    The file name of a record, without extension: the value of its name field or <base name>-<number>.
+
+    Record values are made safe as file names, with the characters not allowed on Windows replaced and
+    no leading or trailing dots, so a name like '../x' stays in the output folder. A name already used
+    by another record (ignoring case) gets a '-<n>' suffix. Names are given before the records are
+    submitted, so the workers never write the same file.
+    """
+    name_field = options['name_field']
+    fallback = f"{options['base_name']}-{number:05d}"
+    name = str(record.get(name_field) or '') if name_field else fallback
+    name = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '_', name.strip()).strip(' .') or fallback
+    unique, count = name, 1
+
+    while unique.lower() in used:
+        count += 1
+        unique = f'{name}-{count}'
+
+    used.add(unique.lower())
+    return unique
+
+
+def fill_record(number: int, record: Dict[str, Any], file_name: str) -> Tuple[int, str]:
+    """
+    Fills and saves one record in a worker process, as file_name (see output_name).
+
+    Returns:
+    -------
+    - Tuple[int, str]: The record number and the path of the saved Word file.
+    """
+    options = _template['options']
+    store = _template['store']
+    values, unknown = store.resolve(record)
+
+    if unknown and options['strict']:
+        raise KeyError(f'Campo desconhecido: {unknown[0]}')
+
+    template = _template['template']
+    store.reset()
+    store.set(values)
+
+    if options['acroform']:
+        save_path = os.path.join(options['output_folder'], file_name + '.pdf')
+        AcroForm(options['acroform']).fill(store.changes(), output_path=save_path)
+        return number, save_path
+
+    dm = DocumentManager()
+    dm.word_path = _template['word_path']
+    dm.template = template
+    save_path = dm.save_changes(save_folder=options['output_folder'], paragraphs=store.paragraphs(), file_name=file_name)
+
+    if not options['pdf'] and not options['images']:
+        return number, save_path
+
+    dm.word_path = save_path
+    images_folder = os.path.join(options['output_folder'], file_name)
+
+    if options['pdf']:
+        dm.docx2pdf(output_folder=options['output_folder'], save_path=True)
+        if options['images']:
+            dm.pdf2images(output_folder=images_folder, profile=options['profile'])
+        return number, save_path
+
+    # Only the images were asked for, the PDF they are rendered from is removed with its temporary folder
+    with tempfile.TemporaryDirectory() as folder:
+        dm.docx2pdf(output_folder=folder, save_path=True)
+        dm.pdf2images(output_folder=images_folder, profile=options['profile'])
+
+    return number, save_path
+
+
+def prepare_template(template_path: str, output_folder: str) -> Tuple[str, FormTemplate]:
+    """
+    Parses the template once. A PDF template is converted to Word first.
+    The compiled form is saved next to the template, so later runs skip parsing it.
+
+    Returns:
+    -------
+    - Tuple[str, FormTemplate]: The Word template path and its compiled form.
+    """
+    dm = DocumentManager()
+    template_path = os.path.abspath(template_path)
+
+    if template_path.lower().endswith('.pdf'):
+        dm.pdf_path = template_path
+        dm.pdf2docx(output_folder=os.path.join(output_folder, '.template'), save_path=True)
+    else:
+        dm.word_path = template_path
+
+    return dm.word_path, dm.load_template(source_path=template_path)
+
+
+def prepare_acroform(template_path: str, word_path: str, template: FormTemplate, output_folder: str) -> AcroForm:
+    """ Builds the fillable PDF of the template once. A Word template is converted to PDF first. """
+    dm = DocumentManager()
+    template_path = os.path.abspath(template_path)
+
+    if template_path.lower().endswith('.pdf'):
+        dm.pdf_path = template_path
+    else:
+        dm.word_path = word_path
+        dm.docx2pdf(output_folder=os.path.join(output_folder, '.template'), save_path=True)
+
+    acroform = AcroForm.build(dm.pdf_path, template)
+
+    if acroform.missing:
+        print(f'{len(acroform.missing)} campo(s) não encontrado(s) no PDF mantêm o valor original.')
+
+    return acroform
+
+
+def run(args: argparse.Namespace) -> int:
+    output_folder = os.path.abspath(args.output)
+    os.makedirs(output_folder, exist_ok=True)
+
+    word_path, template = prepare_template(args.template, output_folder)
+    options = {
+        'output_folder': output_folder,
+        'base_name': DocumentManager.file_info(args.template)['base_name'],
+        'name_field': args.name_field,
+        'pdf': args.pdf,
+        'images': args.images,
+        'strict': args.strict,
+        'acroform': prepare_acroform(args.template, word_path, template, output_folder).data if args.acroform else b'',
+        # Records are already filled in parallel, so each one renders its pages in a single thread
+        'profile': RenderProfile(dpi=args.dpi, fmt=args.image_format, grayscale=args.grayscale, quality=args.quality, workers=1),
+    }
+    report_path = args.report or os.path.join(output_folder, 'report.csv')
+    failures = 0
+
+    with open(report_path, 'w', newline='', encoding='utf-8') as report_file, \
+            ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(word_path, template, options)) as pool:
+        report = csv.writer(report_file)
+        report.writerow(['record', 'status', 'output', 'error'])
+        pending = {}
+        used = set()
+
+        def collect(futures) -> None:
+            nonlocal failures
+            for future in futures:
+                number = pending.pop(future)
+                try:
+                    _, save_path = future.result()
+                    report.writerow([number, 'ok', save_path, ''])
+                except Exception as error:
+                    failures += 1
+                    report.writerow([number, 'error', '', repr(error)])
+
+        # Only a few records per worker are in flight, so the input is never fully loaded
+        for number, record in enumerate(iter_records(args.records), start=1):
+            pending[pool.submit(fill_record, number, record, output_name(number, record, options, used))] = number
+
+            if len(pending) >= args.workers * 4:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        collect(list(pending))
+
+    print(f'{failures} falha(s). Relatório: {report_path}')
+    return 1 if failures else 0
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('template', help='.docx or .pdf form template')
+    parser.add_argument('records', help='.csv or .jsonl file with one record per line')
+    parser.add_argument('-o', '--output', default='filled', help='output folder')
+    parser.add_argument('--pdf', action='store_true', help='also save every record as PDF')
+    parser.add_argument('--images', action='store_true', help='also save the pages of every record as PNG')
+    parser.add_argument('--dpi', type=int, default=200, help='resolution of the images')
+    parser.add_argument('--image-format', default='png', choices=list(RenderProfile.FORMATS), help='format of the images')
+    parser.add_argument('--quality', type=int, default=90, help='JPEG and WebP quality, from 1 to 100')
+    parser.add_argument('--grayscale', action='store_true', help='render the images in shades of gray')
+    parser.add_argument('--acroform', action='store_true', help='save every record as a filled fillable PDF instead of Word')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--name-field', default='', help='record key used as output file name')
+    parser.add_argument('--report', default='', help='report path, the default is <output>/report.csv')
+    parser.add_argument('--strict', action='store_true', help='fail records with keys that match no field')
+    return run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
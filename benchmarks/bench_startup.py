@@ -0,0 +1,125 @@
+"""
+Measures the startup of the app: the import of components and the time until the window is shown.
+
+Benchmarks:
+----------
+- import_components: importing components in a new interpreter, with the heavy modules it loaded.
+- time_to_window: from launching the app to main.main returning, with Main added to the page. main.py is run
+  with startup_probe.py loaded first, which records the time and closes the window when
+  DOCUMENT_FORMS_STARTUP_PROBE is set, so the app itself has no benchmark hook.
+  With --exe, the bundled build of "Document Forms.spec" is launched instead, which has startup_probe.py
+  as a runtime hook.
+
+The time to window needs a display. Each launch is closed as soon as the window is shown.
+
+Usage:
+-----
+    python benchmarks/bench_startup.py [--repeat 5]
+    pyinstaller "Document Forms.spec" && python benchmarks/bench_startup.py --exe "dist/Document Forms/Document Forms.exe"
+"""
+from typing import List, Dict, Any
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+HEAVY_MODULES = ['pdf2docx', 'pdf2image', 'fitz', 'cv2', 'numpy', 'PIL', 'docx2pdf', 'pythoncom']
+
+IMPORT_SCRIPT = f'''
+import json, sys, time
+start = time.perf_counter()
+import components
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {HEAVY_MODULES!r} if name in sys.modules]}}))
+'''
+
+# Runs main.py with the startup probe loaded first, like the runtime hook of the bundled build
+WINDOW_SCRIPT = '''
+import runpy, sys
+sys.path.insert(0, "benchmarks")
+import startup_probe
+runpy.run_path("main.py", run_name="__main__")
+'''
+
+
+def import_components() -> Dict[str, Any]:
+    result = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def time_to_window(command: List[str], timeout: float) -> float:
+    """ Launches the app with DOCUMENT_FORMS_STARTUP_PROBE and returns the seconds until the window was shown. """
+    with tempfile.TemporaryDirectory() as folder:
+        probe = os.path.join(folder, 'probe.txt')
+        env = {**os.environ, 'DOCUMENT_FORMS_STARTUP_PROBE': probe}
+        # The bundled build runs from its folder, main.py from the repository
+        cwd = ROOT if command[0] == sys.executable else os.path.dirname(command[0])
+        start = time.time()
+        process = subprocess.Popen(command, cwd=cwd, env=env)
+
+        try:
+            while not os.path.isfile(probe) or not os.path.getsize(probe):
+                if time.time() - start > timeout:
+                    raise TimeoutError(f'The window was not shown in {timeout} s')
+                if process.poll() is not None and not os.path.isfile(probe):
+                    raise RuntimeError(f'The app exited with {process.returncode} before showing the window')
+                time.sleep(0.01)
+
+            with open(probe) as file:
+                shown = float(file.read())
+        finally:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    return shown - start
+
+
+def summarize(name: str, runs: List[float]) -> Dict[str, Any]:
+    print(f'{name:<20} {min(runs) * 1000:10.1f} ms  (median {statistics.median(runs) * 1000:.1f} ms)')
+    return {'status': 'ok', 'min': min(runs), 'median': statistics.median(runs), 'runs': runs}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--exe', default='', help='bundled executable to launch instead of main.py')
+    parser.add_argument('--timeout', type=float, default=60, help='seconds to wait for each window')
+    parser.add_argument('--skip-window', action='store_true', help='only measure the import, e.g. without a display')
+    parser.add_argument('--output', default='', help='results file')
+    args = parser.parse_args()
+
+    imports = [import_components() for _ in range(args.repeat)]
+    results = {'import_components': summarize('import_components', [run['seconds'] for run in imports])}
+    results['import_components']['loaded'] = imports[-1]['loaded']
+
+    if imports[-1]['loaded']:
+        print(f'{"":<20} loaded at import: {", ".join(imports[-1]["loaded"])}')
+
+    if not args.skip_window:
+        command = [os.path.abspath(args.exe)] if args.exe else [sys.executable, '-c', WINDOW_SCRIPT]
+
+        try:
+            results['time_to_window'] = summarize('time_to_window', [time_to_window(command, args.timeout) for _ in range(args.repeat)])
+            results['time_to_window']['command'] = args.exe or 'main.py'
+        except (OSError, RuntimeError, TimeoutError) as error:
+            results['time_to_window'] = {'status': 'skipped', 'reason': repr(error)}
+            print(f'{"time_to_window":<20} skipped: {error!r}')
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'benchmarks': results}, file, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+Measures the main document operations on synthetic forms (see synthetic.py) and compares the results
+with a previous run. Runs headless, without Word: docx2pdf is not measured.
+
+Benchmarks:
+----------
+- extract_form_rows: streaming the form rows of the Word file.
+- compile_template: compiling the FormTemplate of the Word file.
+- get_paragraphs: FormViewer.get_paragraphs with a tenth of the fields filled.
+- apply_profile: filling every labeled field of the form from an autofill profile.
+- save_changes_one: saving the form with a single changed field.
+- save_changes_all: saving the form with every field changed.
+- export_cached: exporting the Word file of a form state already exported, copied from the export cache.
+- pdf2docx: converting the synthetic PDF to Word.
+- pdf2images: rasterizing the synthetic PDF, needs poppler.
+
+A benchmark whose dependency is missing is recorded as skipped.
+
+Usage:
+-----
+    python benchmarks/bench_suite.py [--paragraphs 30000] [--pages 300] [--output results.json]
+    python benchmarks/bench_suite.py --baseline benchmarks/results/previous.json [--threshold 0.15]
+"""
+from typing import List, Dict, Callable, Any
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from synthetic import write_docx, write_pdf  # noqa: E402
+from document_manager import DocumentManager  # noqa: E402
+from form_template import FormTemplate  # noqa: E402
+from form_fields import iter_fields  # noqa: E402
+from export_cache import ExportCache  # noqa: E402
+
+VERSION = 1
+
+
+def measure(func: Callable[[], Any], repeat: int) -> List[float]:
+    runs = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+
+    return runs
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+    }
+
+
+def form_viewer(rows: List, values: Dict[int, Any]):
+    from components import FormViewer
+
+    viewer = FormViewer()
+    viewer.paragraphs = rows
+    viewer.setup_paragraphs()
+    viewer.store.set(values)
+    return viewer
+
+
+def run_benchmarks(args: argparse.Namespace, folder: str) -> Dict[str, Dict[str, Any]]:
+    docx_path = write_docx(os.path.join(folder, 'form.docx'), args.pages, args.paragraphs, args.density)
+    pdf_path = os.path.join(folder, 'form.pdf')
+    template = FormTemplate.compile(docx_path)
+    rows = template.rows
+    fields = list(iter_fields(rows))
+    inputs = {
+        'file_size': os.path.getsize(docx_path),
+        'pages': args.pages,
+        'paragraphs': len(rows),
+        'fields': len(fields),
+    }
+
+    dm = DocumentManager()
+    dm.word_path = docx_path
+    dm.template = template
+    dm.poppler_path = args.poppler_path or None
+
+    one = template.fill({fields[0].index: 'Maria'} if fields else {})
+    every = template.fill({field.index: True if field.kind.value == '@CB' else 'Maria' for field in fields})
+    output_folder = os.path.join(folder, 'output')
+
+    def get_paragraphs() -> Callable[[], Any]:
+        viewer = form_viewer(rows, {field.index: 'Maria' for field in fields[::10]})
+        return viewer.get_paragraphs
+
+    def apply_profile() -> Callable[[], Any]:
+        viewer = form_viewer(rows, {field.index: True if field.kind.value == '@CB' else 'Maria' for field in fields})
+        record = viewer.profile_record()
+        viewer.store.reset()
+        return lambda: viewer.apply_profile(record)
+
+    def export_cached() -> Callable[[], Any]:
+        dm.exports = ExportCache(folder=os.path.join(folder, 'exports'))
+
+        def run() -> None:
+            done = threading.Event()
+            errors = []
+            dm.save_job('docx', output_folder, paragraphs=one, on_done=lambda _: done.set(),
+                        on_error=lambda _, error: (errors.append(error), done.set()))
+            done.wait()
+            if errors:
+                raise errors[0]
+
+        return run
+
+    def pdf2docx() -> Callable[[], Any]:
+        write_pdf(pdf_path, args.pdf_pages, args.pdf_pages * 40, args.density)
+        pdf_dm = DocumentManager()
+        pdf_dm.pdf_path = pdf_path
+        return lambda: pdf_dm.pdf2docx(output_folder=output_folder)
+
+    def pdf2images() -> Callable[[], Any]:
+        if not os.path.isfile(pdf_path):
+            write_pdf(pdf_path, args.pdf_pages, args.pdf_pages * 40, args.density)
+        pdf_dm = DocumentManager()
+        pdf_dm.pdf_path = pdf_path
+        pdf_dm.poppler_path = dm.poppler_path
+        images_folder = os.path.join(folder, 'images')
+
+        def run() -> None:
+            pdf_dm.pdf2images(output_folder=images_folder)
+            shutil.rmtree(images_folder, ignore_errors=True)
+
+        return run
+
+    # Each entry builds the measured function, so missing dependencies are found before timing
+    benchmarks = {
+        'extract_form_rows': (lambda: dm.extract_form_rows, inputs),
+        'compile_template': (lambda: lambda: FormTemplate.compile(docx_path), inputs),
+        'get_paragraphs': (get_paragraphs, inputs),
+        'apply_profile': (apply_profile, inputs),
+        'save_changes_one': (lambda: lambda: dm.save_changes(save_folder=output_folder, paragraphs=one), {**inputs, 'changed': 1}),
+        'save_changes_all': (lambda: lambda: dm.save_changes(save_folder=output_folder, paragraphs=every), {**inputs, 'changed': len(fields)}),
+        'export_cached': (export_cached, {**inputs, 'changed': 1}),
+        'pdf2docx': (pdf2docx, {'pages': args.pdf_pages}),
+        'pdf2images': (pdf2images, {'pages': args.pdf_pages}),
+    }
+    results = {}
+
+    for name, (setup, benchmark_inputs) in benchmarks.items():
+        if args.only and name not in args.only:
+            continue
+
+        try:
+            func = setup()
+            func()
+            runs = measure(func, args.repeat)
+        except Exception as error:
+            results[name] = {'status': 'skipped', 'reason': repr(error)}
+            print(f'{name:<20} skipped: {error!r}')
+            continue
+
+        results[name] = {
+            'status': 'ok',
+            'min': min(runs),
+            'median': statistics.median(runs),
+            'runs': runs,
+            'inputs': benchmark_inputs,
+        }
+        print(f'{name:<20} {min(runs) * 1000:10.1f} ms  (median {statistics.median(runs) * 1000:.1f} ms)')
+
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Compares the best run of each benchmark with the baseline results.
+
+    Returns:
+    -------
+    - List[str]: The benchmarks slower than the baseline by more than threshold (e.g. 0.15 for 15%).
+    """
+    regressions = []
+    print(f'\ncompared with {baseline.get("label", "")} ({baseline.get("environment", {}).get("commit", "")}):')
+
+    for name, result in results.items():
+        previous = baseline.get('benchmarks', {}).get(name, {})
+
+        if result['status'] != 'ok' or previous.get('status') != 'ok':
+            continue
+
+        ratio = result['min'] / previous['min'] if previous['min'] else 1.0
+        regression = ratio > 1 + threshold
+        print(f'{name:<20} {ratio:6.2f}x {"REGRESSION" if regression else ""}')
+
+        if regression:
+            regressions.append(name)
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--paragraphs', type=int, default=30000)
+    parser.add_argument('--density', type=float, default=0.3, help='fraction of paragraphs with fields')
+    parser.add_argument('--pdf-pages', type=int, default=10, help='pages of the PDF for pdf2docx and pdf2images')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='*', default=[], help='names of the benchmarks to run')
+    parser.add_argument('--poppler-path', default='', help='folder of the poppler binaries, the PATH by default')
+    parser.add_argument('--label', default='', help='name of this run in the results, the commit by default')
+    parser.add_argument('--output', default='', help='results file, the default is benchmarks/results/<label>.json')
+    parser.add_argument('--baseline', default='', help='results of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.15, help='slowdown flagged as a regression')
+    args = parser.parse_args()
+
+    # pdf2docx logs every page
+    logging.disable(logging.INFO)
+    folder = tempfile.mkdtemp(prefix='document-forms-bench-')
+
+    try:
+        results = run_benchmarks(args, folder)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    env = environment()
+    label = args.label or env['commit'] or datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', f'{label}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump({
+            'version': VERSION,
+            'label': label,
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'environment': env,
+            'parameters': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+            'benchmarks': results,
+        }, file, indent=2)
+
+    print(f'\nresults: {output}')
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.threshold)
+
+        if regressions:
+            print(f'{len(regressions)} regression(s): {", ".join(regressions)}')
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
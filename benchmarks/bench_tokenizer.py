@@ -0,0 +1,76 @@
+"""
+Compares the single-pass field tokenizer with the previous chain of re.sub passes.
+
+Usage:
+-----
+    python benchmarks/bench_tokenizer.py [--paragraphs 30000] [--repeat 5]
+"""
+from typing import List, Callable
+
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from form_tokenizer import tokenize, spans_to_parts  # noqa: E402
+
+
+SAMPLES = [
+    'Eu, ____________________, portador do CPF nº ______________, declaro que',
+    'Nome: João da Silva Pereira',
+    'Data de nascimento: 01/01/2000',
+    'Local e data: São Paulo, 01 de julho de 2004.',
+    'Estado civil: ( X ) solteiro (  ) casado ( ) divorciado',
+    'Endereço:     ',
+    'Cláusula 3ª - O CONTRATANTE se obriga a pagar o valor acordado até o quinto dia útil de cada mês.',
+    'Assinatura: _________________________________',
+    '',
+]
+
+
+def legacy_parts(text: str) -> List[str]:
+    """ The re.sub chain used by DocumentManager.extract_form_rows before the single-pass tokenizer. """
+    text = re.sub(r'_+', lambda match: "#SM" + match.group(0) + "@TF#SM", text)
+    text = re.sub(r':(\s\w+[^.]*(?!.)*)+', lambda match: "#SM" + match.group(0) + "@TF#SM", text)
+    text = re.sub(r'(:\s*(?!\s*\(|\s{0,1}\b|\s*#))', lambda match: "#SM" + match.group(1) + "@TF#SM", text)
+    text = re.sub(r'\d{2}/\d{2}/\d{4}', lambda match: "#SM" + match.group(0) + "@TF#SM", text)
+    text = re.sub(r'\d{2} de \w+ de (\d{4})', lambda match: "#SM" + match.group(0) + "@TF#SM", text)
+    text = re.sub(r'\(\s*(?:x\s*)?\)', '#SM@CB#SM', text, flags=re.IGNORECASE)
+    return text.split('#SM')
+
+
+def single_pass_parts(text: str) -> List[str]:
+    return spans_to_parts(tokenize(text))
+
+
+def generate_paragraphs(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(SAMPLES) for _ in range(count)]
+
+
+def measure(func: Callable[[str], List[str]], paragraphs: List[str], repeat: int) -> float:
+    return min(timeit.repeat(lambda: [func(text) for text in paragraphs], number=1, repeat=repeat))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--paragraphs', type=int, default=30000, help='paragraphs per run (~300 pages by default)')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    paragraphs = generate_paragraphs(args.paragraphs)
+    legacy = measure(legacy_parts, paragraphs, args.repeat)
+    single = measure(single_pass_parts, paragraphs, args.repeat)
+
+    print(f'paragraphs:   {args.paragraphs}')
+    print(f'legacy chain: {legacy * 1000:.1f} ms')
+    print(f'single pass:  {single * 1000:.1f} ms')
+    print(f'speedup:      {legacy / single:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
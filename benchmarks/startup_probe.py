@@ -0,0 +1,25 @@
+"""
+Startup probe of benchmarks/bench_startup.py, also bundled as a runtime hook by "Document Forms.spec".
+
+When DOCUMENT_FORMS_STARTUP_PROBE is set, the target given to flet.app is wrapped: once main.main returns,
+with Main added to the page, the time is written to the file it names and the window is closed. Without it
+nothing is changed, so the app itself has no benchmark code.
+"""
+import os
+import time
+
+if os.environ.get('DOCUMENT_FORMS_STARTUP_PROBE'):
+    import flet
+
+    def _probe_app(*args, target, **kwargs):
+        def probed(page):
+            target(page)
+            with open(os.environ['DOCUMENT_FORMS_STARTUP_PROBE'], 'w') as file:
+                file.write(repr(time.time()))
+            page.window_destroy()
+
+        return _flet_app(*args, target=probed, **kwargs)
+
+    _flet_app = flet.app
+    # main.py imports app with "from flet import *", after this runs
+    flet.app = _probe_app
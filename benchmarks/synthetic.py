@@ -0,0 +1,153 @@
+"""
+Generates synthetic form documents for the benchmarks, without Word.
+
+The paragraphs mix plain text with the field patterns detected by the tokenizer: blank lines ('____'),
+': value', empty ':', dates ('01/01/2000', '01 de julho de 2004') and checkboxes ('( X )').
+
+Usage:
+-----
+    python benchmarks/synthetic.py form.docx [--pages 300] [--paragraphs 30000] [--density 0.3] [--pdf form.pdf]
+"""
+from typing import List, Tuple
+from xml.sax.saxutils import escape
+
+import argparse
+import random
+import zipfile
+
+
+FIELD_SAMPLES = [
+    ('Nome completo: ', 'João da Silva Pereira'),
+    ('Eu, ', '____________________, portador do CPF nº ______________, declaro que'),
+    ('Data de nascimento: ', '01/01/2000'),
+    ('Local e data: São Paulo, ', '01 de julho de 2004.'),
+    ('Estado civil: ', '( X ) solteiro (  ) casado ( ) divorciado'),
+    ('Endereço:', '     '),
+    ('Assinatura: ', '_________________________________'),
+]
+
+TEXT_SAMPLES = [
+    'Cláusula 3ª - O CONTRATANTE se obriga a pagar o valor acordado até o quinto dia útil de cada mês.',
+    'As partes elegem o foro da comarca da capital para dirimir quaisquer dúvidas oriundas deste contrato.',
+    'O presente instrumento é firmado em caráter irrevogável e irretratável, obrigando herdeiros e sucessores.',
+    '',
+]
+
+ALIGNMENTS = ['left', 'left', 'left', 'center', 'both']
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+
+RELATIONSHIPS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="word/document.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+
+
+def generate_paragraphs(count: int, density: float = 0.3, seed: int = 0) -> List[Tuple[List[str], str]]:
+    """
+    Returns (runs, alignment) for each paragraph. A fraction density of the paragraphs has fields,
+    written as a label run followed by a field run, like forms typed in Word usually are.
+    """
+    rng = random.Random(seed)
+    paragraphs = []
+
+    for _ in range(count):
+        if rng.random() < density:
+            runs = list(rng.choice(FIELD_SAMPLES))
+        else:
+            runs = [rng.choice(TEXT_SAMPLES)]
+
+        paragraphs.append((runs, rng.choice(ALIGNMENTS)))
+
+    return paragraphs
+
+
+def paragraph_xml(runs: List[str], align: str, page_break: bool = False) -> str:
+    xml = [f'<w:p><w:pPr><w:jc w:val="{align}"/></w:pPr>']
+
+    if page_break:
+        xml.append('<w:r><w:br w:type="page"/></w:r>')
+
+    for index, text in enumerate(runs):
+        properties = '<w:rPr><w:b/></w:rPr>' if index == 0 and len(runs) > 1 else ''
+        xml.append(f'<w:r>{properties}<w:t xml:space="preserve">{escape(text)}</w:t></w:r>')
+
+    xml.append('</w:p>')
+    return ''.join(xml)
+
+
+def write_docx(path: str, pages: int = 300, paragraphs: int = 30000, density: float = 0.3, seed: int = 0) -> str:
+    """
+    Writes a .docx form with the given number of paragraphs, split in pages by page breaks.
+    """
+    per_page = max(paragraphs // max(pages, 1), 1)
+    body = ''.join(
+        paragraph_xml(runs, align, page_break=index > 0 and index % per_page == 0)
+        for index, (runs, align) in enumerate(generate_paragraphs(paragraphs, density, seed))
+    )
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{body}<w:sectPr/></w:body></w:document>'
+    )
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as package:
+        package.writestr('[Content_Types].xml', CONTENT_TYPES)
+        package.writestr('_rels/.rels', RELATIONSHIPS)
+        package.writestr('word/document.xml', document)
+
+    return path
+
+
+def write_pdf(path: str, pages: int = 20, paragraphs: int = 1000, density: float = 0.3, seed: int = 0) -> str:
+    """
+    Writes a PDF form with PyMuPDF, one text line per paragraph.
+    """
+    import fitz
+
+    per_page = max(paragraphs // max(pages, 1), 1)
+    rows = generate_paragraphs(paragraphs, density, seed)
+
+    with fitz.open() as document:
+        for start in range(0, len(rows), per_page):
+            page = document.new_page()
+            y = 50
+
+            for runs, _ in rows[start:start + per_page]:
+                page.insert_text((50, y), ''.join(runs)[:95], fontsize=9)
+                y += max((page.rect.height - 100) / per_page, 1)
+
+        document.save(path)
+
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('docx', help='output .docx file')
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--paragraphs', type=int, default=30000)
+    parser.add_argument('--density', type=float, default=0.3, help='fraction of paragraphs with fields')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pdf', default='', help='also write a PDF form to this path')
+    args = parser.parse_args()
+
+    write_docx(args.docx, args.pages, args.paragraphs, args.density, args.seed)
+
+    if args.pdf:
+        write_pdf(args.pdf, args.pages, args.paragraphs, args.density, args.seed)
+
+
+if __name__ == '__main__':
+    main()
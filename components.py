@@ -1,30 +1,62 @@
-from typing import List, Callable
+from typing import List, Dict, Callable, Iterable, Any
 from enum import Enum
 from document_manager import DocumentManager
+from form_tokenizer import SpanKind
+from form_fields import FieldStore
+from autofill import ProfileStore
+from edit_journal import EditJournal
+from page_renderer import PageRenderer
+from task_scheduler import Job, Stage
+from update_scheduler import UpdateScheduler
+from tracing import tracer
 from flet import *
 
+import math
+import os
+import threading
+
 
 class VisualizationMode(Enum):
     IMAGE = 'IMAGE'
     PARAGRAPH = 'PARAGRAPH'
 
 
+# The pool of each kind of recycled control, see FormViewer.release_rows
+POOL_KEYS: Dict[type, str] = {Text: SpanKind.TEXT.value, TextField: SpanKind.TEXTFIELD.value, Checkbox: SpanKind.CHECKBOX.value}
+
+
 class FormViewer(ListView):
-    def __init__(self, images: List[str] = None, paragraphs: List = None, mode: VisualizationMode = VisualizationMode.PARAGRAPH):
+    def __init__(self, renderer: PageRenderer = None, paragraphs: List = None, mode: VisualizationMode = VisualizationMode.PARAGRAPH,
+                 updates: UpdateScheduler = None):
         super().__init__()
         if paragraphs is None:
             paragraphs = []
-        if images is None:
-            images = []
             
         self.spacing = 10
         self.expand = True
-        self.images_controls: List[Row] = []
-        self.images: List[str] = images
-        self.paragraphs_controls: List[Row] = []
-        self.paragraphs: List[str] = paragraphs
+        self.on_scroll = self.on_viewport_scroll
+        self.on_scroll_interval = 100
+        self.images_controls: List[Container] = []
+        self.renderer: PageRenderer | None = renderer
+        self.render_generation: int = 0
+        self.rendered_pages: set = set()
+        self.page_height: int = 1100
+        self.prefetch: int = 2
+        self.paragraphs_controls: List[Control] = []
+        self.paragraphs: Iterable = paragraphs
         self.mode: VisualizationMode = mode
-        self.fields: List[Control] = []
+        self.store: FieldStore = FieldStore()
+        self.fields: Dict[int, Control] = {}
+        self.rows_controls: Dict[int, Row] = {}
+        self.pools: Dict[str, List[Control]] = {'row': [], '@TX': [], '@TF': [], '@CB': []}
+        self.top_spacer: Container = Container(height=0)
+        self.bottom_spacer: Container = Container(height=0)
+        self.window_start: int = 0
+        self.window_size: int = 80
+        self.row_height: int = 40
+        self.batch_size: int = 200
+        self.updates: UpdateScheduler | None = updates
+        self.on_edit: Callable[[Dict[int, Any]], None] | None = None
 
     def build(self) -> ListView:
         self.setup_paragraphs()
@@ -32,64 +64,257 @@ class FormViewer(ListView):
         self.controls = self.paragraphs_controls
         return ListView(controls=self.controls)
     
-    def update_controls(self, images: List = None, paragraphs: List = None) -> None:
-        self.images = images
+    def update_controls(self, renderer: PageRenderer = None, paragraphs: Iterable = None) -> None:
+        """
+        Replaces the viewer content. The paragraphs may be any iterable of rows, see setup_paragraphs.
+        Opened documents pass the rows of their compiled form, which are all read before the viewer is shown.
+        """
+        self.renderer = renderer
         self.paragraphs = paragraphs
         self.setup_images()
-        self.setup_paragraphs()
         if self.mode == VisualizationMode.IMAGE:
             self.controls = self.images_controls
         else:
             self.controls = self.paragraphs_controls
-        self.update()
+        self.setup_paragraphs()
+        self.request_update()
+
+    def request_update(self, *controls: Control) -> None:
+        """
+        Marks the controls, the viewer by default, to be sent in the next flush of the UpdateScheduler,
+        or updates them right away without one.
+        """
+        controls = controls or (self,)
+
+        if self.updates:
+            self.updates.mark(*controls)
+        else:
+            for control in controls:
+                control.update()
     
     def setup_images(self) -> None:
-        self.images_controls = [Image(src=image) for image in self.images]
+        """
+        Pages are only rendered in image mode, starting with the first ones. See show_pages.
+        """
+        self.render_generation += 1
+        self.rendered_pages.clear()
+        self.images_controls.clear()
 
-    def setup_paragraphs(self) -> None:   
-        self.paragraphs_controls.clear()
-        
-        for texts, align in self.paragraphs:  
-            paragraph = self.create_paragraph_viewer(texts, align)
-            self.paragraphs_controls.append(paragraph)
-            
-    def create_paragraph_viewer(self, texts: List[str], align: Alignment) -> Row:
+        if self.mode == VisualizationMode.IMAGE:
+            self.show_pages(first=0)
+
+    def create_page_viewer(self) -> Container:
+        return Container(
+            content=ProgressRing(),
+            height=self.page_height,
+            alignment=alignment.center,
+            data={'dpi': 0},
+        )
+
+    def on_viewport_scroll(self, e: OnScrollEvent) -> None:
+        if self.mode == VisualizationMode.IMAGE:
+            first = int(e.pixels // (self.page_height + self.spacing))
+            self.show_pages(first=first, viewport=e.viewport_dimension)
+            return
+
+        # Rebuild the window only when the visible rows get close to one of its ends
+        first = int(e.pixels // (self.row_height + self.spacing))
+        visible = math.ceil(e.viewport_dimension / (self.row_height + self.spacing))
+        margin = self.window_size // 4
+        window_end = self.window_start + len(self.rows_controls)
+
+        if first < self.window_start + margin and self.window_start > 0 or first + visible > window_end - margin and window_end < len(self.store.rows):
+            self.show_paragraphs(first=first)
+
+    def show_pages(self, first: int, viewport: float = 0) -> None:
+        """
+        Renders the visible pages plus a prefetch window around them in a background thread.
+
+        Page controls are created only up to the end of the window, so the list grows while scrolling,
+        thumbnails are shown first and replaced by the full resolution render, and pages far from
+        the window are released.
+
+        Parameters:
+        ----------
+        - first (int): The index of the first visible page.
+        - viewport (float): The height of the viewer, in pixels.
+        """
+        if not self.renderer:
+            return
+
+        visible = math.ceil((viewport or self.page_height) / (self.page_height + self.spacing)) + 1
+        start = max(first - self.prefetch, 0)
+        end = min(first + visible + self.prefetch, self.renderer.page_count)
+
+        while len(self.images_controls) < end:
+            self.images_controls.append(self.create_page_viewer())
+
+        for index in list(self.rendered_pages):
+            if not start <= index < end:
+                self.images_controls[index].content = ProgressRing()
+                self.images_controls[index].data['dpi'] = 0
+                self.rendered_pages.discard(index)
+
+        if self.page:
+            self.request_update()
+
+        self.render_generation += 1
+        pages = list(range(first, min(first + visible, end))) + list(range(start, first)) + list(range(first + visible, end))
+        threading.Thread(target=self.render_pages, args=(self.render_generation, pages), daemon=True).start()
+
+    def render_pages(self, generation: int, pages: List[int]) -> None:
+        renderer = self.renderer
+
+        for dpi in (renderer.thumbnail_dpi, renderer.dpi):
+            for index in pages:
+                if generation != self.render_generation or index >= len(self.images_controls):
+                    return
+
+                control = self.images_controls[index]
+                if control.data['dpi'] >= dpi:
+                    continue
+
+                control.content = Image(src_base64=renderer.render(index + 1, dpi=dpi), fit=ImageFit.CONTAIN)
+                control.data['dpi'] = dpi
+                self.rendered_pages.add(index)
+                self.request_update(control)
+
+    def setup_paragraphs(self) -> None:
+        """
+        Reads the rows, showing the first batch_size ones before reading the others. With a generator
+        (see DocumentManager.iter_form_rows) the first rows are shown before the document is fully parsed,
+        but open_job hands over the rows of the compiled form, already read whole.
+
+        The rows and the values of their fields live in self.store (see form_fields.FieldStore), filled while
+        the rows are read. Controls are only built for a window of rows around the visible one
+        (see show_paragraphs) and only show and edit the values of the store.
+        """
+        rows = self.paragraphs
+        self.store = FieldStore()
+        self.window_start = 0
+        self.release_rows(list(self.rows_controls))
+
+        with tracer.span('setup_paragraphs', category='ui'):
+            for texts, align in rows:
+                self.store.add_row(texts, align)
+
+                if len(self.store.rows) == self.batch_size:
+                    self.show_paragraphs(first=0)
+
+            self.paragraphs = self.store.rows
+            self.show_paragraphs(first=self.window_start)
+            tracer.annotate(paragraphs=len(self.store.rows), fields=len(self.store))
+
+    def show_paragraphs(self, first: int) -> None:
+        """
+        Shows the rows of a window starting a bit before the first visible row. Rows leaving the window
+        give their controls back to the pools, where the rows entering it take them from.
+        The rows outside the window are replaced by spacers with their estimated height.
+
+        Parameters:
+        ----------
+        - first (int): The index of the first visible row.
         """
-        Creates a paragraph viewer with the given texts and alignment.
+        rows = len(self.store.rows)
+        start = max(min(first - self.window_size // 4, rows - self.window_size), 0)
+        end = min(start + self.window_size, rows)
+
+        self.release_rows([index for index in self.rows_controls if not start <= index < end])
+
+        for index in range(start, end):
+            if index not in self.rows_controls:
+                self.rows_controls[index] = self.create_paragraph_viewer(*self.store.rows[index], row=index)
+
+        self.window_start = start
+        self.top_spacer.height = start * (self.row_height + self.spacing)
+        self.bottom_spacer.height = (rows - end) * (self.row_height + self.spacing)
+        self.paragraphs_controls[:] = [self.top_spacer, *(self.rows_controls[index] for index in range(start, end)), self.bottom_spacer]
+
+        if self.page and self.mode == VisualizationMode.PARAGRAPH:
+            self.request_update()
+
+    def release_rows(self, rows: List[int]) -> None:
+        for index in rows:
+            row = self.rows_controls.pop(index)
+
+            for control in row.controls:
+                self.pools[POOL_KEYS[type(control)]].append(control)
+                if control.data is not None:
+                    self.fields.pop(control.data, None)
+
+            row.controls = []
+            self.pools['row'].append(row)
+
+    def take(self, kind: SpanKind) -> Control:
+        """ Returns a control of the kind from its pool, or a new one. """
+        pool = self.pools[kind.value]
+
+        if pool:
+            return pool.pop()
+        if kind is SpanKind.TEXTFIELD:
+            return self.create_textfield()
+        if kind is SpanKind.CHECKBOX:
+            return self.create_checkbox()
+        return self.create_text()
+
+    def create_paragraph_viewer(self, texts: List[str], align: Alignment, row: int = 0) -> Row:
+        """
+        Creates a paragraph viewer with the given texts and alignment, reusing pooled controls.
 
         Parameters:
         ----------
         - texts (List[str]): The texts of the paragraph.
         - align (Alignment): The alignment of the paragraph.
+        - row (int): The index of the paragraph in the store, used to find its fields.
 
         Returns:
         -------
         - Row: The paragraph viewer.
         """
-        content = Row(wrap=True, alignment=align)
-                        
-        for text in texts:
-            if '@TF' in text:
-                control = self.create_textfield(value=text)
-                content.controls.append(control)
-                self.fields.append(control)
-            elif '@CB' in text:
-                control = self.create_checkbox(value='x' in text.lower())
-                content.controls.append(control)
-                self.fields.append(control)
+        content = self.pools['row'].pop() if self.pools['row'] else Row(wrap=True)
+        content.alignment = align
+        content.controls = []
+        fields = {self.store.parts[index]: index for index in self.store.row_fields(row)} if row < len(self.store.rows) else {}
+
+        for part, text in enumerate(texts):
+            index = fields.get(part)
+
+            if index is None:
+                control = self.take(SpanKind.TEXT)
+                self.bind_text(control, text)
             else:
-                control = self.create_text(value=text)
-                content.controls.append(control)
-                self.fields.append(control)
-                    
+                control = self.take(self.store.kind(index))
+                self.bind_field(control, index)
+                self.fields[index] = control
+
+            content.controls.append(control)
+
         return content
 
-    def create_textfield(self, value: str = '') -> TextField:
-        def resize_w(e: ControlEvent):
-            c = e.control
+    def bind_text(self, control: Text, text: str) -> None:
+        control.value = text
+        control.data = None
+
+    def bind_field(self, control: Control, index: int) -> None:
+        """ Shows the value of the field index of the store in a pooled TextField or Checkbox. """
+        control.value = self.store.value(index)
+        control.data = index
+
+        if isinstance(control, TextField):
+            control.width = max(len(control.value) * 11, 50)
+
+    def on_field_change(self, e: ControlEvent) -> None:
+        c = e.control
+        self.store.set({c.data: c.value})
+
+        if self.on_edit:
+            self.on_edit({c.data: c.value})
+
+        if isinstance(c, TextField):
             c.width = max(len(c.value) * 11, 50)
-            c.update()
-                        
+            self.request_update(c)
+
+    def create_textfield(self, value: str = '') -> TextField:
         value = value.replace('@TF', '')
         
         return TextField(
@@ -97,54 +322,68 @@ class FormViewer(ListView):
             width=max(len(value) * 11, 50),
             height=30,
             content_padding=Padding(left=5, top=3, right=5, bottom=3),
-            data={'type': '@TF', 'old_value': value},
-            on_change=resize_w,
+            on_change=self.on_field_change,
         )
 
     def create_checkbox(self, value: bool = False) -> Checkbox:
-        return Checkbox(value=value, data={'type': '@CB', 'old_value': value})
+        return Checkbox(value=value, on_change=self.on_field_change)
 
     def create_text(self, value: str = '') -> Text:
-        return Text(value=value, selectable=True, data={'type': '@TX', 'old_value': value})
+        return Text(value=value, selectable=True)
 
     def get_paragraphs(self) -> List[str]:
         """
-        Returns a list of strings, where each string is a paragraph of the form.
-        The strings are constructed by concatenating the values of each control in the paragraph,
-        separated by spaces.
+        Returns a list of strings, where each string is a paragraph of the form, built from the
+        field store (see form_fields.FieldStore.paragraphs), without reading the controls.
         """
-        paragraphs_texts = []
-        for paragraph in self.paragraphs_controls:
-            texts = []
-            
-            for control in paragraph.controls:
-                if isinstance(control, TextField):
-                    value = control.value 
-                    old_value = control.data["old_value"]
-                    texts.append((":" + value if old_value.startswith(":") else value) or old_value)
-                elif isinstance(control, Text):
-                    texts.append(control.value) or control.data["old_value"]
-                elif isinstance(control, Checkbox):
-                    texts.append('( X )' if control.value else '(  )')
-                else:
-                    continue
-                
-            paragraphs_texts.append(''.join(texts))
-
-        return paragraphs_texts
+        return self.store.paragraphs()
  
     def clear_values(self) -> None:
-        for field in self.fields:
-            
-            if isinstance(field, TextField):
-                field.value = ""
-                continue
-            
-            if isinstance(field, Checkbox):
-                field.value = False
-                continue
-            
-        self.update()
+        self.fill(self.store.cleared())
+
+    def fill(self, values: Dict[int, Any], notify: bool = True) -> None:
+        """
+        Sets the values of many fields, by field index, in a single update. Only the controls of the
+        rows on screen are changed, the others show the values when their rows are built.
+        Without notify, on_edit is not called, e.g. when the values come from the edit journal.
+        """
+        with tracer.span('fill', category='ui', fields=len(values)):
+            self.store.set(values)
+
+            if notify and self.on_edit:
+                self.on_edit(values)
+
+            self.bind_shown(values)
+
+    def bind_shown(self, values: Dict[int, Any] | None = None) -> None:
+        """ Shows the store values again in the controls on screen, only those of values when given. """
+        for index, control in self.fields.items():
+            if values is None or index in values:
+                self.bind_field(control, index)
+
+        if self.page:
+            self.request_update()
+
+    def reset_values(self) -> None:
+        """ Discards every edit, showing the original values of the document again. """
+        self.store.reset()
+        self.bind_shown()
+
+    def apply_profile(self, record: Dict[str, Any]) -> int:
+        """
+        Fills the fields found by the keys of an autofill profile, see form_fields.FieldStore.
+
+        Returns:
+        -------
+        - int: The number of filled fields.
+        """
+        values, _ = self.store.resolve(record)
+        self.fill(values)
+        return len(values)
+
+    def profile_record(self) -> Dict[str, Any]:
+        """ The values filled by the user, by label, to be saved as an autofill profile. """
+        return self.store.record()
 
     def change_visualization_mode(self) -> None:
         """
@@ -157,21 +396,33 @@ class FormViewer(ListView):
         if self.mode == VisualizationMode.PARAGRAPH:
             self.controls = self.images_controls
             self.mode = VisualizationMode.IMAGE
+            if not self.images_controls:
+                self.show_pages(first=0)
         else:
             self.controls = self.paragraphs_controls
             self.mode = VisualizationMode.PARAGRAPH
-        self.update()
+        self.request_update()
 
 
 class Main(Row):
-    def __init__(self, page: Page) -> None:
+    def __init__(self, page: Page, in_memory: bool = False) -> None:
         super().__init__()
         self.page: Page = page
-        self.dm: DocumentManager = DocumentManager()
+        self.dm: DocumentManager = DocumentManager(in_memory=in_memory)
+        self.profiles: ProfileStore = ProfileStore()
+        self.journal: EditJournal = EditJournal()
         self.dialog: AlertDialog = AlertDialog()
         self.file_picker: FilePicker = FilePicker()
         self.load: ProgressRing = ProgressRing(visible=False, disabled=True)
-        self.viewer: FormViewer = FormViewer()
+        self.load_status: Text = Text(visible=False)
+        self.load_cancel: TextButton = TextButton(text='Cancelar', visible=False, on_click=lambda _: self.cancel_job())
+        self.job: Job | None = None
+        self.job_run: object | None = None
+        self.rest_job: Job | None = None
+        self.rest_run: object | None = None
+        self.updates: UpdateScheduler = UpdateScheduler(page)
+        self.viewer: FormViewer = FormViewer(updates=self.updates)
+        self.viewer.on_edit = self.journal.record
         self.menu: GridView = GridView()
         self.page.add(self.dialog)
         self.page.window_prevent_close = True
@@ -180,6 +431,9 @@ class Main(Row):
         self.alignment = MainAxisAlignment.CENTER
         self.vertical_alignment = CrossAxisAlignment.CENTER
 
+    def did_mount(self) -> None:
+        self.offer_recovery()
+
     def build(self) -> Control:
         self.setup_menu()
 
@@ -188,7 +442,10 @@ class Main(Row):
                 self.viewer,
                 self.menu,
                 self.file_picker,
-                self.load,
+                Column(
+                    controls=[self.load, self.load_status, self.load_cancel],
+                    horizontal_alignment=CrossAxisAlignment.CENTER,
+                ),
             ],
             expand=True,
             alignment=MainAxisAlignment.CENTER,
@@ -201,10 +458,14 @@ class Main(Row):
                 IconButton(icon=icons.FILE_UPLOAD, on_click=lambda _: self.open_file(), icon_color=colors.YELLOW_ACCENT_700, tooltip='Carregar arquivo'),
                 IconButton(icon=icons.SAVE, on_click=lambda _: self.save_word(), icon_color=colors.YELLOW_ACCENT_700, tooltip='Salvar Word'),
                 IconButton(icon=icons.PICTURE_AS_PDF, on_click=lambda _: self.save_pdf(), icon_color=colors.YELLOW_ACCENT_700, tooltip='Salvar PDF'),
+                IconButton(icon=icons.EDIT_DOCUMENT, on_click=lambda _: self.save_acroform(), icon_color=colors.YELLOW_ACCENT_700, tooltip='Salvar PDF Preenchível'),
                 IconButton(icon=icons.PHOTO_LIBRARY, on_click=lambda _: self.save_images(), icon_color=colors.YELLOW_ACCENT_700, tooltip='Salvar Imagens'),
+                IconButton(icon=icons.SAVE_AS, on_click=lambda _: self.save_all(), icon_color=colors.YELLOW_ACCENT_700, tooltip='Salvar Word, PDF e Imagens'),
                 IconButton(icon=icons.SUNNY, on_click=self.change_theme, icon_color=colors.YELLOW_ACCENT_700, tooltip='Mudar Tema'),
                 IconButton(icon=icons.TEXT_FORMAT, on_click=self.change_visualization, icon_color=colors.YELLOW_ACCENT_700, tooltip='Mudar Visualização'),
                 IconButton(icon=icons.DELETE, on_click=lambda _: self.clear_form(), icon_color=colors.YELLOW_ACCENT_700, tooltip='Apagar Campos'),
+                IconButton(icon=icons.ASSIGNMENT_IND, on_click=lambda _: self.show_profiles(), icon_color=colors.YELLOW_ACCENT_700, tooltip='Preencher com Perfil'),
+                IconButton(icon=icons.TIMER, on_click=lambda _: self.show_trace_summary(), icon_color=colors.YELLOW_ACCENT_700, tooltip='Tempos', visible=tracer.enabled),
             ],
             spacing=10,
             width=50
@@ -213,7 +474,11 @@ class Main(Row):
     def on_window_event(self, e: ControlEvent) -> None:
         if e.data == 'close':
             try:
-                self.dm.clear()
+                # The journal is kept, so the edits are recovered the next time the document is opened
+                self.journal.close()
+                # The working files are removed by the workspace sweep of the next session, not while closing
+                DocumentManager.workspace.close()
+                DocumentManager.close_backend()
             finally:
                 self.page.window_destroy()
                 exit(0)
@@ -271,8 +536,13 @@ class Main(Row):
 
         self.load.disabled = False
         self.load.visible = True
+        self.load.value = None
+
+        self.load_status.value = ''
+        self.load_status.visible = True
+        self.load_cancel.visible = True
 
-        self.page.update()
+        self.updates.mark()
 
     def loading_end(self) -> None:
         self.viewer.disabled = False
@@ -284,7 +554,68 @@ class Main(Row):
         self.load.disabled = True
         self.load.visible = False
 
-        self.page.update()
+        self.load_status.visible = False
+        self.load_cancel.visible = False
+
+        self.updates.mark()
+
+    def on_job_progress(self, job: Job, stage: Stage) -> None:
+        self.load.value = job.progress or None
+        self.load_status.value = f'{stage.title}... {stage.detail}' if stage.detail else f'{stage.title}...'
+        self.updates.mark(self.load, self.load_status)
+
+    def run_job(self, start: Callable[..., Job], on_done: Callable[[Job], None], on_error: Callable[[Exception], None]) -> None:
+        """
+        Starts a background job of the DocumentManager, cancelling the previous one, and shows its progress.
+
+        The callbacks of a job may run before start returns it, e.g. when it fails right away or is restored
+        from a cache, so they are matched to this run rather than to self.job.
+
+        Parameters:
+        ----------
+        - start (Callable[..., Job]): A DocumentManager job method, called with the job callbacks.
+        - on_done (Callable[[Job], None]): Called when every stage finished.
+        - on_error (Callable[[Exception], None]): Called when a stage fails or on_done raises.
+        """
+        run = object()
+
+        def is_current() -> bool:
+            return self.job_run is run
+
+        def progress(job: Job, stage: Stage) -> None:
+            if is_current():
+                self.on_job_progress(job, stage)
+
+        def done(job: Job) -> None:
+            if is_current():
+                try:
+                    on_done(job)
+                finally:
+                    self.loading_end()
+
+        def error(job: Job, exception: Exception) -> None:
+            if is_current():
+                self.loading_end()
+                on_error(exception)
+
+        self.cancel_job()
+        self.loading_start()
+        self.job_run = run
+        job = start(on_progress=progress, on_done=done, on_error=error)
+
+        if is_current():
+            self.job = job
+        else:
+            # Cancelled while it was being started
+            job.cancel()
+
+    def cancel_job(self) -> None:
+        self.job_run = None
+
+        if self.job:
+            self.job.cancel()
+            self.job = None
+            self.loading_end()
 
     def change_theme(self, e: ControlEvent) -> None:
         button_control: IconButton = e.control
@@ -298,8 +629,7 @@ class Main(Row):
             button_control.icon = icons.NIGHTLIGHT
             self.page.theme_mode = ThemeMode.DARK
 
-        button_control.update()
-        self.page.update()
+        self.updates.mark()
 
     def change_visualization(self, e: ControlEvent) -> None:
         self.viewer.change_visualization_mode()
@@ -308,7 +638,7 @@ class Main(Row):
             icon_button.icon = icons.TEXT_FORMAT
         else:
             icon_button.icon = icons.IMAGE
-        icon_button.update()
+        self.updates.mark(icon_button)
 
     def show_dialog(self, title: str | Control | None = None, content: str | Control | None = None, actions: List[Control] | None = None) -> None:
         if isinstance(title, str):
@@ -324,14 +654,14 @@ class Main(Row):
         self.dialog.actions_alignment = MainAxisAlignment.END
 
         self.dialog.open = True
-        self.page.update()
+        self.updates.mark()
 
     def close_dialog(self) -> None:
         self.dialog.open = False
         self.dialog.title.clean()
         self.dialog.content.clean()
         self.dialog.actions.clear()
-        self.dialog.update()
+        self.updates.mark(self.dialog)
 
     def show_dialog_saved_file(self, saved: bool, output_path: str = '', output_folder: str = '') -> None:
         if saved:
@@ -357,6 +687,38 @@ class Main(Row):
         else:
             self.show_dialog(title="Nenhum arquivo para salvar", content="Selecione um arquivo antes de salvá-lo")
 
+    def show_trace_summary(self) -> None:
+        """
+        Shows how long each stage took (see tracing.Tracer) and lets the user export the Chrome trace.
+        """
+        def export(e: FilePickerResultEvent) -> None:
+            if output_folder := e.path:
+                output_path = tracer.export(os.path.join(output_folder, 'trace.json'))
+                self.show_dialog_saved_file(saved=True, output_path=output_path, output_folder=output_folder)
+
+        table = DataTable(
+            columns=[
+                DataColumn(Text('Etapa')),
+                DataColumn(Text('Vezes'), numeric=True),
+                DataColumn(Text('Total'), numeric=True),
+                DataColumn(Text('Máximo'), numeric=True),
+            ],
+            rows=[
+                DataRow(cells=[
+                    DataCell(Text(name)),
+                    DataCell(Text(str(count))),
+                    DataCell(Text(f'{total * 1000:.0f} ms')),
+                    DataCell(Text(f'{longest * 1000:.0f} ms')),
+                ])
+                for name, count, total, longest in tracer.summary()
+            ],
+        )
+        actions = [
+            TextButton(text='Exportar trace', on_click=lambda _: self.pick_path(func=export)),
+            TextButton(text='Fechar', on_click=lambda _: self.close_dialog()),
+        ]
+        self.show_dialog(title='Tempos', content=Column(controls=[table], scroll=ScrollMode.AUTO, height=400), actions=actions)
+
     def pick_file(self, func: Callable, allowed_extensions: List[str]) -> None:
         self.file_picker.on_result = func
         self.file_picker.pick_files(dialog_title='Abrir documento', allowed_extensions=allowed_extensions)
@@ -367,108 +729,213 @@ class Main(Row):
 
     def open_file(self) -> None:
         def pick_file_result(e: FilePickerResultEvent) -> None:
-            try:
-                if not e.files:
-                    return
+            if not e.files:
+                return
 
-                input_path = e.files[0].path
+            input_path = e.files[0].path
 
-                if not input_path:
-                    return
+            if not input_path:
+                return
 
-                self.viewer.clean()
-                self.dm.clear()
-                self.loading_start()
-
-                output_path = self.dm.change_file_path(path=input_path, folder=self.dm.default_path + ".documents/")
-                self.dm.create_dir(path=output_path)
-                self.dm.copy_file_to(input_path=input_path, output_path=output_path)
-                abs_output_path = self.dm.file_info(path=output_path)['abs_path']
-                
-                if output_path.endswith('.docx'):
-                    self.dm.word_path = abs_output_path
-                    self.dm.docx2pdf(save_path=True)
-                elif output_path.endswith('.pdf'):
-                    self.dm.pdf_path = abs_output_path
-                    self.dm.pdf2docx(save_path=True)
-
-                self.generate_form()
-            except Exception as error:
-                self.on_error(
-                    title='Ocorreu um erro ao carregar o arquivo',
-                    msg='Por favor verique se o documento existe ou se está corrompido.',
-                    error=error
-                )
-            finally:
-                self.loading_end()
+            self.open_document(input_path)
 
         self.pick_file(func=pick_file_result, allowed_extensions=["docx", "pdf"])
 
-    def save_word(self) -> None:
-        def pick_file_result(e: FilePickerResultEvent) -> None:
-            if output_folder := e.path:
-                self.loading_start()
-                
-                try:
-                    self.dm.save_changes(save_folder=output_folder, paragraphs=self.get_paragraphs())
-                    self.show_dialog_saved_file(saved=True, output_folder=output_folder)
-                except Exception as error:
-                    self.on_file_error(error=error)
-                    
-                self.loading_end()
+    def open_document(self, input_path: str) -> None:
+        def on_error(error: Exception) -> None:
+            self.on_error(
+                title='Ocorreu um erro ao carregar o arquivo',
+                msg='Por favor verique se o documento existe ou se está corrompido.',
+                error=error
+            )
 
-        if self.dm.word_path:
-            self.pick_path(func=pick_file_result)
+        def on_done(job: Job) -> None:
+            self.generate_form(job.results['renderer'], job.results['rows'], input_path=input_path)
+
+            if pages:
+                self.open_rest(input_path)
+
+        self.cancel_rest()
+        self.journal.close()
+        self.viewer.clean()
+        self.dm.clear()
+        # Long PDFs converted to Word are opened with their first pages, the others are converted meanwhile
+        pages = self.dm.open_range(input_path)
+        self.run_job(
+            start=lambda **callbacks: self.dm.open_job(input_path=input_path, pages=pages, **callbacks),
+            on_done=on_done,
+            on_error=on_error,
+        )
+
+    def open_rest(self, input_path: str) -> None:
+        """
+        Converts the whole document in the background once its first pages are open (see DocumentManager.open_range)
+        and then shows it instead, keeping the edits made meanwhile and journaling them under the whole document.
+        Edits are moved by field label (see form_fields.FieldStore.keyed), since the pages where the first ones
+        end may be read differently once the pages after them are converted too.
+        """
+        run = object()
+
+        def on_done(job: Job) -> None:
+            if self.rest_run is not run:
+                return
+
+            self.rest_run, self.rest_job = None, None
+            store = self.viewer.store
+            edits = store.changes()
+
+            # The journal of the first pages is replaced by the one of the whole document
+            self.journal.close(delete=True)
+            self.viewer.update_controls(job.results['renderer'], job.results['rows'])
+
+            values, _ = self.viewer.store.resolve(store.keyed(edits))
+            recovered = self.journal.open(key=self.dm.key, source_path=input_path, fields=len(self.viewer.store))
+            self.viewer.fill({**recovered, **values}, notify=False)
+            self.journal.record(values)
+
+        def on_error(job: Job, error: Exception) -> None:
+            if self.rest_run is not run:
+                return
+
+            self.rest_run, self.rest_job = None, None
+            self.on_error(
+                title='Ocorreu um erro ao converter o restante do arquivo',
+                msg='Somente as primeiras páginas do documento podem ser preenchidas.',
+                error=error
+            )
+
+        # Matched to this run, like in run_job: a converted document may be done before open_job returns
+        self.rest_run = run
+        job = self.dm.open_job(input_path=input_path, on_done=on_done, on_error=on_error)
+
+        if self.rest_run is run:
+            self.rest_job = job
         else:
-            self.show_dialog_saved_file(saved=False)
+            job.cancel()
+
+    def cancel_rest(self) -> None:
+        self.rest_run = None
+
+        if self.rest_job:
+            self.rest_job.cancel()
+            self.rest_job = None
+
+    def save_file(self, kind: str) -> None:
+        """
+        Asks for a folder and saves the form there in the background.
+
+        Parameters:
+        ----------
+        - kind (str): 'docx', 'pdf', 'images', 'all' or 'acroform', see DocumentManager.save_job.
+        """
+        def saved(output_folder: str) -> None:
+            # The edits are in the saved files now, so the journal no longer offers to recover them
+            self.journal.saved()
+            self.show_dialog_saved_file(saved=True, output_folder=output_folder)
 
-    def save_pdf(self) -> None:
         def pick_file_result(e: FilePickerResultEvent) -> None:
             if output_folder := e.path:
-                self.loading_start()
-                
-                try:
-                    self.dm.save_changes(paragraphs=self.get_paragraphs())
-                    self.dm.docx2pdf(output_folder=output_folder)
-                    self.show_dialog_saved_file(saved=True, output_folder=output_folder)
-                except Exception as error:
-                    self.on_file_error(error=error)
-                    
-                self.loading_end()
+                # The fillable PDF and native PDFs are filled from the changed values, Word files from the paragraphs
+                paragraphs = [] if kind == 'acroform' else self.get_paragraphs()
+                values = self.viewer.store.changes()
+                self.run_job(
+                    start=lambda **callbacks: self.dm.save_job(kind=kind, output_folder=output_folder, paragraphs=paragraphs, values=values, **callbacks),
+                    on_done=lambda _: saved(output_folder),
+                    on_error=self.on_file_error,
+                )
 
-        if self.dm.word_path:
+        if self.rest_run:
+            # Saving now would only save the first pages
+            self.show_dialog(
+                title='Documento ainda sendo convertido',
+                content='As outras páginas do documento ainda estão sendo convertidas. Tente salvar novamente em instantes.',
+            )
+        elif self.dm.template:
             self.pick_path(func=pick_file_result)
         else:
             self.show_dialog_saved_file(saved=False)
+
+    def save_word(self) -> None:
+        self.save_file(kind='docx')
+
+    def save_pdf(self) -> None:
+        self.save_file(kind='pdf')
             
     def save_images(self) -> None:
-        def pick_file_result(e: FilePickerResultEvent) -> None:
-            if output_folder := e.path:
-                self.loading_start()
-                
-                try:
-                    self.dm.save_changes(paragraphs=self.get_paragraphs())
-                    self.dm.docx2pdf()
-                    self.dm.pdf2images(output_folder=output_folder)
-                    self.show_dialog_saved_file(saved=True, output_folder=output_folder)
-                except Exception as error:
-                    self.on_file_error(error=error)
-                    
-                self.loading_end()
+        self.save_file(kind='images')
 
-        if self.dm.word_path:
-            self.pick_path(func=pick_file_result)
-        else:
-            self.show_dialog_saved_file(saved=False)
+    def save_acroform(self) -> None:
+        self.save_file(kind='acroform')
+
+    def save_all(self) -> None:
+        self.save_file(kind='all')
+
+    def generate_form(self, renderer: PageRenderer, rows: Iterable, input_path: str = '') -> None:
+        self.viewer.update_controls(renderer, rows)
+
+        if input_path:
+            self.recover_edits(input_path)
+
+    def recover_edits(self, input_path: str) -> None:
+        """
+        Starts journaling the edits of the opened document (see edit_journal.EditJournal) and replays
+        the edits of its previous session, letting the user discard them.
+        """
+        values = self.journal.open(key=self.dm.key, source_path=input_path, fields=len(self.viewer.store))
+
+        if not values:
+            return
+
+        with tracer.span('replay_journal', category='ui', edits=len(values)):
+            self.viewer.fill(values, notify=False)
+
+        def discard() -> None:
+            self.journal.reset()
+            self.viewer.reset_values()
+            self.close_dialog()
+
+        actions = [
+            TextButton(text='Descartar', on_click=lambda _: discard()),
+            TextButton(text='Manter', on_click=lambda _: self.close_dialog()),
+        ]
+        self.show_dialog(
+            title='Edições recuperadas',
+            content=f'{len(values)} campo(s) preenchido(s) na última sessão foram recuperados.',
+            actions=actions,
+        )
+
+    def offer_recovery(self) -> None:
+        """ Offers to open the document of the last session with edits, e.g. after a crash. """
+        sessions = self.journal.sessions()
+
+        if not sessions:
+            return
+
+        session = sessions[0]
+
+        def open_session() -> None:
+            self.close_dialog()
+            self.open_document(session['source'])
 
-    def generate_form(self) -> None:
-        self.viewer.update_controls(self.dm.pdf2images(save_path=True), self.dm.extract_form_rows())
+        def discard() -> None:
+            self.journal.discard(session['key'])
+            self.close_dialog()
+
+        actions = [
+            TextButton(text='Abrir', on_click=lambda _: open_session()),
+            TextButton(text='Descartar', on_click=lambda _: discard()),
+        ]
+        self.show_dialog(
+            title='Recuperar sessão',
+            content=f'O documento "{os.path.basename(session["source"])}" tem {session["edits"]} campo(s) preenchido(s) na última sessão. Deseja abri-lo?',
+            actions=actions,
+        )
 
     def get_paragraphs(self) -> List[str]:
         return self.viewer.get_paragraphs()
 
     def clear_form(self) -> None:
-        if self.dm.word_path:
+        if self.dm.template:
             def clear() -> None:
                 self.viewer.clear_values()
                 self.close_dialog()
@@ -477,3 +944,45 @@ class Main(Row):
             self.show_dialog(title='Confirmação de exclusão', content='Tem certeza que quer excluir o que foi preenchido?', actions=[button])
         else:
             self.show_dialog(title='Nada para apagar', content='Carregue um documento antes de apagar seus campos')
+
+    def show_profiles(self) -> None:
+        """
+        Lists the saved autofill profiles (see autofill.ProfileStore) to fill the form with one of them,
+        and saves the values filled so far as a new profile.
+        """
+        if not self.dm.template:
+            self.show_dialog(title='Nada para preencher', content='Carregue um documento antes de preencher seus campos')
+            return
+
+        name_field = TextField(label='Nome do novo perfil', width=300)
+
+        def apply(name: str) -> None:
+            filled = self.viewer.apply_profile(self.profiles.load(name))
+            self.show_dialog(title='Perfil aplicado', content=f'{filled} campo(s) preenchido(s) com o perfil "{name}".')
+
+        def delete(name: str) -> None:
+            self.profiles.delete(name)
+            self.show_profiles()
+
+        def save(_) -> None:
+            if name := (name_field.value or '').strip():
+                self.profiles.save(name, self.viewer.profile_record())
+                self.show_profiles()
+
+        rows = [
+            Row(controls=[
+                TextButton(text=name, on_click=lambda _, name=name: apply(name), expand=True),
+                IconButton(icon=icons.DELETE, on_click=lambda _, name=name: delete(name), tooltip='Excluir perfil'),
+            ])
+            for name in self.profiles.names()
+        ]
+        content = Column(
+            controls=[*(rows or [Text('Nenhum perfil salvo')]), name_field],
+            scroll=ScrollMode.AUTO,
+            height=400,
+        )
+        actions = [
+            TextButton(text='Salvar perfil', on_click=save),
+            TextButton(text='Fechar', on_click=lambda _: self.close_dialog()),
+        ]
+        self.show_dialog(title='Perfis de preenchimento', content=content, actions=actions)
@@ -0,0 +1,491 @@
+from concurrent.futures import Future, TimeoutError as ResultTimeout
+from abc import ABC, abstractmethod
+from typing import List, Dict, Set, Callable, Any
+
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class ConversionError(Exception):
+    pass
+
+
+class ConversionBackend(ABC):
+    """
+    Converts Word files to PDF for DocumentManager.docx2pdf.
+
+    warm starts the converter once, so the following conversions skip its startup, and close releases it.
+    A broken backend can no longer convert anything and has to be replaced.
+    """
+    name: str = ''
+
+    @property
+    def broken(self) -> bool:
+        return False
+
+    def warm(self) -> None:
+        pass
+
+    @abstractmethod
+    def docx2pdf(self, input_path: str, output_path: str) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class WordBackend(ConversionBackend):
+    """
+    Microsoft Word through COM automation, Windows only. The Word application started by warm is kept
+    for every conversion instead of being started by each one, like docx2pdf does.
+    """
+    name = 'word'
+    PDF_FORMAT = 17
+
+    def __init__(self):
+        self.word = None
+
+    def warm(self) -> None:
+        import pythoncom
+        import win32com.client
+
+        pythoncom.CoInitialize()
+        self.word = win32com.client.DispatchEx('Word.Application')
+        self.word.Visible = False
+        self.word.DisplayAlerts = 0
+
+    def docx2pdf(self, input_path: str, output_path: str) -> None:
+        if self.word is None:
+            self.warm()
+
+        document = self.word.Documents.Open(os.path.abspath(input_path), ReadOnly=True)
+        try:
+            document.SaveAs(os.path.abspath(output_path), FileFormat=self.PDF_FORMAT)
+        finally:
+            document.Close(0)
+
+    def close(self) -> None:
+        if self.word is not None:
+            self.word.Quit()
+            self.word = None
+
+
+class LibreOfficeBackend(ConversionBackend):
+    """
+    LibreOffice in headless mode, for Linux servers.
+
+    warm starts one soffice listener (soffice --headless --accept=...) with a private profile, and every
+    conversion goes through it over UNO, so LibreOffice starts once per backend instead of once per
+    conversion. A listener that died is started again by the next conversion, which is retried once.
+
+    The uno module comes with LibreOffice (python3-uno on Linux distributions). Without it each conversion
+    runs soffice --convert-to, paying the LibreOffice startup every time.
+    """
+    name = 'libreoffice'
+    PDF_FILTER = 'writer_pdf_Export'
+
+    def __init__(self, soffice: str = '', start_timeout: float = 60):
+        self.soffice: str = soffice or shutil.which('soffice') or shutil.which('libreoffice') or 'soffice'
+        self.start_timeout: float = start_timeout
+        self.profile: str = ''
+        self.process: subprocess.Popen | None = None
+        self.desktop: Any = None
+
+    def warm(self) -> None:
+        if not self.profile:
+            self.profile = tempfile.mkdtemp(prefix='document-forms-lo-')
+
+        try:
+            import uno
+        except ImportError:
+            logger.warning('The uno module is not available, LibreOffice will be started for each conversion')
+            self.warm_command()
+            return
+
+        self.start_listener(uno)
+
+    def profile_options(self) -> List[str]:
+        return [f'-env:UserInstallation=file://{self.profile.replace(os.sep, "/")}'] if self.profile else []
+
+    def start_listener(self, uno) -> None:
+        """ Starts the soffice listener on a free local port and connects to it. """
+        self.stop_listener()
+
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+
+        connection = f'socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext'
+        self.process = subprocess.Popen(
+            [self.soffice, *self.profile_options(), '--headless', '--invisible', '--nologo', '--norestore', f'--accept={connection}'],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext('com.sun.star.bridge.UnoUrlResolver', local)
+        deadline = time.monotonic() + self.start_timeout
+
+        while True:
+            try:
+                context = resolver.resolve(f'uno:{connection}')
+                break
+            except Exception as error:
+                # NoConnectException until the listener accepts connections
+                if self.process.poll() is not None:
+                    raise ConversionError(f'{self.soffice} exited with {self.process.returncode}') from error
+                if time.monotonic() > deadline:
+                    self.stop_listener()
+                    raise ConversionError(f'{self.soffice} did not accept connections in {self.start_timeout} seconds') from error
+                time.sleep(0.1)
+
+        self.desktop = context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+
+    def stop_listener(self) -> None:
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                # The listener is already gone
+                pass
+            self.desktop = None
+        elif self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+
+    @property
+    def listening(self) -> bool:
+        return self.desktop is not None and self.process is not None and self.process.poll() is None
+
+    def convert_uno(self, uno, input_path: str, output_path: str) -> None:
+        def properties(**values):
+            result = []
+            for name, value in values.items():
+                prop = uno.createUnoStruct('com.sun.star.beans.PropertyValue')
+                prop.Name, prop.Value = name, value
+                result.append(prop)
+            return tuple(result)
+
+        document = self.desktop.loadComponentFromURL(uno.systemPathToFileUrl(input_path), '_blank', 0, properties(Hidden=True, ReadOnly=True))
+
+        if document is None:
+            raise ConversionError(f'LibreOffice could not open {input_path}')
+
+        try:
+            document.storeToURL(uno.systemPathToFileUrl(output_path), properties(FilterName=self.PDF_FILTER))
+        finally:
+            document.close(True)
+
+    def docx2pdf(self, input_path: str, output_path: str) -> None:
+        input_path, output_path = os.path.abspath(input_path), os.path.abspath(output_path)
+
+        try:
+            import uno
+        except ImportError:
+            self.convert_command(input_path, output_path)
+            return
+
+        for attempt in range(2):
+            if not self.listening:
+                self.warm()
+
+            try:
+                self.convert_uno(uno, input_path, output_path)
+                return
+            except ConversionError:
+                raise
+            except Exception as error:
+                if self.listening or attempt:
+                    raise ConversionError(f'{type(error).__name__}: {error}') from error
+                logger.warning('The LibreOffice listener stopped, starting it again: %s', error)
+
+    def warm_command(self) -> None:
+        """ Runs a first soffice --convert-to, so the following ones skip the profile setup. """
+        with tempfile.TemporaryDirectory() as folder:
+            input_path = os.path.join(folder, 'warm.txt')
+            with open(input_path, 'w') as file:
+                file.write('warm')
+            self.run_command(input_path, folder)
+
+    def run_command(self, input_path: str, output_folder: str) -> None:
+        command = [self.soffice, *self.profile_options(), '--headless', '--convert-to', 'pdf', '--outdir', output_folder, input_path]
+        result = subprocess.run(command, capture_output=True, text=True)
+
+        if result.returncode != 0:
+            raise ConversionError(result.stderr.strip() or f'{self.soffice} exited with {result.returncode}')
+
+    def convert_command(self, input_path: str, output_path: str) -> None:
+        with tempfile.TemporaryDirectory() as folder:
+            self.run_command(input_path, folder)
+            converted = os.path.join(folder, os.path.splitext(os.path.basename(input_path))[0] + '.pdf')
+
+            if not os.path.isfile(converted):
+                raise ConversionError(f'LibreOffice did not convert {input_path}')
+
+            shutil.move(converted, output_path)
+
+    def close(self) -> None:
+        self.stop_listener()
+
+        if self.profile:
+            shutil.rmtree(self.profile, ignore_errors=True)
+            self.profile = ''
+
+
+class StubBackend(ConversionBackend):
+    """
+    Writes a plain PDF with the paragraph texts, one line each, without any word processor.
+    Meant for tests and benchmarks: the layout has nothing to do with the Word document.
+    """
+    name = 'stub'
+
+    def __init__(self, lines_per_page: int = 50):
+        self.lines_per_page: int = lines_per_page
+
+    def docx2pdf(self, input_path: str, output_path: str) -> None:
+        import fitz
+        from docx_stream import iter_paragraphs
+
+        with fitz.open() as document:
+            page = None
+
+            for index, (text, _) in enumerate(iter_paragraphs(input_path)):
+                if index % self.lines_per_page == 0:
+                    page = document.new_page()
+                page.insert_text((50, 50 + (index % self.lines_per_page) * 14), text, fontsize=10)
+
+            if page is None:
+                document.new_page()
+
+            document.save(output_path)
+
+
+BACKENDS: Dict[str, Callable[..., ConversionBackend]] = {
+    WordBackend.name: WordBackend,
+    LibreOfficeBackend.name: LibreOfficeBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+# Reported by a worker when it takes a job, see _serve
+STARTED = 'started'
+
+
+def _serve(name: str, options: Dict[str, Any], jobs: multiprocessing.Queue, results: multiprocessing.Queue) -> None:
+    """
+    Runs in each worker process: starts the backend once, then converts the jobs until it gets None.
+    Every job is reported twice, as (key, pid, STARTED) when taken and (key, pid, error) when finished.
+    """
+    backend = BACKENDS[name](**options)
+    pid = os.getpid()
+
+    try:
+        backend.warm()
+    except Exception as error:
+        results.put((None, pid, f'{type(error).__name__}: {error}'))
+
+    try:
+        while (job := jobs.get()) is not None:
+            key, method, args = job
+            results.put((key, pid, STARTED))
+            try:
+                getattr(backend, method)(*args)
+                results.put((key, pid, None))
+            except Exception as error:
+                results.put((key, pid, f'{type(error).__name__}: {error}'))
+    finally:
+        backend.close()
+
+
+class WorkerPoolBackend(ConversionBackend):
+    """
+    Runs a backend in long-lived worker processes that take conversion jobs from a queue.
+
+    Every worker starts and warms its own converter once, when the pool is created, so conversions
+    never pay the converter startup again. COM and LibreOffice sessions also stay out of the UI process.
+
+    A worker that stops, e.g. when the converter crashes, fails the conversion it was running. Once every
+    worker stopped the pool is broken: pending conversions fail and new ones are refused. Conversions
+    that take longer than timeout seconds fail too, so a lost job never blocks its caller.
+    """
+    def __init__(self, name: str, workers: int = 1, timeout: float = 300, **options):
+        context = multiprocessing.get_context('spawn')
+        self.name: str = name
+        self.timeout: float = timeout
+        self.jobs: multiprocessing.Queue = context.Queue()
+        self.results: multiprocessing.Queue = context.Queue()
+        self.pending: Dict[int, Future] = {}
+        self.running: Dict[int, int] = {}
+        self.stopped: Set[int] = set()
+        self.counter: itertools.count = itertools.count()
+        self.lock: threading.Lock = threading.Lock()
+        self.closed: bool = False
+        self.error: ConversionError | None = None
+        self.processes = [
+            context.Process(target=_serve, args=(name, options, self.jobs, self.results), daemon=True)
+            for _ in range(max(workers, 1))
+        ]
+
+        for process in self.processes:
+            process.start()
+
+        threading.Thread(target=self._collect, daemon=True).start()
+
+    @property
+    def broken(self) -> bool:
+        return self.error is not None
+
+    def submit(self, method: str, *args) -> Future:
+        future = Future()
+
+        with self.lock:
+            if self.closed:
+                raise ConversionError('The conversion backend was closed')
+            if self.error:
+                raise self.error
+            key = next(self.counter)
+            self.pending[key] = future
+
+        self.jobs.put((key, method, args))
+        return future
+
+    def _collect(self) -> None:
+        while not self.closed:
+            try:
+                key, pid, error = self.results.get(timeout=1)
+            except queue.Empty:
+                if self._reap():
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+
+            if key is None:
+                # A worker could not warm up, its conversions will try again and report the error
+                logger.warning('%s warm up failed: %s', self.name, error)
+            elif error == STARTED:
+                self.running[pid] = key
+                if pid in self.stopped:
+                    # The worker stopped before its start was read
+                    self._resolve(self.running.pop(pid), f'The {self.name} worker stopped during the conversion')
+            else:
+                self.running.pop(pid, None)
+                self._resolve(key, error)
+
+            if self._reap():
+                return
+
+    def _reap(self) -> bool:
+        """ Fails the conversions of the workers that stopped. Returns whether every worker stopped. """
+        for process in self.processes:
+            if process.pid in self.stopped or process.is_alive():
+                continue
+
+            self.stopped.add(process.pid)
+            key = self.running.pop(process.pid, None)
+
+            if key is not None:
+                self._resolve(key, f'The {self.name} worker stopped during the conversion (exit code {process.exitcode})')
+
+        if len(self.stopped) < len(self.processes):
+            return False
+
+        with self.lock:
+            self.error = ConversionError(f'Every {self.name} worker stopped')
+        self._fail_pending(self.error)
+        return True
+
+    def _resolve(self, key: int, error: str | None) -> None:
+        with self.lock:
+            future = self.pending.pop(key, None)
+
+        # Gone when the caller stopped waiting for it, see docx2pdf
+        if future is None:
+            return
+        if error:
+            future.set_exception(ConversionError(error))
+        else:
+            future.set_result(None)
+
+    def _fail_pending(self, error: Exception) -> None:
+        with self.lock:
+            pending, self.pending = self.pending, {}
+
+        for future in pending.values():
+            future.set_exception(error)
+
+    def docx2pdf(self, input_path: str, output_path: str) -> None:
+        future = self.submit('docx2pdf', os.path.abspath(input_path), os.path.abspath(output_path))
+
+        try:
+            future.result(timeout=self.timeout)
+        except ResultTimeout:
+            with self.lock:
+                self.pending = {key: pending for key, pending in self.pending.items() if pending is not future}
+            raise ConversionError(f'The {self.name} conversion took more than {self.timeout} seconds') from None
+
+    def close(self) -> None:
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+
+        for _ in self.processes:
+            self.jobs.put(None)
+
+        for process in self.processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+        self._fail_pending(ConversionError('The conversion backend was closed'))
+
+
+def default_backend_name() -> str:
+    """
+    The backend set by DOCUMENT_FORMS_BACKEND, or Word on Windows and LibreOffice elsewhere.
+    """
+    name = os.environ.get('DOCUMENT_FORMS_BACKEND', '')
+
+    if name:
+        return name
+    if sys.platform == 'win32':
+        return WordBackend.name
+    return LibreOfficeBackend.name
+
+
+def create_backend(name: str = '', workers: int = 1, pool: bool = True, **options) -> ConversionBackend:
+    """
+    Creates a backend by name ('word', 'libreoffice' or 'stub'), by default in a pool of warm worker processes.
+    """
+    name = name or default_backend_name()
+
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown conversion backend "{name}", use one of {list(BACKENDS)}')
+
+    if pool:
+        return WorkerPoolBackend(name, workers=workers, **options)
+
+    backend = BACKENDS[name](**options)
+    backend.warm()
+    return backend
@@ -0,0 +1,77 @@
+from typing import Dict, Optional
+
+from entry_cache import EntryCache
+
+import hashlib
+import json
+import os
+
+
+class ConversionCache(EntryCache):
+    """
+    Persistent, content-addressed cache of converted documents.
+
+    Each entry is a folder named by the hash of the input bytes and the conversion options, holding the
+    derived Word and PDF files and the form compiled from them (see form_template.FormTemplate), so a cached
+    input is opened without any conversion or parsing. Entries are written and evicted as described in
+    entry_cache.EntryCache.
+    """
+    VERSION = 2
+
+    def __init__(self, folder: str = './_internal/.cache/', max_size: int = 1024 ** 3):
+        super().__init__(folder=folder, max_size=max_size)
+
+    @classmethod
+    def key(cls, input_path: str, options: Dict = None) -> str:
+        """
+        Returns the hash of the input file bytes and the conversion options.
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps({'version': cls.VERSION, **(options or {})}, sort_keys=True).encode())
+
+        with open(input_path, 'rb') as file:
+            while chunk := file.read(1024 * 1024):
+                digest.update(chunk)
+
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Returns the manifest of a cached entry with absolute paths, or None if the entry does not exist.
+
+        Manifest keys: word_path, pdf_path and template_path.
+        """
+        entry = self.entry_path(key)
+        manifest = self.read_manifest(key)
+
+        if manifest is None:
+            return None
+
+        paths = ['word_path', 'pdf_path', 'template_path']
+
+        for name in paths:
+            manifest[name] = os.path.join(entry, manifest[name])
+
+        if not all(os.path.isfile(manifest[name]) for name in paths):
+            return None
+
+        self.touch(key)
+        return manifest
+
+    def put(self, key: str, word_path: str | bytes, pdf_path: str | bytes, template: bytes) -> Optional[Dict]:
+        """
+        Stores the converted files and compiled form (see FormTemplate.dumps) of an input and evicts old entries
+        if needed. The Word and PDF files may be given as paths or as their bytes.
+
+        Returns:
+        -------
+        - Optional[Dict]: The stored entry, as returned by get.
+        """
+        manifest = {
+            'word_path': 'document.docx',
+            'pdf_path': 'document.pdf',
+            'template_path': 'document.form.json',
+        }
+        files = {manifest['word_path']: word_path, manifest['pdf_path']: pdf_path, manifest['template_path']: template}
+        self.write_entry(key, files, manifest)
+        return self.get(key)
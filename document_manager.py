@@ -1,23 +1,98 @@
-from docx import Document as ReadWord
-from docx2pdf import convert
-from pdf2docx import Converter
-from pdf2image import convert_from_path
+from form_tokenizer import tokenize, spans_to_parts
+from docx_stream import iter_paragraphs, patch_paragraphs, patch_changes
+from form_template import FormTemplate
+from acroform import AcroForm
+from conversion_cache import ConversionCache
+from export_cache import ExportCache
+from workspace import Workspace
+from page_renderer import PageRenderer
+from image_export import ImageExporter
+from task_scheduler import TaskScheduler, Job, Stage
+from tracing import tracer
+from conversion_backend import ConversionBackend, create_backend
+from render_profile import RenderProfile
+from pdf_conversion import convert_pages, page_count, shutdown_pool
+from pdf_form import overlay_fields
 
-from typing import List, Tuple, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Dict, Iterator, Callable, BinaryIO, Any
+from io import BytesIO
 
-import pythoncom
+import tempfile
+import threading
 import shutil
 import os
-import re
 
 
 class DocumentManager:
-    def __init__(self):
+    """
+    Converts, reads and saves the open document.
+
+    In memory mode (in_memory=True) the Word and PDF files are kept in word_bytes and pdf_bytes and passed
+    between the stages as buffers. word_path and pdf_path then only name the files, and files are written only
+    when exporting: save_changes, and docx2pdf and pdf2images with an output_folder.
+
+    With native_pdf, PDF files are read and filled as PDF (see pdf_form): the fields are found in the text
+    lines of the pages and the values are written over the original pages, without any Word file.
+    Otherwise they are converted to Word and filled like Word files. With first_pages, PDFs converted to Word
+    with more pages can be opened with their first pages while the whole document converts, see open_range.
+
+    The working files of each manager live in its own folder of the session workspace (see folder), removed
+    in the background once the manager is cleared.
+    """
+    native_pdf: bool = True
+    first_pages: int = 0
+    workspace: Workspace = Workspace(root='./_internal/.sessions/', legacy=['./_internal/.documents/'])
+    # The format each export format is made from, None for the filled form, see save_job
+    EXPORT_SOURCES: Dict[str, str | None] = {'docx': None, 'pdf': 'docx', 'images': 'pdf'}
+    NATIVE_EXPORT_SOURCES: Dict[str, str | None] = {'pdf': None, 'docx': 'pdf', 'images': 'pdf'}
+    scheduler: TaskScheduler = TaskScheduler()
+    backend: ConversionBackend | None = None
+    _backend_lock: threading.Lock = threading.Lock()
+
+    def __init__(self, in_memory: bool = False):
+        self.in_memory: bool = in_memory
         self.word_path: str = ''
         self.pdf_path: str = ''
+        self.word_bytes: bytes = b''
+        self.pdf_bytes: bytes = b''
         self.images_paths: List = []
         self.default_path: str = './_internal/'
         self.poppler_path: str = os.path.abspath(path=self.default_path + '.poppler/Library/bin')
+        self.cache: ConversionCache = ConversionCache(folder=self.default_path + '.cache/')
+        self.exports: ExportCache = ExportCache(folder=self.default_path + '.exports/')
+        self.template: FormTemplate | None = None
+        self.acroform: AcroForm | None = None
+        self.key: str = ''
+        self.render_profile: RenderProfile = RenderProfile()
+        self._folder: str = ''
+        self._image_exporter: ImageExporter | None = None
+
+    @property
+    def folder(self) -> str:
+        """ The folder of the working files of the manager, leased from the workspace on first use. """
+        if not self._folder:
+            self._folder = self.workspace.lease()
+        return self._folder
+
+    @property
+    def image_exporter(self) -> ImageExporter:
+        if self._image_exporter is None:
+            self._image_exporter = ImageExporter(
+                poppler_path=self.poppler_path,
+                folder='' if self.in_memory else os.path.join(self.folder, 'pages'),
+                profile=self.render_profile,
+            )
+        # A new profile renders every page again, see ImageExporter.page_hash
+        self._image_exporter.profile = self.render_profile
+        return self._image_exporter
+
+    def adopt_folder(self, other: 'DocumentManager') -> None:
+        """ Takes over the folder of another manager, whose files it adopted, releasing its own. """
+        if self._folder:
+            self.workspace.release(self._folder)
+        self._folder, other._folder = other._folder, ''
+        self._image_exporter = None
 
     def open_path(self, path: str) -> None:
         path = self.file_info(path)['abs_path']
@@ -73,65 +148,281 @@ class DocumentManager:
 
     @staticmethod
     def copy_file_to(input_path: str, output_path: str) -> None:
-        try:
-            shutil.copy(src=input_path, dst=output_path)
-            return True
-        except shutil.SameFileError:
-            return False
+        with tracer.span('copy_file_to'):
+            if tracer.enabled:
+                tracer.annotate(file_size=os.path.getsize(input_path))
+
+            try:
+                shutil.copy(src=input_path, dst=output_path)
+                return True
+            except shutil.SameFileError:
+                return False
+
+    def word_file(self) -> str | BinaryIO:
+        """ The Word file to read from: its path, or a buffer with its bytes in memory mode. """
+        return BytesIO(self.word_bytes) if self.in_memory else self.word_path
+
+    def pdf_file(self) -> str | bytes:
+        """ The PDF file to read from: its path, or its bytes in memory mode. """
+        return self.pdf_bytes if self.in_memory else self.pdf_path
+
+    @property
+    def is_native(self) -> bool:
+        """ Whether the open form was read straight from the PDF file, see native_pdf. """
+        return self.template is not None and self.template.format == 'pdf'
+
+    def read_input(self, input_path: str) -> None:
+        """
+        Loads the input file in memory mode, naming it as if it was copied to the folder of the manager.
+        """
+        output_path = self.change_file_path(path=input_path, folder=self.folder)
+
+        with open(input_path, 'rb') as file:
+            data = file.read()
+
+        if input_path.lower().endswith('.pdf'):
+            self.pdf_path, self.pdf_bytes = output_path, data
+        else:
+            self.word_path, self.word_bytes = output_path, data
+
+    @classmethod
+    def conversion_backend(cls) -> ConversionBackend:
+        """
+        The Word to PDF converter shared by every DocumentManager. Unless one was set, a pool of warm
+        worker processes is created on first use, see conversion_backend.create_backend, and created
+        again if every worker of the previous one stopped.
+        """
+        with cls._backend_lock:
+            if cls.backend is not None and cls.backend.broken:
+                cls.backend.close()
+                cls.backend = None
+            if cls.backend is None:
+                cls.backend = create_backend()
+            return cls.backend
+
+    @classmethod
+    def close_backend(cls) -> None:
+        """ Stops the conversion workers: the conversion backend and the pdf2docx worker pool. """
+        with cls._backend_lock:
+            if cls.backend is not None:
+                cls.backend.close()
+                cls.backend = None
+
+        shutdown_pool()
+
+    @classmethod
+    def warm_up(cls, backend: bool = False) -> threading.Thread:
+        """
+        Imports the converters in a background thread, so the first document opened does not wait for them.
+
+        pdf2docx (with PyMuPDF and OpenCV) and pdf2image are only imported when first used, keeping them out
+        of the startup, so this is meant to run once the window is shown. With backend, the conversion
+        backend is started too, see conversion_backend.
+
+        Returns:
+        -------
+        - threading.Thread: The started warm up thread.
+        """
+        def run() -> None:
+            with tracer.span('warm_up', category='startup'):
+                import pdf2docx  # noqa: F401
+                import pdf2image  # noqa: F401
+
+                if backend:
+                    cls.conversion_backend()
+
+        thread = threading.Thread(target=run, name='warm_up', daemon=True)
+        thread.start()
+        return thread
 
     def docx2pdf(self, output_folder: str = '', save_path: bool = False) -> None:
-        output_folder = output_folder or self.default_path + '.documents/'
-        output_folder = os.path.abspath(output_folder)
+        with tracer.span('docx2pdf'):
+            if tracer.enabled:
+                tracer.annotate(file_size=len(self.word_bytes) if self.in_memory else os.path.getsize(self.word_path))
+            self._docx2pdf(output_folder=output_folder, save_path=save_path)
+
+    def _docx2pdf(self, output_folder: str = '', save_path: bool = False) -> None:
+        if self.in_memory:
+            self.docx2pdf_in_memory(output_folder=output_folder, save_path=save_path)
+            return
+
+        output_folder = os.path.abspath(output_folder or self.folder)
         output_path = self.change_file_path(path=self.word_path, folder=output_folder, ext='.pdf')
                 
         self.create_dir(path=output_path)
-        pythoncom.CoInitialize()
-        file = open(output_path, "wb")
-        file.close()
-        convert(input_path=self.word_path, output_path=output_path)
+        self.conversion_backend().docx2pdf(input_path=self.word_path, output_path=output_path)
         
         if save_path:
             self.pdf_path = output_path
 
-    def pdf2docx(self, output_folder: str = '', save_path: bool = False) -> None:
-        output_folder = output_folder or self.default_path + '.documents/'
-        output_folder = os.path.abspath(output_folder)
+    def docx2pdf_in_memory(self, output_folder: str = '', save_path: bool = False) -> bytes:
+        """
+        Converts word_bytes to PDF. The converters only convert files, so the conversion runs in a temporary folder
+        that is removed right after. The PDF is written to output_folder only when one is given.
+        """
+        output_path = self.change_file_path(
+            path=self.word_path,
+            folder=os.path.abspath(output_folder or self.folder),
+            ext='.pdf',
+        )
+
+        with tempfile.TemporaryDirectory() as folder:
+            input_path = os.path.join(folder, 'document.docx')
+            temp_path = os.path.join(folder, 'document.pdf')
+
+            with open(input_path, 'wb') as file:
+                file.write(self.word_bytes)
+
+            self.conversion_backend().docx2pdf(input_path=input_path, output_path=temp_path)
+
+            with open(temp_path, 'rb') as file:
+                data = file.read()
+
+        if output_folder:
+            self.create_dir(path=output_path)
+            with open(output_path, 'wb') as file:
+                file.write(data)
+
+        if save_path:
+            self.pdf_path, self.pdf_bytes = output_path, data
+
+        return data
+
+    def pdf2docx(self, output_folder: str = '', save_path: bool = False, pages: Tuple[int, int] | None = None,
+                 on_progress: Callable[[int, int], None] | None = None) -> None:
+        """
+        Converts the PDF file to Word, in page chunks parsed in parallel (see pdf_conversion.convert_pages).
+
+        Parameters:
+        ----------
+        - output_folder (str): The folder of the Word file, the folder of the manager by default.
+        - save_path (bool): Keeps the converted file as the Word file of the manager.
+        - pages (Tuple[int, int] | None): The first and last pages to convert, starting from 1. Every page by default.
+        - on_progress (Callable[[int, int], None]): Called with the converted and total pages as chunks finish.
+        """
+        with tracer.span('pdf2docx'):
+            if tracer.enabled:
+                tracer.annotate(file_size=len(self.pdf_bytes) if self.in_memory else os.path.getsize(self.pdf_path))
+            self._pdf2docx(output_folder=output_folder, save_path=save_path, pages=pages, on_progress=on_progress)
+
+    def _pdf2docx(self, output_folder: str = '', save_path: bool = False, pages: Tuple[int, int] | None = None,
+                  on_progress: Callable[[int, int], None] | None = None) -> None:
+        output_folder = os.path.abspath(output_folder or self.folder)
         abs_path = self.file_info(path=self.pdf_path)['abs_path']
         output_path = self.change_file_path(path=abs_path, folder=output_folder, ext='.docx')
+        start, end = (pages[0] - 1, pages[1]) if pages else (0, None)
+
+        if self.in_memory:
+            buffer = BytesIO()
+            converted = convert_pages(self.pdf_bytes, buffer, start=start, end=end, on_progress=on_progress)
+            tracer.annotate(pages=converted)
+
+            if save_path:
+                self.word_path, self.word_bytes = output_path, buffer.getvalue()
+            return
 
         self.create_dir(path=output_path)
-        cv = Converter(pdf_file=abs_path)
-        cv.convert(docx_filename=output_path, start=0)
-        cv.close()
+        converted = convert_pages(abs_path, output_path, start=start, end=end, on_progress=on_progress)
+        tracer.annotate(pages=converted)
 
         if save_path:
             self.word_path = output_path
-            
-    def pdf2images(self, output_folder: str = '', single_file: bool = False, save_path: bool = False) -> List[str]:
-        output_folder = output_folder or self.default_path + '.documents/images'
-        output_folder = os.path.abspath(output_folder)
+
+    def pdf2images(self, output_folder: str = '', single_file: bool = False, save_path: bool = False,
+                   profile: RenderProfile | None = None, on_page: Callable[[int, str], None] | None = None) -> List[str]:
+        """
+        Saves the pages of the PDF file as images named <name>-<page>, with the format, dpi and size of
+        the render profile (self.render_profile by default, see render_profile.RenderProfile).
+
+        The pages are rendered in chunks by profile.workers threads, each one running poppler on its own
+        page range, and every page is saved as soon as its chunk is rendered. Memory and temporary files
+        are bounded by the chunks in flight instead of growing with the document.
+
+        Parameters:
+        ----------
+        - output_folder (str): The folder of the images, 'images' in the folder of the manager by default.
+        - single_file (bool): Saves only the first page, named <name> without the page number.
+        - save_path (bool): Keeps the paths in images_paths.
+        - profile (RenderProfile): Overrides the render profile of the manager.
+        - on_page (Callable[[int, str], None]): Called with the page number (starting from 1) and path of
+          every saved image, from the render threads, in the order they are saved.
+
+        Returns:
+        -------
+        - List[str]: The paths of the images, in page order.
+        """
+        from pdf2image import convert_from_path, convert_from_bytes, pdfinfo_from_path, pdfinfo_from_bytes
+
+        profile = profile or self.render_profile
+        output_folder = os.path.abspath(output_folder or os.path.join(self.folder, 'images'))
         file_name = self.file_info(path=self.pdf_path)['base_name']
         self.create_dir(path=output_folder, is_dir=True)
+        options = profile.convert_options(poppler_path=self.poppler_path)
+
+        if self.in_memory:
+            page_count = pdfinfo_from_bytes(self.pdf_bytes, poppler_path=self.poppler_path)['Pages']
+        else:
+            page_count = pdfinfo_from_path(self.pdf_path, poppler_path=self.poppler_path)['Pages']
+
+        last_page = min(page_count, 1) if single_file else page_count
+        width = len(str(page_count))
+        chunks = profile.chunks(first=1, last=last_page)
+        paths: Dict[int, str] = {}
+
+        def render(chunk: Tuple[int, int]) -> None:
+            first, last = chunk
+            if self.in_memory:
+                images = convert_from_bytes(self.pdf_bytes, first_page=first, last_page=last, **options)
+            else:
+                images = convert_from_path(self.pdf_path, first_page=first, last_page=last, **options)
+
+            for page, image in enumerate(images, start=first):
+                name = file_name if single_file else f'{file_name}-{page:0{width}d}'
+                path = os.path.join(output_folder, name + profile.ext)
+                profile.save(image, path)
+                image.close()
+                paths[page] = path
+
+                if on_page:
+                    on_page(page, path)
+
+        with tracer.span('pdf2images'):
+            tracer.annotate(pages=last_page, chunks=len(chunks), workers=profile.workers, **profile.key())
+
+            with ThreadPoolExecutor(max_workers=max(min(profile.workers, len(chunks)), 1)) as pool:
+                # Consuming the results raises the first render error
+                list(pool.map(render, chunks))
+
+        images = [paths[page] for page in sorted(paths)]
 
-        images = convert_from_path(
-            pdf_path=self.pdf_path,
-            fmt='png',
-            thread_count=6,
-            output_folder=output_folder,
-            single_file=single_file,
-            output_file=file_name,
-            poppler_path=self.poppler_path,
-            paths_only=True,
-        )
-        
         if save_path:
             self.images_paths = images
-        
+
         return images
 
+    def page_renderer(self) -> PageRenderer:
+        """
+        Returns a renderer that rasterizes the pages of the PDF file on demand.
+        """
+        return PageRenderer(pdf_path=self.pdf_path, poppler_path=self.poppler_path, pdf_bytes=self.pdf_bytes if self.in_memory else b'')
+
+    def iter_form_rows(self) -> Iterator[Tuple[List[str], str]]:
+        """
+        Streams the form rows of the docx file, see extract_form_rows.
+
+        The paragraphs are read incrementally from word/document.xml (table cells included), then
+        from the headers and footers, so rows can be consumed before the whole document is parsed.
+        Opening a document does not stream them to the viewer: the form is compiled first, see open_job.
+        """
+        for text, align in iter_paragraphs(self.word_file()):
+            yield spans_to_parts(tokenize(text)), align
+
     def extract_form_rows(self) -> List[Tuple[List[str], str]]:
         """ Extracts form rows from a docx file 
         
+        Each paragraph is split by a single pass of the field tokenizer (see form_tokenizer.tokenize).
+        Paragraphs of tables, headers and footers are included, in the order of iter_form_rows.
+        
         Types:
         -----
         - @TF (TextField) 
@@ -143,7 +434,7 @@ class DocumentManager:
             Paragraph: "Something too" align: LEFT \n
             return [
                 (
-                    ["Something ", "___ @TF", "( X )@CB"], CENTER
+                    ["Something ", "____@TF", " ", "( X )@CB"], CENTER
                 ),
                 (
                     ["Something too"], LEFT
@@ -155,6 +446,7 @@ class DocumentManager:
             - '____'
             - ': Something'
             - '01/01/2000'
+            - '01 de julho de 2004'
             - '2010' or 'n°2010' or 'n° 2010' Not for while
             - '( X )' or '( )' ...
             
@@ -162,83 +454,545 @@ class DocumentManager:
         -------
             List[Tuple[List[str], str]]: list of tuples (texts list, align)
         """
-        word = ReadWord(self.word_path)
-        paragraphs = []
+        return list(self.iter_form_rows())
 
-        for paragraph in word.paragraphs:     
-            text = paragraph.text
-            align = paragraph.alignment.name if paragraph.alignment else 'LEFT'         
-                    
-            text = re.sub(r'_+', lambda match: # '____'   
-                "#SM" + match.group(0) + "@TF#SM", text)  
-            
-            text = re.sub(r':(\s\w+[^.]*(?!.)*)+', # ': Something'
-                lambda match: "#SM" + match.group(0) + "@TF#SM", text)
-                        
-            text = re.sub(r'(:\s*(?!\s*\(|\s{0,1}\b|\s*#))', # ':        '
-                lambda match: "#SM" + match.group(1) + "@TF#SM", text)
-                                    
-            text = re.sub(r'\d{2}/\d{2}/\d{4}', lambda match: # '01/01/2000'
-                "#SM" + match.group(0) + "@TF#SM", text)
-            
-            text = re.sub(r'\d{2} de \w+ de (\d{4})', # '01 de julho de 2004'
-                lambda match: "#SM" + match.group(0) + "@TF#SM", text)
-            
-            # text = re.sub(r'(n°)*(\s{0,1}\d{4})\s', # '2010' or 'n°2010' or 'n° 2010'
-            #     lambda match: "#SM" + match.group(0) + "@TF#SM", text, flags=re.IGNORECASE)
-            
-            text = re.sub(r'\(\s*(?:x\s*)?\)', # '( X )' or '( )' ...
-                '#SM@CB#SM', text, flags=re.IGNORECASE)
-            
-            # '#SM' Is a Split Mark what will be used to split the text in the list "paragraphs".
-            parts = text.split('#SM')
-            paragraphs.append((parts, align))
+    def load_template(self, source_path: str, persist: bool = True, native: bool = False,
+                      pages: Tuple[int, int] | None = None) -> FormTemplate:
+        """
+        Loads the compiled form saved next to the source document, or compiles it from the Word file
+        and tries to save it there for the next time.
 
-        return paragraphs
+        Parameters:
+        ----------
+        - source_path (str): The document the user opened, .docx or .pdf.
+        - persist (bool): Uses the saved form. False always compiles the Word file without saving it,
+          e.g. when only some pages of the source were converted.
+        - native (bool): Compiles the form from the PDF file instead, see FormTemplate.compile_pdf.
+        - pages (Tuple[int, int] | None): With native, the first and last pages of the form, starting from 1.
+        """
+        path = FormTemplate.path(source_path)
+
+        with tracer.span('extract_form_rows'):
+            template = FormTemplate.load(path, source_path=source_path, format='pdf' if native else 'docx') if persist else None
+            compiled = template is None
+
+            if compiled and native:
+                template = FormTemplate.compile_pdf(self.pdf_file(), source_path=source_path, pages=pages)
+                if persist:
+                    template.save(path)
+            elif compiled:
+                template = FormTemplate.compile(word_path=self.word_file(), source_path=source_path)
+                if persist:
+                    template.save(path)
+
+            tracer.annotate(paragraphs=len(template.paragraphs), fields=len(template.fields), compiled=compiled)
+
+        self.template = template
+        return template
+
+    def load_acroform(self) -> AcroForm:
+        """
+        Returns the fillable PDF of the open form (see acroform.AcroForm), built from the PDF file the first time
+        and saved in ./_internal/.acroforms/ by the hash of the source document, so it is built once per template.
+        """
+        if self.template is None:
+            raise ValueError('No form is open')
 
-    def save_changes(self, save_folder: str = '', paragraphs: List[str] = []) -> None:
+        if self.acroform is None or self.acroform.source_hash != self.template.source_hash:
+            path = os.path.join(os.path.abspath(self.default_path + '.acroforms/'), self.template.source_hash + '.pdf')
+
+            with tracer.span('load_acroform'):
+                acroform = AcroForm.load(path, self.template)
+
+                if acroform is None:
+                    acroform = AcroForm.build(self.pdf_file(), self.template, path=path)
+                    tracer.annotate(fields=len(self.template.fields), missing=len(acroform.missing))
+
+            self.acroform = acroform
+
+        return self.acroform
+
+    def save_acroform(self, output_folder: str, values: Dict[int, Any]) -> str:
+        """
+        Saves the form as a fillable PDF with the values, by field index, written into its fields.
+        No conversion is needed, see load_acroform.
+
+        Returns:
+        -------
+        - str: The path of the saved PDF.
+        """
+        output_path = self.change_file_path(self.word_path or self.pdf_path, folder=os.path.abspath(output_folder), ext='.pdf')
+        acroform = self.load_acroform()
+
+        with tracer.span('fill_acroform', fields=len(values)):
+            acroform.fill(values, output_path=output_path)
+
+        return output_path
+
+    def conversion_options(self, input_path: str, pages: Tuple[int, int] | None = None, native: bool = False) -> Dict:
+        """
+        Returns the options that change the converted files of an input, part of its cache key.
+        """
+        options = {'ext': self.file_info(path=input_path)['ext'].lower(), 'fmt': self.render_profile.fmt}
+
+        if pages:
+            options['pages'] = list(pages)
+
+        if native:
+            options['native'] = True
+
+        return options
+
+    def restore_cached(self, key: str, input_path: str) -> FormTemplate | None:
+        """
+        Loads the converted files and compiled form of an input from the cache, skipping every conversion
+        and the parsing of the Word file, whether or not a template could be saved next to the input.
+
+        The Word and PDF files are copied to the folder of the manager, since they are overwritten when saving,
+        or read in memory mode. Page images are not cached, they are rendered on demand (see page_renderer).
+
+        Returns:
+        -------
+        - FormTemplate | None: The cached form, or None if the input is not cached.
+        """
+        entry = self.cache.get(key)
+        # The key already covers the bytes of the input, so the hash of the template is not checked again
+        template = FormTemplate.load(entry['template_path'], format='docx') if entry else None
+
+        if template is None:
+            return None
+
+        output_folder = self.folder
+        self.word_path = self.change_file_path(path=input_path, folder=output_folder, ext='.docx')
+        self.pdf_path = self.change_file_path(path=input_path, folder=output_folder, ext='.pdf')
+
+        if self.in_memory:
+            with open(entry['word_path'], 'rb') as file:
+                self.word_bytes = file.read()
+            with open(entry['pdf_path'], 'rb') as file:
+                self.pdf_bytes = file.read()
+            return template
+
+        self.create_dir(path=self.word_path)
+        self.copy_file_to(input_path=entry['word_path'], output_path=self.word_path)
+        self.copy_file_to(input_path=entry['pdf_path'], output_path=self.pdf_path)
+
+        return template
+
+    def store_cached(self, key: str) -> None:
+        """
+        Stores the current converted files and compiled form (see load_template) in the cache.
+        """
+        if self.in_memory:
+            self.cache.put(key, self.word_bytes, self.pdf_bytes, self.template.dumps())
+        else:
+            self.cache.put(key, self.word_path, self.pdf_path, self.template.dumps())
+
+    def save_changes(self, save_folder: str = '', paragraphs: List[str] = [], file_name: str = '') -> str:
         """
         Saves the changes made to the Word document.
 
+        Only the runs of changed paragraphs are rewritten (see docx_stream.patch_paragraphs), so the
+        formatting is kept and saving a few edited fields does not rewrite the whole document.
+
         Parameters:
         -----------
         - save_path (str): The path where the changes should be saved.
-        - paragraphs (List[str]): The list of paragraphs that have been modified.
+        - paragraphs (List[str]): The list of paragraphs that have been modified,
+          in the same order as the rows of extract_form_rows.
+        - file_name (str): The name of the saved file, without extension. The default is the name of the Word file.
+
+        With a compiled form (see load_template), the changed paragraphs are known without reading the
+        document and only the story parts holding them are parsed.
+
+        Returns:
+        -------
+        - str: The path of the saved file.
         """
-        pythoncom.CoUninitialize()
-        word = ReadWord(self.word_path)
-        
-        save_folder = save_folder or self.default_path + '.documents/'
-        save_folder = os.path.abspath(save_folder)
-        save_path = self.change_file_path(self.word_path, folder=save_folder)
-                
-        for index, paragraph in enumerate(word.paragraphs):
-            paragraph.text = paragraphs[index]
+        save_folder = os.path.abspath(save_folder or self.folder)
+        save_path = self.change_file_path(self.word_path, folder=save_folder, file_name=file_name)
+        self.create_dir(path=save_path)
                 
-        word.save(save_path)
+        self.patch(dst=save_path, paragraphs=paragraphs)
+        return save_path
+
+    def patch(self, dst: str | BinaryIO, paragraphs: List[str]) -> int:
+        with tracer.span('save_changes'):
+            if self.template:
+                changed = patch_changes(src=self.word_file(), dst=dst, changes=self.template.changes(paragraphs))
+            else:
+                changed = patch_paragraphs(src=self.word_file(), dst=dst, paragraphs=paragraphs)
+
+            tracer.annotate(paragraphs=len(paragraphs), changed=changed)
+            return changed
+
+    def changed_bytes(self, paragraphs: List[str]) -> bytes:
+        """ Returns the Word file with the changes, like save_changes, without writing any file. """
+        buffer = BytesIO()
+        self.patch(dst=buffer, paragraphs=paragraphs)
+        return buffer.getvalue()
+
+    def save_overlay(self, save_folder: str = '', values: Dict[int, Any] | None = None, file_name: str = '') -> str:
+        """
+        Saves a PDF form read natively (see native_pdf) with the values, by field index, written over its pages.
+
+        Returns:
+        -------
+        - str: The path of the saved PDF.
+        """
+        save_folder = os.path.abspath(save_folder or self.folder)
+        save_path = self.change_file_path(self.pdf_path, folder=save_folder, file_name=file_name, ext='.pdf')
+        self.create_dir(path=save_path)
+        self.overlay(dst=save_path, values=values or {})
+        return save_path
+
+    def overlay(self, dst: str | BinaryIO, values: Dict[int, Any]) -> int:
+        with tracer.span('save_changes'):
+            changed = overlay_fields(self.pdf_file(), dst, self.template.fields, values)
+            tracer.annotate(fields=len(values), changed=changed)
+            return changed
+
+    def overlay_bytes(self, values: Dict[int, Any]) -> bytes:
+        """ Returns the PDF file with the values, like save_overlay, without writing any file. """
+        buffer = BytesIO()
+        self.overlay(dst=buffer, values=values)
+        return buffer.getvalue()
+
+    def open_job(self, input_path: str, pages: Tuple[int, int] | None = None, **callbacks) -> Job:
+        """
+        Opens a document in the background: copy, conversion, form rows and page renderer.
+        The rows only need the Word file and the renderer only needs the PDF, so one of them runs
+        alongside the conversion. A previously converted input is restored from the cache instead,
+        with its compiled form. Otherwise the rows come from the compiled form saved next to the input
+        when there is one.
+        PDF conversions report the converted pages as the progress of the convert stage.
+        PDFs read natively (see native_pdf) have no convert stage and are not stored in the cache,
+        their form is read from the PDF file alongside the page renderer.
+
+        The work is done by a separate DocumentManager whose paths are adopted only when the job is done,
+        so a cancelled job never changes the open document.
+
+        Parameters:
+        ----------
+        - input_path (str): The .docx or .pdf file to open.
+        - pages (Tuple[int, int] | None): For a PDF, the first and last pages of the form, starting from 1,
+          so the first pages of a long document can be filled without converting the others.
+        - callbacks: on_progress, on_done, on_error and on_cancel, see task_scheduler.Job.
+
+        Returns:
+        -------
+        - Job: The submitted job. When it is done, job.results['rows'] and job.results['renderer'] hold the form.
+        """
+        worker = DocumentManager(in_memory=self.in_memory)
+        is_pdf = input_path.lower().endswith('.pdf')
+        native = is_pdf and self.native_pdf
+        pages = pages if is_pdf else None
+
+        def lookup(_: Job) -> Tuple[str, FormTemplate | None]:
+            key = self.cache.key(input_path, self.conversion_options(input_path, pages=pages, native=native))
+            # Nothing is converted for a native PDF, only its key is needed
+            return key, None if native else worker.restore_cached(key=key, input_path=input_path)
+
+        def is_cached(job: Job) -> bool:
+            return job.results['lookup'][1] is not None
+
+        def copy(job: Job) -> None:
+            if is_cached(job):
+                return
+
+            if worker.in_memory:
+                worker.read_input(input_path)
+                return
+
+            output_path = worker.change_file_path(path=input_path, folder=worker.folder)
+            worker.create_dir(path=output_path)
+            worker.copy_file_to(input_path=input_path, output_path=output_path)
+            abs_output_path = worker.file_info(path=output_path)['abs_path']
+
+            if is_pdf:
+                worker.pdf_path = abs_output_path
+            else:
+                worker.word_path = abs_output_path
+
+        def convert(job: Job) -> None:
+            if is_cached(job):
+                return
+
+            if is_pdf:
+                worker.pdf2docx(
+                    save_path=True,
+                    pages=pages,
+                    on_progress=lambda done, total: job.report('convert', done / total, f'{done}/{total} páginas'),
+                )
+            else:
+                worker.docx2pdf(save_path=True)
+
+        def rows(job: Job) -> List[Tuple[List[str], str]]:
+            if is_cached(job):
+                worker.template = job.results['lookup'][1]
+                return worker.template.rows
+
+            # The template is compiled from the streamed paragraphs (see docx_stream.iter_layout), keeping the memory
+            # flat while parsing, but the viewer only gets its rows once it is compiled, since the field indexes
+            # and the cache entry need every row
+            return worker.load_template(source_path=input_path, persist=pages is None, native=native, pages=pages).rows
+
+        def renderer(_: Job) -> PageRenderer:
+            page_renderer = worker.page_renderer()
+            tracer.annotate(pages=page_renderer.page_count)
+            return page_renderer
+
+        def on_done(job: Job) -> None:
+            self.word_path = worker.word_path
+            self.pdf_path = worker.pdf_path
+            self.word_bytes = worker.word_bytes
+            self.pdf_bytes = worker.pdf_bytes
+            self.images_paths = worker.images_paths
+            self.template = worker.template
+            self.adopt_folder(worker)
+
+            key, cached = job.results['lookup']
+            self.key = key
+            if cached is None and not native:
+                self.store_cached(key=key)
+
+            callbacks.get('on_done', lambda _: None)(job)
+
+        def on_cancel(job: Job) -> None:
+            worker.clear()
+            callbacks.get('on_cancel', lambda _: None)(job)
+
+        def on_error(job: Job, error: Exception) -> None:
+            worker.clear()
+            callbacks.get('on_error', lambda *_: None)(job, error)
+
+        stages = [
+            Stage('lookup', lookup, title='Procurando conversões anteriores'),
+            Stage('copy', copy, depends=['lookup'], title='Copiando arquivo'),
+        ]
+
+        if not native:
+            stages.append(Stage('convert', convert, depends=['copy'], title='Convertendo para Word' if is_pdf else 'Convertendo para PDF'))
+
+        stages += [
+            Stage('rows', rows, depends=['convert'] if is_pdf and not native else ['copy'], title='Extraindo campos'),
+            Stage('renderer', renderer, depends=['copy'] if is_pdf else ['convert'], title='Preparando páginas'),
+        ]
+
+        return self.scheduler.submit(Job(
+            stages,
+            on_progress=callbacks.get('on_progress'),
+            on_done=on_done,
+            on_error=on_error,
+            on_cancel=on_cancel,
+            name='open_file',
+        ))
+
+    def open_range(self, input_path: str) -> Tuple[int, int] | None:
+        """
+        The pages to open first (see open_job): the first_pages pages of a PDF converted to Word with more pages
+        than that, or None to open the whole document.
+        """
+        if not self.first_pages or self.native_pdf or not input_path.lower().endswith('.pdf'):
+            return None
+
+        return (1, self.first_pages) if page_count(input_path) > self.first_pages else None
+
+    def export_key(self, fmt: str, paragraphs: List[str], values: Dict[int, Any] | None = None) -> str:
+        """ The key of the open form in an export format and state, see export_cache.ExportCache.state_key. """
+        options = {
+            'source': self.template.source_hash if self.template else '',
+            'name': self.file_info(path=self.word_path or self.pdf_path)['base_name'],
+            'native': self.is_native,
+        }
+
+        if fmt == 'images':
+            options['profile'] = self.render_profile.key()
+
+        return self.exports.state_key(fmt, values if values is not None else list(paragraphs), options)
+
+    def save_job(self, kind: str, output_folder: str, paragraphs: List[str] = (), values: Dict[int, Any] | None = None,
+                 **callbacks) -> Job:
+        """
+        Saves the form in the background.
+
+        The Word file is never overwritten: for PDF and images the filled copy is saved in a separate folder
+        and converted from there, so the compiled form always matches the open document.
+        Images are exported incrementally: only the pages that changed since the last export are rendered
+        again (see image_export.ImageExporter). A fillable PDF skips the Word file and the conversion,
+        see save_acroform.
+
+        A PDF read natively (see native_pdf) is filled by writing the values over its pages (see save_overlay),
+        so PDF and images need no conversion, and Word is converted from the filled PDF.
+
+        'all' exports every format in a single job: the form is filled once and each format is made from
+        the one before it (EXPORT_SOURCES), the independent ones at the same time. Formats already exported
+        in the same state are copied from the export cache (see export_cache.ExportCache) instead, and
+        the files they would be made from are not made at all.
+
+        Parameters:
+        ----------
+        - kind (str): 'docx', 'pdf', 'images', 'all' or 'acroform'.
+        - output_folder (str): The folder where the file(s) will be saved.
+        - paragraphs (List[str]): The paragraphs of the form, see save_changes.
+        - values (Dict[int, Any]): The changed field values by field index, for 'acroform' and native PDFs.
+          Also the state of the export cache, the paragraphs by default.
+        - callbacks: on_progress, on_done, on_error and on_cancel, see task_scheduler.Job.
+        """
+        if kind == 'acroform':
+            stage = Stage('acroform', lambda _: self.save_acroform(output_folder, values or {}), title='Preenchendo PDF')
+            return self.scheduler.submit(Job([stage], name='save_acroform', **callbacks))
+
+        native = self.is_native
+        sources = self.NATIVE_EXPORT_SOURCES if native else self.EXPORT_SOURCES
+        kinds = list(sources) if kind == 'all' else [kind]
+        keys = {fmt: self.export_key(fmt, paragraphs, values) for fmt in sources}
+        output_folder = os.path.abspath(output_folder)
+        # The files that are not exported are made in the folder of filled, released when the job ends
+        filled = DocumentManager(in_memory=self.in_memory)
+
+        # The exported formats and the ones they are made from
+        chain = set()
+        for fmt in kinds:
+            while fmt and fmt not in chain:
+                chain.add(fmt)
+                fmt = sources[fmt]
+
+        def folder(fmt: str) -> str:
+            return output_folder if fmt in kinds else filled.folder
+
+        def adopt(fmt: str, path: str) -> None:
+            """ Makes the file of a format the source of the formats made from it. """
+            data = b''
+            if filled.in_memory:
+                with open(path, 'rb') as file:
+                    data = file.read()
+
+            if fmt == 'docx':
+                filled.word_path, filled.word_bytes = path, data
+            else:
+                filled.pdf_path, filled.pdf_bytes = path, data
+
+        def store(fmt: str, paths: List[str]) -> List[str] | None:
+            if fmt not in kinds:
+                return None
+            self.exports.put(keys[fmt], paths)
+            return paths
+
+        def needed(job: Job, fmt: str) -> bool:
+            if fmt in job.results['lookup']:
+                return False
+            return fmt in kinds or any(needed(job, other) for other in chain if sources[other] == fmt)
+
+        def lookup(_: Job) -> Dict[str, List[str]]:
+            restored = {}
+
+            for fmt in sources:
+                if fmt not in chain:
+                    continue
+
+                paths = self.exports.restore(keys[fmt], output_folder) if fmt in kinds else self.exports.get(keys[fmt])
+
+                if paths is not None:
+                    restored[fmt] = paths
+                    if fmt != 'images':
+                        adopt(fmt, paths[0])
+
+            tracer.annotate(restored=sorted(restored))
+            return restored
+
+        def docx(job: Job) -> List[str] | None:
+            if not needed(job, 'docx'):
+                return None
+
+            if native:
+                filled.pdf2docx(output_folder=folder('docx'), save_path=True)
+                if filled.in_memory:
+                    self.create_dir(path=filled.word_path)
+                    with open(filled.word_path, 'wb') as file:
+                        file.write(filled.word_bytes)
+            elif filled.in_memory:
+                filled.word_path = self.change_file_path(self.word_path, folder=folder('docx'))
+                filled.word_bytes = self.changed_bytes(paragraphs=paragraphs)
+                if 'docx' in kinds:
+                    self.create_dir(path=filled.word_path)
+                    with open(filled.word_path, 'wb') as file:
+                        file.write(filled.word_bytes)
+            else:
+                filled.word_path = self.save_changes(save_folder=folder('docx'), paragraphs=paragraphs)
+
+            return store('docx', [filled.word_path])
+
+        def pdf(job: Job) -> List[str] | None:
+            if not needed(job, 'pdf'):
+                return None
+
+            if native and filled.in_memory and 'pdf' not in kinds:
+                filled.pdf_path = self.change_file_path(self.pdf_path, folder=filled.folder)
+                filled.pdf_bytes = self.overlay_bytes(values=values or {})
+            elif native:
+                adopt('pdf', self.save_overlay(save_folder=folder('pdf'), values=values))
+            else:
+                # In memory, a PDF that is not exported is only kept in filled.pdf_bytes
+                pdf_folder = output_folder if 'pdf' in kinds else '' if filled.in_memory else filled.folder
+                filled.docx2pdf(output_folder=pdf_folder, save_path=True)
+
+            return store('pdf', [filled.pdf_path])
+
+        def images(job: Job) -> List[str] | None:
+            if not needed(job, 'images'):
+                return None
+
+            # Pages already exported with the same content are copied instead of rendered again
+            base_name = self.file_info(path=filled.pdf_path)['base_name']
+            return store('images', self.image_exporter.export(filled.pdf_file(), output_folder, base_name, paragraphs))
+
+        makers = {'docx': docx, 'pdf': pdf, 'images': images}
+        titles = {
+            'docx': 'Convertendo para Word' if native else 'Salvando Word',
+            'pdf': 'Salvando PDF' if native else 'Convertendo para PDF',
+            'images': 'Gerando imagens',
+        }
+        stages = [Stage('lookup', lookup, title='Procurando exportações anteriores')]
+        stages += [Stage(fmt, makers[fmt], depends=[sources[fmt] or 'lookup'], title=titles[fmt]) for fmt in sources if fmt in chain]
+
+        def release(name: str) -> Callable[..., None]:
+            callback = callbacks.get(name)
+
+            def run(job: Job, *args) -> None:
+                filled.clear()
+                if callback:
+                    callback(job, *args)
+
+            return run
+
+        names = {'docx': 'save_word', 'pdf': 'save_pdf', 'images': 'save_images', 'all': 'save_all'}
+        return self.scheduler.submit(Job(
+            stages,
+            on_progress=callbacks.get('on_progress'),
+            on_done=release('on_done'),
+            on_error=release('on_error'),
+            on_cancel=release('on_cancel'),
+            name=names[kind],
+        ))
 
     def clear(self) -> None:
         """
         Clears the internal state of the DocumentManager class. \n
-        Temporary Word and PDF files are removed from the disk including the extracted images.
-        """                
-        try:
-            os.remove(self.word_path)
-        except:
-            pass
-        finally:
-            self.word_path = ''
-
-        try:
-            os.remove(self.pdf_path)
-        except:
-            pass
-        finally:
-            self.pdf_path = ''
-            
-        for image in self.images_paths:
-            try:
-                os.remove(image)
-            except:
-                pass
+        Nothing is removed from the disk here: the folder of the manager, with the temporary Word and PDF files
+        and the extracted images, is released to the workspace, which removes it in the background
+        (see workspace.Workspace). Files outside of it, like exported files, are kept.
+        """
+        self.word_bytes = b''
+        self.pdf_bytes = b''
+        self.word_path = ''
+        self.pdf_path = ''
         self.images_paths = []
+        self.template = None
+        self.acroform = None
+        self.key = ''
+        self._image_exporter = None
+
+        if self._folder:
+            self.workspace.release(self._folder)
+            self._folder = ''
@@ -0,0 +1,450 @@
+from typing import Iterator, List, Tuple, Dict, NamedTuple, BinaryIO
+from difflib import SequenceMatcher
+from lxml import etree
+
+import copy
+import os
+import re
+import shutil
+import struct
+import zipfile
+
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W_P = f'{{{W_NS}}}p'
+W_R = f'{{{W_NS}}}r'
+W_T = f'{{{W_NS}}}t'
+W_BR = f'{{{W_NS}}}br'
+W_HYPERLINK = f'{{{W_NS}}}hyperlink'
+W_PPR = f'{{{W_NS}}}pPr'
+W_JC = f'{{{W_NS}}}jc'
+W_VAL = f'{{{W_NS}}}val'
+W_TYPE = f'{{{W_NS}}}type'
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+RUN_TEXTS = {
+    f'{{{W_NS}}}tab': '\t',
+    f'{{{W_NS}}}ptab': '\t',
+    f'{{{W_NS}}}cr': '\n',
+    f'{{{W_NS}}}noBreakHyphen': '-',
+}
+
+# Same names as python-docx WD_PARAGRAPH_ALIGNMENT, so rows look the same whichever reader produced them.
+ALIGNMENTS = {
+    'left': 'LEFT',
+    'start': 'LEFT',
+    'center': 'CENTER',
+    'right': 'RIGHT',
+    'end': 'RIGHT',
+    'both': 'JUSTIFY',
+    'distribute': 'DISTRIBUTE',
+}
+
+class ParagraphLayout(NamedTuple):
+    part: str
+    index: int
+    text: str
+    align: str
+    runs: List[Tuple[int, int]]
+
+
+_STORY_PART = re.compile(r'^word/(document|header(\d*)|footer(\d*))\.xml$')
+
+
+def story_parts(names: List[str]) -> List[str]:
+    """
+    Returns the parts of a .docx package that hold paragraphs, in the order they are read and written:
+    the main document (including table cells), then headers, then footers.
+
+    Parameters:
+    ----------
+    - names (List[str]): The zip member names (or package part names without the leading '/').
+    """
+    def order(name: str) -> Tuple[int, int]:
+        kind, header, footer = _STORY_PART.match(name).groups()
+        if kind == 'document':
+            return 0, 0
+        if kind.startswith('header'):
+            return 1, int(header or 0)
+        return 2, int(footer or 0)
+
+    return sorted((name for name in names if _STORY_PART.match(name)), key=order)
+
+
+def is_story_paragraph(paragraph: etree._Element) -> bool:
+    """ Paragraphs nested in another paragraph (text boxes) belong to the outer one and are skipped. """
+    return next(paragraph.iterancestors(W_P), None) is None
+
+
+def iter_story_paragraphs(root: etree._Element) -> Iterator[etree._Element]:
+    for paragraph in root.iter(W_P):
+        if is_story_paragraph(paragraph):
+            yield paragraph
+
+
+def iter_runs(paragraph: etree._Element) -> Iterator[etree._Element]:
+    """ Runs that make up the paragraph text, the same ones python-docx reads for Paragraph.text. """
+    for child in paragraph:
+        if child.tag == W_R:
+            yield child
+        elif child.tag == W_HYPERLINK:
+            yield from child.iterchildren(W_R)
+
+
+def run_text(run: etree._Element) -> str:
+    texts = []
+
+    for child in run:
+        if child.tag == W_T:
+            texts.append(child.text or '')
+        elif child.tag == W_BR:
+            # Page and column breaks are not part of the text
+            if child.get(W_TYPE) in (None, 'textWrapping'):
+                texts.append('\n')
+        elif child.tag in RUN_TEXTS:
+            texts.append(RUN_TEXTS[child.tag])
+
+    return ''.join(texts)
+
+
+def paragraph_text(paragraph: etree._Element) -> str:
+    return ''.join(run_text(run) for run in iter_runs(paragraph))
+
+
+def paragraph_alignment(paragraph: etree._Element) -> str:
+    ppr = paragraph.find(W_PPR)
+    jc = ppr.find(W_JC) if ppr is not None else None
+    value = jc.get(W_VAL) if jc is not None else None
+    return ALIGNMENTS.get(value, value.upper() if value else 'LEFT')
+
+
+def iter_layout(docx_path: str | BinaryIO) -> Iterator[ParagraphLayout]:
+    """
+    Streams the paragraphs of a .docx file straight from its zip, without building the python-docx DOM.
+
+    Every finished paragraph is released with its already read siblings, so memory stays flat
+    regardless of the document size.
+
+    Parameters:
+    ----------
+    - docx_path (str | BinaryIO): The path of the .docx file, or a binary stream with its bytes.
+
+    Returns:
+    -------
+    - Iterator[ParagraphLayout]: The story part, index inside the part, text, alignment and run offsets of
+      each paragraph, in the order given by story_parts.
+    """
+    with zipfile.ZipFile(docx_path) as package:
+        for name in story_parts(package.namelist()):
+            with package.open(name) as xml:
+                depth = 0
+                index = 0
+
+                for event, element in etree.iterparse(xml, events=('start', 'end'), tag=W_P):
+                    if event == 'start':
+                        depth += 1
+                        continue
+
+                    depth -= 1
+                    if depth:
+                        continue
+
+                    texts = [run_text(run) for run in iter_runs(element)]
+                    runs = []
+                    position = 0
+                    for text in texts:
+                        runs.append((position, position + len(text)))
+                        position += len(text)
+
+                    yield ParagraphLayout(name, index, ''.join(texts), paragraph_alignment(element), runs)
+                    index += 1
+
+                    element.clear(keep_tail=True)
+                    for node in [element, *element.iterancestors()]:
+                        parent = node.getparent()
+                        if parent is None:
+                            break
+                        while node.getprevious() is not None:
+                            del parent[0]
+
+
+def iter_paragraphs(docx_path: str | BinaryIO) -> Iterator[Tuple[str, str]]:
+    """
+    Streams (text, align) for each paragraph of a .docx file, see iter_layout.
+    """
+    for layout in iter_layout(docx_path):
+        yield layout.text, layout.align
+
+
+def set_run_text(run: etree._Element, text: str) -> None:
+    """
+    Replaces the text of a run, keeping its formatting (w:rPr). Tabs and line breaks become w:tab and w:br.
+    """
+    for child in list(run):
+        if child.tag == W_T or child.tag in RUN_TEXTS or (child.tag == W_BR and child.get(W_TYPE) in (None, 'textWrapping')):
+            run.remove(child)
+
+    for index, line in enumerate(text.split('\n')):
+        if index:
+            etree.SubElement(run, W_BR)
+
+        for tab_index, chunk in enumerate(line.split('\t')):
+            if tab_index:
+                etree.SubElement(run, f'{{{W_NS}}}tab')
+            if chunk:
+                t = etree.SubElement(run, W_T)
+                t.text = chunk
+                if chunk != chunk.strip():
+                    t.set(XML_SPACE, 'preserve')
+
+
+def patch_paragraph(paragraph: etree._Element, text: str) -> bool:
+    """
+    Changes the text of a paragraph touching only the runs that hold the changed characters,
+    so the formatting of the rest of the paragraph is kept.
+
+    Returns:
+    -------
+    - bool: Whether the paragraph was changed.
+    """
+    runs = list(iter_runs(paragraph))
+    texts = [run_text(run) for run in runs]
+    old = ''.join(texts)
+
+    if old == text:
+        return False
+
+    if not runs:
+        set_run_text(etree.SubElement(paragraph, W_R), text)
+        return True
+
+    bounds = []
+    position = 0
+    for run_string in texts:
+        bounds.append((position, position + len(run_string)))
+        position += len(run_string)
+
+    def owner(position: int, insertion: bool) -> int:
+        # An insertion joins the run before it, a replacement the run where it starts
+        for index, (run_start, run_end) in enumerate(bounds):
+            if (run_start < position <= run_end) if insertion else (run_start <= position < run_end):
+                return index
+        return 0
+
+    new_texts = [''] * len(runs)
+    matcher = SequenceMatcher(None, old, text, autojunk=False)
+
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            for index, (run_start, run_end) in enumerate(bounds):
+                start, end = max(i1, run_start), min(i2, run_end)
+                if start < end:
+                    new_texts[index] += text[j1 + start - i1:j1 + end - i1]
+        elif tag in ('replace', 'insert'):
+            new_texts[owner(i1, insertion=tag == 'insert')] += text[j1:j2]
+
+    for run, run_string, new_text in zip(runs, texts, new_texts):
+        if new_text != run_string:
+            set_run_text(run, new_text)
+
+    return True
+
+
+def write_members(package: zipfile.ZipFile, output: zipfile.ZipFile, patched: Dict[str, bytes]) -> None:
+    for info in package.infolist():
+        if info.filename in patched:
+            output.writestr(info, patched[info.filename])
+        elif info.flag_bits & 0x01:
+            # Encrypted members are never copied raw, they are not expected in a .docx anyway
+            copy_stream(package, output, info)
+        else:
+            copy_member(package, output, info)
+
+
+def copy_stream(package: zipfile.ZipFile, output: zipfile.ZipFile, info: zipfile.ZipInfo) -> None:
+    """ Copies a member by decompressing and compressing it again, in chunks. """
+    with package.open(info) as source, output.open(info, 'w') as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+
+
+def copy_member(package: zipfile.ZipFile, output: zipfile.ZipFile, info: zipfile.ZipInfo) -> None:
+    """
+    Copies a member with its data as stored (see copy_raw), or with copy_stream if that fails,
+    e.g. with a version of zipfile whose internals changed. Whatever the raw copy wrote is dropped first.
+    """
+    start = output.fp.tell()
+
+    try:
+        copy_raw(package, output, info)
+    except (AttributeError, struct.error, zipfile.BadZipFile):
+        if output.fp.tell() != start:
+            output.fp.seek(start)
+            output.fp.truncate()
+        copy_stream(package, output, info)
+
+
+def copy_raw(package: zipfile.ZipFile, output: zipfile.ZipFile, info: zipfile.ZipInfo) -> None:
+    """
+    Copies a member with its data as stored, without decompressing and compressing it again.
+
+    zipfile has no public way to do it, so the local header is written with ZipInfo.FileHeader
+    and the member registered in the central directory of output, like ZipFile.write does.
+    The member is only registered once its data is copied.
+    """
+    source = package.fp
+    source.seek(info.header_offset)
+    header = struct.unpack(zipfile.structFileHeader, source.read(zipfile.sizeFileHeader))
+
+    if header[0] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f'Bad local header of member {info.filename}')
+
+    source.seek(header[zipfile._FH_FILENAME_LENGTH] + header[zipfile._FH_EXTRA_FIELD_LENGTH], os.SEEK_CUR)
+
+    copied = copy.copy(info)
+    # The sizes and CRC are known, so they go in the local header instead of a data descriptor
+    copied.flag_bits &= ~0x08
+    copied.header_offset = output.fp.tell()
+    output.fp.write(copied.FileHeader())
+
+    remaining = info.compress_size
+    while remaining:
+        chunk = source.read(min(remaining, 1024 * 1024))
+        if not chunk:
+            raise zipfile.BadZipFile(f'Truncated member {info.filename}')
+        output.fp.write(chunk)
+        remaining -= len(chunk)
+
+    output.filelist.append(copied)
+    output.NameToInfo[copied.filename] = copied
+    output.start_dir = output.fp.tell()
+    output._didModify = True
+
+
+def write_package(package: zipfile.ZipFile, dst: str | BinaryIO, patched: Dict[str, bytes]) -> None:
+    """
+    Writes a copy of an opened .docx package with some members replaced, through a temporary file,
+    so dst may be the package itself. A binary stream dst is written directly.
+    """
+    if not isinstance(dst, str):
+        with zipfile.ZipFile(dst, 'w') as output:
+            write_members(package, output, patched)
+        package.close()
+        return
+
+    temp = f'{dst}.{os.getpid()}.tmp'
+
+    with zipfile.ZipFile(temp, 'w') as output:
+        write_members(package, output, patched)
+
+    package.close()
+    os.replace(temp, dst)
+
+
+def copy_package(src: str | BinaryIO, dst: str | BinaryIO) -> None:
+    """ Copies an unchanged .docx file, unless src and dst are the same file. """
+    if isinstance(src, str) and isinstance(dst, str):
+        if os.path.abspath(src) != os.path.abspath(dst):
+            shutil.copy(src, dst)
+        return
+
+    if isinstance(src, str):
+        with open(src, 'rb') as source:
+            shutil.copyfileobj(source, dst, 1024 * 1024)
+    elif isinstance(dst, str):
+        src.seek(0)
+        with open(dst, 'wb') as target:
+            shutil.copyfileobj(src, target, 1024 * 1024)
+    else:
+        src.seek(0)
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def serialize(root: etree._Element) -> bytes:
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+def patch_changes(src: str | BinaryIO, dst: str | BinaryIO, changes: Dict[str, Dict[int, str]]) -> int:
+    """
+    Saves a copy of a .docx file with new texts for the paragraphs at known locations.
+    Only the story parts listed in changes are parsed, see patch_paragraphs.
+
+    Parameters:
+    ----------
+    - src (str | BinaryIO): The original .docx file, or a binary stream with its bytes.
+    - dst (str | BinaryIO): The saved .docx file, it may be the same as src, or a binary stream.
+    - changes (Dict[str, Dict[int, str]]): New texts by story part and paragraph index inside the part,
+      as given by ParagraphLayout.
+
+    Returns:
+    -------
+    - int: The number of changed paragraphs.
+    """
+    changed = 0
+    patched = {}
+
+    with zipfile.ZipFile(src) as package:
+        for name, texts in changes.items():
+            root = etree.fromstring(package.read(name))
+            part_changed = False
+
+            for index, paragraph in enumerate(iter_story_paragraphs(root)):
+                if index in texts and patch_paragraph(paragraph, texts[index]):
+                    part_changed = True
+                    changed += 1
+
+            if part_changed:
+                patched[name] = serialize(root)
+
+        if patched:
+            write_package(package, dst, patched)
+
+    if not patched:
+        copy_package(src, dst)
+
+    return changed
+
+
+def patch_paragraphs(src: str | BinaryIO, dst: str | BinaryIO, paragraphs: List[str]) -> int:
+    """
+    Saves a copy of a .docx file with new paragraph texts, in the order of iter_paragraphs.
+
+    Every story part is parsed to compare its paragraphs, but only the parts with changes are serialized
+    again and only their changed runs are rewritten; every other zip member is copied unchanged.
+    Paragraphs beyond the given list are kept.
+
+    Parameters:
+    ----------
+    - src (str | BinaryIO): The original .docx file, or a binary stream with its bytes.
+    - dst (str | BinaryIO): The saved .docx file, it may be the same as src, or a binary stream.
+    - paragraphs (List[str]): The new paragraph texts.
+
+    Returns:
+    -------
+    - int: The number of changed paragraphs.
+    """
+    changed = 0
+    patched = {}
+
+    with zipfile.ZipFile(src) as package:
+        index = 0
+
+        for name in story_parts(package.namelist()):
+            root = etree.fromstring(package.read(name))
+            part_changed = False
+
+            for paragraph in iter_story_paragraphs(root):
+                if index < len(paragraphs) and patch_paragraph(paragraph, paragraphs[index]):
+                    part_changed = True
+                    changed += 1
+                index += 1
+
+            if part_changed:
+                patched[name] = serialize(root)
+
+        if patched:
+            write_package(package, dst, patched)
+
+    if not patched:
+        copy_package(src, dst)
+
+    return changed
@@ -0,0 +1,223 @@
+from typing import List, Dict, Tuple, Any, TextIO
+
+import json
+import os
+import threading
+import time
+
+
+class EditJournal:
+    """
+    Append-only journal of the field edits of the open document, so they survive a crash or a close without saving.
+
+    Each document gets a .jsonl file named by its conversion cache key (see DocumentManager.open_job):
+    a header line with the key, the source path and the field count, then one [field index, value] line per edit,
+    written and flushed as the edit happens. Replaying keeps the last value of each field. Reopening the same
+    document, which restores the conversion from the cache, replays its journal onto the form without
+    parsing anything again. A line cut by a crash is ignored.
+
+    Saving the form appends a {"saved": time} line. Only the edits after the last one are unsaved, and a journal
+    without unsaved edits is not recovered: its document opens without them and is not offered by sessions.
+
+    The journal is rewritten with only the last values when it grows beyond compact_ratio lines per field,
+    and only the max_sessions most recent journals are kept.
+    """
+    EXT = '.jsonl'
+
+    def __init__(self, folder: str = './_internal/.journal/', compact_ratio: int = 8, max_sessions: int = 20):
+        self.folder: str = os.path.abspath(folder)
+        self.compact_ratio: int = compact_ratio
+        self.max_sessions: int = max_sessions
+        self.header: Dict[str, Any] = {}
+        self.values: Dict[int, Any] = {}
+        self.lines: int = 0
+        self.unsaved: int = 0
+        self._file: TextIO | None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.folder, key + self.EXT)
+
+    @staticmethod
+    def read(path: str) -> Tuple[Dict[str, Any], Dict[int, Any], int, int]:
+        """
+        Replays a journal file.
+
+        Returns:
+        -------
+        - Tuple[Dict[str, Any], Dict[int, Any], int, int]: The header, the last value of each field, the number
+          of edit lines and the number of edit lines after the last save.
+        """
+        header = {}
+        values = {}
+        lines = 0
+        unsaved = 0
+
+        try:
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+
+                    if isinstance(entry, dict) and 'saved' in entry:
+                        unsaved = 0
+                    elif isinstance(entry, dict):
+                        header = entry
+                    elif isinstance(entry, list) and len(entry) == 2:
+                        values[entry[0]] = entry[1]
+                        lines += 1
+                        unsaved += 1
+        except OSError:
+            pass
+
+        return header, values, lines, unsaved
+
+    def open(self, key: str, source_path: str, fields: int) -> Dict[int, Any]:
+        """
+        Starts journaling the edits of a document, closing the previous one.
+
+        Parameters:
+        ----------
+        - key (str): The conversion cache key of the document.
+        - source_path (str): The document the user opened.
+        - fields (int): The number of fields of the form. A journal written for another field count is discarded.
+
+        Returns:
+        -------
+        - Dict[int, Any]: The edits of the previous session of the document, by field index, when some of them
+          were not saved.
+        """
+        self.close()
+        path = self.path(key)
+        header, values, lines, unsaved = self.read(path)
+
+        if header.get('fields') != fields or not unsaved:
+            values, lines, unsaved = {}, 0, 0
+
+        values = {index: value for index, value in values.items() if isinstance(index, int) and 0 <= index < fields}
+        header = {'key': key, 'source': os.path.abspath(source_path), 'fields': fields, 'time': time.time()}
+
+        with self._lock:
+            self.header = header
+            self.values = dict(values)
+            self.lines = lines
+            self.unsaved = unsaved
+            self._rewrite(path)
+
+        self.prune()
+        return values
+
+    def record(self, values: Dict[int, Any]) -> None:
+        """ Appends edits, by field index, to the journal of the open document. """
+        if not values:
+            return
+
+        with self._lock:
+            if self._file is None:
+                return
+
+            self._file.write(''.join(json.dumps([index, value], ensure_ascii=False) + '\n' for index, value in values.items()))
+            self._file.flush()
+            self.values.update(values)
+            self.lines += len(values)
+            self.unsaved += len(values)
+
+            if self.lines > self.compact_ratio * max(len(self.values), 64):
+                self._rewrite(self.path(self.header['key']))
+
+    def reset(self) -> None:
+        """ Discards the edits journaled so far, keeping the journal open. """
+        with self._lock:
+            if self._file is None:
+                return
+            self.values = {}
+            self.lines = 0
+            self.unsaved = 0
+            self._rewrite(self.path(self.header['key']))
+
+    def saved(self) -> None:
+        """ Marks the edits journaled so far as saved, so they are no longer recovered. """
+        with self._lock:
+            if self._file is None or not self.unsaved:
+                return
+            self._file.write(json.dumps({'saved': time.time()}) + '\n')
+            self._file.flush()
+            self.unsaved = 0
+
+    def _rewrite(self, path: str) -> None:
+        """ Writes the header and the last value of each field to a new file, replacing the journal atomically. """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        os.makedirs(self.folder, exist_ok=True)
+        temp = f'{path}.{os.getpid()}.tmp'
+
+        with open(temp, 'w', encoding='utf-8') as file:
+            file.write(json.dumps(self.header, ensure_ascii=False) + '\n')
+            for index, value in self.values.items():
+                file.write(json.dumps([index, value], ensure_ascii=False) + '\n')
+            if self.values and not self.unsaved:
+                file.write(json.dumps({'saved': time.time()}) + '\n')
+        os.replace(temp, path)
+
+        self.lines = len(self.values)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def close(self, delete: bool = False) -> None:
+        """ Stops journaling. The journal is kept for the next session unless delete is set. """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+                if delete:
+                    try:
+                        os.remove(self.path(self.header['key']))
+                    except OSError:
+                        pass
+
+            self.header = {}
+            self.values = {}
+            self.lines = 0
+            self.unsaved = 0
+
+    def discard(self, key: str) -> None:
+        """ Removes the journal of a document that is not open. """
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def sessions(self) -> List[Dict[str, Any]]:
+        """
+        Returns the headers of the journals with unsaved edits whose source document still exists, most recent
+        first, each with its edit count in 'edits'.
+        """
+        sessions = []
+
+        for path in self._files():
+            header, values, _, unsaved = self.read(path)
+
+            if unsaved and os.path.isfile(header.get('source', '')):
+                sessions.append({**header, 'edits': len(values)})
+
+        return sessions
+
+    def _files(self) -> List[str]:
+        """ The journal files, most recently written first. """
+        try:
+            paths = [os.path.join(self.folder, name) for name in os.listdir(self.folder) if name.endswith(self.EXT)]
+            return sorted(paths, key=os.path.getmtime, reverse=True)
+        except OSError:
+            return []
+
+    def prune(self) -> None:
+        """ Removes the journals beyond the max_sessions most recent ones. """
+        for path in self._files()[self.max_sessions:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
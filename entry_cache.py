@@ -0,0 +1,123 @@
+from typing import Dict, Optional
+
+import json
+import os
+import shutil
+import time
+import uuid
+
+
+class EntryCache:
+    """
+    Persistent cache of folders of files, the entries, each named by a key and described by its manifest.
+
+    Entries are written in a temporary folder and renamed into place, so a crash never leaves a half written
+    entry behind, and the least recently used entries are evicted when the cache grows beyond max_size bytes.
+    The manifest modification time is the last access of an entry, see touch.
+    """
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, folder: str, max_size: int):
+        self.folder: str = os.path.abspath(folder)
+        self.max_size: int = max_size
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.folder, key)
+
+    def owns(self, path: str) -> bool:
+        return bool(path) and os.path.abspath(path).startswith(self.folder + os.sep)
+
+    def read_manifest(self, key: str) -> Optional[Dict]:
+        """ Returns the manifest of an entry, or None if the entry does not exist. """
+        try:
+            with open(os.path.join(self.entry_path(key), self.MANIFEST), encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def touch(self, key: str) -> None:
+        """ Marks an entry as used now, for the LRU eviction. """
+        try:
+            os.utime(os.path.join(self.entry_path(key), self.MANIFEST))
+        except OSError:
+            pass
+
+    def write_entry(self, key: str, files: Dict[str, str | bytes], manifest: Dict) -> None:
+        """
+        Stores an entry and evicts old entries if needed.
+
+        Parameters:
+        ----------
+        - key (str): The name of the entry.
+        - files (Dict[str, str | bytes]): The files of the entry by their path inside it, given as the path
+          of the file to copy or as its bytes.
+        - manifest (Dict): Saved as the manifest of the entry.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        temp = os.path.join(self.folder, f'.tmp-{uuid.uuid4().hex}')
+        os.makedirs(temp)
+
+        try:
+            for name, source in files.items():
+                path = os.path.join(temp, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+                if isinstance(source, bytes):
+                    with open(path, 'wb') as file:
+                        file.write(source)
+                else:
+                    shutil.copy(source, path)
+
+            with open(os.path.join(temp, self.MANIFEST), 'w', encoding='utf-8') as file:
+                json.dump(manifest, file, ensure_ascii=False)
+
+            os.rename(temp, self.entry_path(key))
+        except OSError:
+            # Another process stored the same entry first, or the disk is full
+            shutil.rmtree(temp, ignore_errors=True)
+
+        self.evict(keep=key)
+
+    def size(self, key: str) -> int:
+        total = 0
+
+        for folder, _, files in os.walk(self.entry_path(key)):
+            for file in files:
+                try:
+                    total += os.path.getsize(os.path.join(folder, file))
+                except OSError:
+                    pass
+
+        return total
+
+    def evict(self, keep: str = '') -> None:
+        """
+        Removes the least recently used entries until the cache fits in max_size. The entry keep is never removed.
+        """
+        entries = []
+
+        for key in os.listdir(self.folder):
+            if key.startswith('.tmp-'):
+                # Left behind by a write interrupted more than an hour ago
+                if time.time() - os.path.getmtime(self.entry_path(key)) > 3600:
+                    shutil.rmtree(self.entry_path(key), ignore_errors=True)
+                continue
+
+            try:
+                last_access = os.path.getmtime(os.path.join(self.entry_path(key), self.MANIFEST))
+            except OSError:
+                continue
+            entries.append((last_access, key, self.size(key)))
+
+        total = sum(size for _, _, size in entries)
+
+        for _, key, size in sorted(entries):
+            if total <= self.max_size:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self.entry_path(key), ignore_errors=True)
+            total -= size
+
+    def clear(self) -> None:
+        shutil.rmtree(self.folder, ignore_errors=True)
@@ -0,0 +1,76 @@
+from typing import List, Dict, Any, Optional
+
+from entry_cache import EntryCache
+
+import hashlib
+import json
+import os
+import shutil
+
+
+class ExportCache(EntryCache):
+    """
+    Persistent cache of exported files, so exporting a form again in a state it was already exported in
+    copies the files of that export instead of saving and converting it again.
+
+    Each entry is a folder named by the hash of the form state and the export format (see state_key),
+    holding the exported files with their names. Entries are written and evicted as described in
+    entry_cache.EntryCache.
+    """
+    VERSION = 1
+
+    def __init__(self, folder: str = './_internal/.exports/', max_size: int = 256 * 1024 ** 2):
+        super().__init__(folder=folder, max_size=max_size)
+
+    @classmethod
+    def state_key(cls, fmt: str, state: Any, options: Dict = None) -> str:
+        """
+        Returns the hash of a form state in an export format.
+
+        Parameters:
+        ----------
+        - fmt (str): 'docx', 'pdf' or 'images'.
+        - state (Any): What the exported files are made of, e.g. the field values by field index.
+        - options (Dict): Everything else that changes the files, e.g. the source document and file name.
+        """
+        data = {'version': cls.VERSION, 'format': fmt, 'state': state, **(options or {})}
+        return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """ Returns the paths of the files of an entry, or None if it does not exist. """
+        entry = self.entry_path(key)
+        manifest = self.read_manifest(key)
+
+        try:
+            paths = [os.path.join(entry, name) for name in manifest['files']]
+        except (TypeError, KeyError):
+            return None
+
+        if not all(map(os.path.isfile, paths)):
+            return None
+
+        self.touch(key)
+        return paths
+
+    def put(self, key: str, paths: List[str]) -> Optional[List[str]]:
+        """ Stores copies of exported files and evicts old entries if needed. Returns the stored paths, see get. """
+        names = [os.path.basename(path) for path in paths]
+
+        self.write_entry(key, dict(zip(names, paths)), {'files': names})
+        return self.get(key)
+
+    def restore(self, key: str, output_folder: str) -> Optional[List[str]]:
+        """ Copies the files of an entry to output_folder. Returns their new paths, or None if the entry does not exist. """
+        paths = self.get(key)
+
+        if paths is None:
+            return None
+
+        os.makedirs(output_folder, exist_ok=True)
+        restored = []
+
+        for path in paths:
+            restored.append(os.path.join(output_folder, os.path.basename(path)))
+            shutil.copy(path, restored[-1])
+
+        return restored
@@ -0,0 +1,323 @@
+from typing import List, Tuple, Dict, Iterator, NamedTuple, Any
+from array import array
+
+from form_tokenizer import SpanKind
+
+
+class Field(NamedTuple):
+    index: int
+    row: int
+    part: int
+    kind: SpanKind
+    label: str
+    value: str
+
+
+def part_kind(part: str) -> SpanKind:
+    if '@TF' in part:
+        return SpanKind.TEXTFIELD
+    if '@CB' in part:
+        return SpanKind.CHECKBOX
+    return SpanKind.TEXT
+
+
+def clean_label(text: str) -> str:
+    return text.strip().strip(':_').strip()
+
+
+def iter_fields(rows: List[Tuple[List[str], str]]) -> Iterator[Field]:
+    """
+    Iterates over the text fields and checkboxes of the form rows, in order.
+
+    The label of a field is the text just before it in the same paragraph, without spaces and ':',
+    e.g. "Nome" for ["Nome", ": João@TF"].
+    """
+    index = 0
+
+    for row, (parts, _) in enumerate(rows):
+        label = ''
+
+        for part_index, part in enumerate(parts):
+            kind = part_kind(part)
+
+            if kind is SpanKind.TEXT:
+                label = clean_label(part) or label
+                continue
+
+            yield Field(index, row, part_index, kind, label, part.replace(kind.value, ''))
+            index += 1
+
+
+def field_value(kind: SpanKind, value: Any) -> Any:
+    """
+    Converts a value from a record or profile to the value of a field: a bool for checkboxes, where
+    '', '0', 'false', 'não'... are unchecked, and a string for text fields.
+    """
+    if kind is SpanKind.CHECKBOX:
+        if isinstance(value, str):
+            return value.strip().lower() not in ('', '0', 'false', 'nao', 'não', 'n', 'no')
+        return bool(value)
+    return '' if value is None else str(value)
+
+
+def fill_part(part: str, value: Any) -> str:
+    """
+    Returns the paragraph text of a part filled with value, see fill_value.
+    A value of None keeps the original text.
+    """
+    kind = part_kind(part)
+    return fill_value(kind, part.replace(kind.value, ''), value)
+
+
+def fill_value(kind: SpanKind, old_value: str, value: Any) -> str:
+    """
+    Returns the text of a field of the kind, originally old_value, filled with value.
+
+    Only None keeps the original text. An empty value clears the field: ':' fields keep their colon
+    (e.g. "Nome: João" becomes "Nome:") and blanks like "____" stay blank, so the printed form still
+    has a line to write on. Any other field is left empty.
+    """
+    if kind is SpanKind.TEXT or value is None:
+        return old_value
+
+    if kind is SpanKind.CHECKBOX:
+        return '( X )' if field_value(kind, value) else '(  )'
+
+    value = str(value)
+
+    if old_value.startswith(':'):
+        if not value:
+            return ':'
+        # Keep the space after the colon when the value comes without it, e.g. from a CSV file
+        rest = old_value[1:]
+        separator = rest[:len(rest) - len(rest.lstrip())]
+        return ':' + (value if value[0].isspace() else separator + value)
+
+    if not value and is_blank(old_value):
+        return old_value
+    return value
+
+
+def is_blank(text: str) -> bool:
+    """ Whether a field text is a blank to be filled, only '_' and spaces. """
+    return bool(text) and not text.replace('_', '').strip()
+
+
+def fill_rows(rows: List[Tuple[List[str], str]], values: Dict[int, Any]) -> List[str]:
+    """
+    Builds the paragraphs of the form with the fields replaced by values, indexed by Field.index.
+
+    Returns:
+    -------
+    - List[str]: The paragraphs, ready for DocumentManager.save_changes.
+    """
+    paragraphs = []
+    index = 0
+
+    for parts, _ in rows:
+        texts = []
+
+        for part in parts:
+            if part_kind(part) is SpanKind.TEXT:
+                texts.append(part)
+                continue
+
+            texts.append(fill_part(part, values.get(index)))
+            index += 1
+
+        paragraphs.append(''.join(texts))
+
+    return paragraphs
+
+
+# Field kinds as stored in FieldStore.kinds
+KINDS: Tuple[SpanKind, ...] = (SpanKind.TEXT, SpanKind.TEXTFIELD, SpanKind.CHECKBOX)
+CHECKBOX: int = KINDS.index(SpanKind.CHECKBOX)
+
+
+class FieldStore:
+    """
+    The rows and fields of a form, with the field values, in flat arrays indexed by field.
+
+    It is the single source of truth of the form: FormViewer controls only show and edit its values,
+    and the paragraphs, profiles and cleared forms are computed from the arrays without touching any control.
+    A field costs a kind byte, its row and part as ints, and references to its original text, label and value,
+    instead of a Field tuple or a control with a data dict.
+
+    Fields are found by key in constant time. Keys are the field position ('0', '1'...), its label in lower
+    case for the first field with that label, and 'label#n' for the n-th field with the same label (e.g. 'nome#2').
+    Labels make records and autofill profiles work across forms, positions only within the same form.
+    """
+    def __init__(self):
+        self.rows: List[Tuple[List[str], str]] = []
+        self.offsets: array = array('I', [0])
+        self.kinds: bytearray = bytearray()
+        self.field_rows: array = array('I')
+        self.parts: array = array('I')
+        self.originals: List[str] = []
+        self.labels: List[str] = []
+        self.values: List[Any] = []
+        self.keys: Dict[str, int] = {}
+        self._counts: Dict[str, int] = {}
+
+    @classmethod
+    def build(cls, rows: List[Tuple[List[str], str]]) -> 'FieldStore':
+        store = cls()
+
+        for parts, align in rows:
+            store.add_row(parts, align)
+
+        return store
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def add_row(self, parts: List[str], align: str) -> int:
+        """ Adds the next row and indexes its fields. Returns how many fields it has. """
+        row = len(self.rows)
+        self.rows.append((parts, align))
+        count = 0
+
+        for field in iter_fields([(parts, align)]):
+            index = len(self.kinds)
+            self.kinds.append(KINDS.index(field.kind))
+            self.field_rows.append(row)
+            self.parts.append(field.part)
+            self.originals.append(field.value)
+            self.labels.append(field.label)
+            self.values.append(None)
+            self.keys[str(index)] = index
+
+            if field.label:
+                label = field.label.lower()
+                self._counts[label] = self._counts.get(label, 0) + 1
+                self.keys.setdefault(label, index)
+                self.keys[f'{label}#{self._counts[label]}'] = index
+            count += 1
+
+        self.offsets.append(len(self.kinds))
+        return count
+
+    def kind(self, index: int) -> SpanKind:
+        return KINDS[self.kinds[index]]
+
+    def field(self, index: int) -> Field:
+        return Field(index, self.field_rows[index], self.parts[index], self.kind(index), self.labels[index], self.originals[index])
+
+    def fields(self) -> Iterator[Field]:
+        return map(self.field, range(len(self)))
+
+    def row_fields(self, row: int) -> range:
+        """ The indexes of the fields of a row. """
+        return range(self.offsets[row], self.offsets[row + 1])
+
+    def value(self, index: int) -> Any:
+        """ The value shown by the field: the one set, or the original one, a bool for checkboxes. """
+        value = self.values[index]
+
+        if value is not None:
+            return value
+        if self.kinds[index] == CHECKBOX:
+            return 'x' in self.originals[index].lower()
+        return self.originals[index].replace(':', '')
+
+    def set(self, values: Dict[int, Any]) -> None:
+        """ Sets the values of fields by index. None restores the original value. """
+        for index, value in values.items():
+            self.values[index] = value
+
+    def reset(self) -> None:
+        """ Restores the original value of every field. """
+        self.values = [None] * len(self)
+
+    def cleared(self) -> Dict[int, Any]:
+        """ The values of an empty form: unchecked checkboxes and empty text fields. """
+        return {index: False if kind == CHECKBOX else '' for index, kind in enumerate(self.kinds)}
+
+    def changes(self) -> Dict[int, Any]:
+        """
+        The values set so far, by field index. Cleared fields are included with their empty value,
+        which fill_value turns into an empty field, so exports, the export cache and the journal see them.
+        """
+        return {index: value for index, value in enumerate(self.values) if value is not None}
+
+    def paragraphs(self) -> List[str]:
+        """
+        Builds the paragraphs of the form with the values set, see fill_rows. Only the field parts of each
+        row are replaced, the text parts are used as they are.
+
+        Returns:
+        -------
+        - List[str]: The paragraphs, ready for DocumentManager.save_changes.
+        """
+        paragraphs = []
+
+        for row, (parts, _) in enumerate(self.rows):
+            start, end = self.offsets[row], self.offsets[row + 1]
+
+            if start == end:
+                paragraphs.append(''.join(parts))
+                continue
+
+            texts = list(parts)
+            for index in range(start, end):
+                texts[self.parts[index]] = fill_value(KINDS[self.kinds[index]], self.originals[index], self.values[index])
+            paragraphs.append(''.join(texts))
+
+        return paragraphs
+
+    def keyed(self, values: Dict[int, Any]) -> Dict[str, Any]:
+        """
+        Returns values, by field index, by the 'label#n' key of their field, or its position for fields without
+        label, so another store of the same document finds them with resolve, e.g. after more pages were read.
+        """
+        keys = {index: key for key, index in self.keys.items() if '#' in key}
+        return {keys.get(index, str(index)): value for index, value in values.items()}
+
+    def find(self, key: Any) -> int | None:
+        """ The index of the field of a key, or None. """
+        return self.keys.get(str(key).strip().lower())
+
+    def resolve(self, record: Dict[str, Any]) -> Tuple[Dict[int, Any], List[str]]:
+        """
+        Maps the keys of a record or profile to field indexes, converting the values (see field_value).
+
+        Returns:
+        -------
+        - Tuple[Dict[int, Any], List[str]]: The values by field index and the keys that match no field.
+        """
+        values = {}
+        unknown = []
+
+        for key, value in record.items():
+            index = self.find(key)
+
+            if index is None:
+                unknown.append(key)
+            else:
+                values[index] = field_value(self.kind(index), value)
+
+        return values, unknown
+
+    def record(self) -> Dict[str, Any]:
+        """
+        Returns the values set in the labeled fields by label, or 'label#n' for repeated labels, ready to be saved
+        as an autofill profile. Empty text fields and fields without label are left out.
+        """
+        counts = {}
+        record = {}
+
+        for index, label in enumerate(self.labels):
+            if not label:
+                continue
+
+            label = label.lower()
+            counts[label] = counts.get(label, 0) + 1
+            value = self.values[index]
+
+            if value is None or value == '':
+                continue
+
+            record[label if counts[label] == 1 else f'{label}#{counts[label]}'] = value
+
+        return record
@@ -0,0 +1,223 @@
+from typing import List, Tuple, Dict, Any, BinaryIO
+from io import BytesIO
+
+from docx_stream import iter_layout
+from pdf_form import iter_lines, field_box
+from form_tokenizer import tokenize, spans_to_parts
+from form_fields import iter_fields, fill_rows
+
+import hashlib
+import json
+import os
+
+
+class FormTemplate:
+    """
+    The compiled form of a document: its rows, field schema and where every field lives in the Word file.
+
+    A template is compiled once from the Word file of a document and saved next to the source document,
+    so later opens and saves of the same document use it instead of parsing the document again.
+
+    Every paragraph keeps its story part, index inside the part and run offsets (see docx_stream.ParagraphLayout),
+    and every field keeps its kind, label, original value, offsets inside the paragraph and runs.
+
+    A template compiled straight from a PDF (format 'pdf', see compile_pdf) has a paragraph per text line,
+    with the page as part and the line as index, and every field also keeps its box on the page
+    (see pdf_form.field_box), so it is filled without any Word file.
+    """
+    VERSION = 1
+    EXT = '.form.json'
+
+    def __init__(self, source_hash: str, paragraphs: List[Dict[str, Any]], fields: List[Dict[str, Any]], format: str = 'docx'):
+        self.source_hash: str = source_hash
+        self.paragraphs: List[Dict[str, Any]] = paragraphs
+        self.fields: List[Dict[str, Any]] = fields
+        self.format: str = format
+
+    @staticmethod
+    def path(source_path: str) -> str:
+        """ Returns the template path of a document, e.g. 'contract.form.json' for 'contract.pdf'. """
+        return os.path.splitext(os.path.abspath(source_path))[0] + FormTemplate.EXT
+
+    @staticmethod
+    def hash(source_path: str | BinaryIO) -> str:
+        digest = hashlib.sha256()
+
+        if not isinstance(source_path, str):
+            source_path.seek(0)
+            digest.update(source_path.read())
+            return digest.hexdigest()
+
+        with open(source_path, 'rb') as file:
+            while chunk := file.read(1024 * 1024):
+                digest.update(chunk)
+
+        return digest.hexdigest()
+
+    @classmethod
+    def compile(cls, word_path: str | BinaryIO, source_path: str = '') -> 'FormTemplate':
+        """
+        Compiles the template of a Word file.
+
+        Parameters:
+        ----------
+        - word_path (str | BinaryIO): The Word file the form is read from, or a buffer with its bytes.
+        - source_path (str): The document the user opened, the Word file itself by default. Its hash validates the template.
+        """
+        paragraphs = []
+        spans = []
+
+        for layout in iter_layout(word_path):
+            paragraph_spans = tokenize(layout.text)
+            spans.append(paragraph_spans)
+            paragraphs.append({
+                'part': layout.part,
+                'index': layout.index,
+                'text': layout.text,
+                'align': layout.align,
+                'parts': spans_to_parts(paragraph_spans),
+                'runs': layout.runs,
+            })
+
+        fields = []
+        rows = [(paragraph['parts'], paragraph['align']) for paragraph in paragraphs]
+
+        for field in iter_fields(rows):
+            span = spans[field.row][field.part]
+            fields.append({
+                'index': field.index,
+                'row': field.row,
+                'part': field.part,
+                'kind': field.kind.value,
+                'label': field.label,
+                'value': field.value,
+                'start': span.start,
+                'end': span.end,
+                'runs': [index for index, (start, end) in enumerate(paragraphs[field.row]['runs']) if start < span.end and end > span.start],
+            })
+
+        return cls(source_hash=cls.hash(source_path or word_path), paragraphs=paragraphs, fields=fields)
+
+    @classmethod
+    def compile_pdf(cls, pdf_path: str | bytes, source_path: str = '', pages: Tuple[int, int] | None = None) -> 'FormTemplate':
+        """
+        Compiles the template of a PDF file from its text lines (see pdf_form.iter_lines), without converting it to Word.
+
+        Parameters:
+        ----------
+        - pdf_path (str | bytes): The PDF file, or its bytes.
+        - source_path (str): The document the user opened, the PDF file itself by default.
+        - pages (Tuple[int, int] | None): The first and last pages of the form, starting from 1. Every page by default.
+        """
+        paragraphs = []
+        lines = []
+        spans = []
+
+        for line in iter_lines(pdf_path, pages=pages):
+            line_spans = tokenize(line.text)
+            lines.append(line)
+            spans.append(line_spans)
+            paragraphs.append({
+                'part': line.page,
+                'index': line.index,
+                'text': line.text,
+                'align': line.align,
+                'parts': spans_to_parts(line_spans),
+                'runs': [],
+            })
+
+        fields = []
+        rows = [(paragraph['parts'], paragraph['align']) for paragraph in paragraphs]
+
+        for field in iter_fields(rows):
+            span = spans[field.row][field.part]
+            fields.append({
+                'index': field.index,
+                'row': field.row,
+                'part': field.part,
+                'kind': field.kind.value,
+                'label': field.label,
+                'value': field.value,
+                'start': span.start,
+                'end': span.end,
+                'runs': [],
+                **field_box(lines[field.row], span.start, span.end),
+            })
+
+        source = source_path or (BytesIO(pdf_path) if isinstance(pdf_path, bytes) else pdf_path)
+        return cls(source_hash=cls.hash(source), paragraphs=paragraphs, fields=fields, format='pdf')
+
+    @classmethod
+    def load(cls, path: str, source_path: str = '', format: str = '') -> 'FormTemplate | None':
+        """
+        Loads a saved template. Returns None if it does not exist, is from another version or,
+        when source_path is given, was compiled from a different document, or, when format is given,
+        compiled from another format.
+        """
+        try:
+            with open(path, encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if data.get('version') != cls.VERSION:
+            return None
+
+        if format and data.get('format', 'docx') != format:
+            return None
+
+        if source_path and data['source_hash'] != cls.hash(source_path):
+            return None
+
+        return cls(source_hash=data['source_hash'], paragraphs=data['paragraphs'], fields=data['fields'], format=data.get('format', 'docx'))
+
+    def dumps(self) -> bytes:
+        """ Returns the template as saved by save, e.g. to store it in the conversion cache. """
+        data = {
+            'version': self.VERSION,
+            'format': self.format,
+            'source_hash': self.source_hash,
+            'paragraphs': self.paragraphs,
+            'fields': self.fields,
+        }
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    def save(self, path: str) -> bool:
+        """
+        Saves the template atomically. Returns False if it could not be written, e.g. in a read-only folder.
+        """
+        temp = f'{path}.{os.getpid()}.tmp'
+
+        try:
+            with open(temp, 'wb') as file:
+                file.write(self.dumps())
+            os.replace(temp, path)
+            return True
+        except OSError:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            return False
+
+    @property
+    def rows(self) -> List[Tuple[List[str], str]]:
+        """ The form rows, the same as DocumentManager.extract_form_rows. """
+        return [(paragraph['parts'], paragraph['align']) for paragraph in self.paragraphs]
+
+    def fill(self, values: Dict[int, Any]) -> List[str]:
+        """ Returns the paragraphs with the fields (by index) replaced by values, see form_fields.fill_rows. """
+        return fill_rows(self.rows, values)
+
+    def changes(self, paragraphs: List[str]) -> Dict[str, Dict[int, str]]:
+        """
+        Returns the paragraphs that differ from the original document, by story part and index inside
+        the part, ready for docx_stream.patch_changes.
+        """
+        changes = {}
+
+        for paragraph, text in zip(self.paragraphs, paragraphs):
+            if text != paragraph['text']:
+                changes.setdefault(paragraph['part'], {})[paragraph['index']] = text
+
+        return changes
@@ -0,0 +1,79 @@
+from typing import List, NamedTuple
+from enum import Enum
+
+import re
+
+
+class SpanKind(Enum):
+    TEXT = '@TX'
+    TEXTFIELD = '@TF'
+    CHECKBOX = '@CB'
+
+
+class Span(NamedTuple):
+    kind: SpanKind
+    text: str
+    start: int
+    end: int
+
+
+# Every field starts with one of '_', '(', ':' or a digit. Matching that character first lets the regex engine
+# skip plain text with a single charset test, and the empty group closing each branch names the field kind.
+# The value of ': Something' stops before any blank or checkbox, so a field is never marked inside another one.
+_FIELD_PATTERN = re.compile(
+    r'[_(:\d](?:'
+    r'(?<=_)_*(?P<blank>)'                                               # '____'
+    r'|(?<=\d)\d/\d{2}/\d{4}(?P<date>)'                                  # '01/01/2000'
+    r'|(?<=\d)\d de \w+ de \d{4}(?P<long_date>)'                         # '01 de julho de 2004'
+    r'|(?<=\()\s*(?:[xX]\s*)?\)(?P<checkbox>)'                           # '( X )' or '( )' ...
+    r'|(?<=:)\s[^\W_]+[^._(]*(?:\((?!\s*(?:[xX]\s*)?\))[^._(]*)*(?P<value>)'  # ': Something'
+    r'|(?<=:)\s*(?!\s*\(|\s?\b|\s*_)(?P<empty>)'                         # ':        '
+    r')'
+)
+
+_KINDS = {
+    'blank': SpanKind.TEXTFIELD,
+    'date': SpanKind.TEXTFIELD,
+    'long_date': SpanKind.TEXTFIELD,
+    'checkbox': SpanKind.CHECKBOX,
+    'value': SpanKind.TEXTFIELD,
+    'empty': SpanKind.TEXTFIELD,
+}
+
+
+def tokenize(text: str) -> List[Span]:
+    """
+    Splits a paragraph text into text, text field and checkbox spans in a single pass.
+
+    Parameters:
+    ----------
+    - text (str): The paragraph text.
+
+    Returns:
+    -------
+    - List[Span]: The spans covering the whole text, in order. Empty text spans are omitted,
+      but an empty paragraph still returns one empty TEXT span.
+    """
+    spans = []
+    position = 0
+
+    for match in _FIELD_PATTERN.finditer(text):
+        start, end = match.span()
+
+        if start > position:
+            spans.append(Span(SpanKind.TEXT, text[position:start], position, start))
+
+        spans.append(Span(_KINDS[match.lastgroup], text[start:end], start, end))
+        position = end
+
+    if position < len(text) or not spans:
+        spans.append(Span(SpanKind.TEXT, text[position:], position, len(text)))
+
+    return spans
+
+
+def spans_to_parts(spans: List[Span]) -> List[str]:
+    """
+    Converts spans to the marked parts used by the form viewer, e.g. ["Something ", "___@TF", "( X )@CB"].
+    """
+    return [span.text if span.kind is SpanKind.TEXT else span.text + span.kind.value for span in spans]
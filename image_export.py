@@ -0,0 +1,203 @@
+from io import BytesIO
+from typing import List, Dict, Set, Tuple
+
+from render_profile import RenderProfile
+from tracing import tracer
+
+import hashlib
+import json
+import os
+import re
+import shutil
+
+
+def normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def page_texts(pdf_path: str | bytes) -> List[str]:
+    import fitz
+
+    with (fitz.open(stream=pdf_path, filetype='pdf') if isinstance(pdf_path, bytes) else fitz.open(pdf_path)) as document:
+        return [normalize(page.get_text()) for page in document]
+
+
+def map_paragraphs(texts: List[str], pages: List[str], window: int = 3) -> List[List[int]]:
+    """
+    Finds the pages each paragraph lands on, matching the start and the end of its text against the
+    text of the pages, in order.
+
+    Parameters:
+    ----------
+    - texts (List[str]): The paragraph texts, in document order.
+    - pages (List[str]): The normalized text of each page, see page_texts.
+    - window (int): How many pages after the last match are searched, so headers, footers and other
+      repeated or missing text do not scan the whole document.
+
+    Returns:
+    -------
+    - List[List[int]]: The page indexes (starting from 0) of each paragraph. Paragraphs that are not found,
+      like empty ones, get the page of the previous paragraph.
+    """
+    result = []
+    page, position = 0, 0
+
+    for text in texts:
+        text = normalize(text)
+
+        if not text or not pages:
+            result.append([page])
+            continue
+
+        head, tail = text[:30], text[-30:]
+        start = end = None
+
+        for index in range(page, min(page + window, len(pages))):
+            found = pages[index].find(head, position if index == page else 0)
+            if found >= 0:
+                start, position = index, found + len(head)
+                break
+
+        if start is None:
+            result.append([page])
+            continue
+
+        end = start
+        for index in range(start, min(start + window, len(pages))):
+            found = pages[index].find(tail, position if index == start else 0)
+            if found >= 0:
+                end, position = index, found + len(tail)
+                break
+
+        page = end
+        result.append(list(range(start, end + 1)))
+
+    return result
+
+
+class ImageExporter:
+    """
+    Exports the pages of a PDF as images, rendering again only the pages that changed since the last export.
+
+    A page is rendered again when its text or the render profile changed, when a changed paragraph lands on it,
+    or when it was never rendered. The other pages are copied from the images of the last export, kept in folder
+    or, without a folder, in memory. Pages are rendered and saved as set by the profile, see render_profile.RenderProfile.
+    """
+    def __init__(self, poppler_path: str, folder: str, profile: RenderProfile | None = None):
+        self.poppler_path: str = poppler_path
+        self.folder: str = os.path.abspath(folder) if folder else ''
+        self.profile: RenderProfile = profile or RenderProfile()
+        self.pages: Dict[int, Tuple[str, str | bytes]] = {}
+        self.paragraphs: List[str] = []
+        self.paragraph_pages: List[List[int]] = []
+
+    def changed_pages(self, hashes: List[str], paragraphs: List[str]) -> Set[int]:
+        pages = {index for index, digest in enumerate(hashes) if self.pages.get(index, ('', ''))[0] != digest}
+
+        for index, text in enumerate(paragraphs):
+            if index >= len(self.paragraphs) or text != self.paragraphs[index]:
+                pages.update(self.paragraph_pages[index] if index < len(self.paragraph_pages) else [])
+
+        return {page for page in pages if page < len(hashes)}
+
+    @staticmethod
+    def ranges(pages: Set[int], size: int) -> List[Tuple[int, int]]:
+        """ Groups the pages in runs of consecutive pages with at most size pages, as (first, last). """
+        result = []
+
+        for page in sorted(pages):
+            if result and result[-1][1] == page - 1 and page - result[-1][0] < size:
+                result[-1] = (result[-1][0], page)
+            else:
+                result.append((page, page))
+
+        return result
+
+    def page_hash(self, text: str) -> str:
+        """ The key of the content of a page: its text and the options of the profile that change its image. """
+        return hashlib.sha256(json.dumps([text, self.profile.key()], sort_keys=True).encode()).hexdigest()
+
+    def render(self, pdf_path: str | bytes, first: int, last: int) -> List[str | bytes]:
+        from pdf2image import convert_from_path, convert_from_bytes
+
+        options = {
+            **self.profile.convert_options(self.poppler_path),
+            'first_page': first + 1,
+            'last_page': last + 1,
+            'thread_count': min(self.profile.workers, last - first + 1),
+        }
+        if isinstance(pdf_path, bytes):
+            images = convert_from_bytes(pdf_path, **options)
+        else:
+            images = convert_from_path(pdf_path, **options)
+        rendered = []
+
+        for page, image in enumerate(images, start=first):
+            if self.folder:
+                path = os.path.join(self.folder, f'page-{page + 1:04d}{self.profile.ext}')
+                self.profile.save(image, path)
+                rendered.append(path)
+            else:
+                buffer = BytesIO()
+                self.profile.save(image, buffer)
+                rendered.append(buffer.getvalue())
+
+        return rendered
+
+    def export(self, pdf_path: str | bytes, output_folder: str, base_name: str, paragraphs: List[str]) -> List[str]:
+        """
+        Saves every page of the PDF in output_folder as <base_name>-<page> with the extension of the profile.
+
+        Parameters:
+        ----------
+        - pdf_path (str | bytes): The PDF of the filled form, or its bytes.
+        - output_folder (str): The folder where the images will be saved.
+        - base_name (str): The name of the images, without the page number.
+        - paragraphs (List[str]): The paragraphs of the filled form, compared with the last export.
+
+        Returns:
+        -------
+        - List[str]: The paths of the saved images.
+        """
+        if self.folder:
+            os.makedirs(self.folder, exist_ok=True)
+        os.makedirs(output_folder, exist_ok=True)
+
+        texts = page_texts(pdf_path)
+        hashes = [self.page_hash(text) for text in texts]
+
+        changed = self.changed_pages(hashes, paragraphs)
+        tracer.annotate(pages=len(hashes), rendered=len(changed))
+
+        for first, last in self.ranges(changed, self.profile.chunk_size):
+            for page, image in enumerate(self.render(pdf_path, first, last), start=first):
+                self.pages[page] = (hashes[page], image)
+
+        for page in [page for page in self.pages if page >= len(hashes)]:
+            del self.pages[page]
+
+        self.paragraphs = list(paragraphs)
+        self.paragraph_pages = map_paragraphs(paragraphs, texts)
+
+        width = len(str(len(hashes)))
+        images = []
+
+        for page in range(len(hashes)):
+            path = os.path.join(output_folder, f'{base_name}-{page + 1:0{width}d}{self.profile.ext}')
+            image = self.pages[page][1]
+
+            if isinstance(image, bytes):
+                with open(path, 'wb') as file:
+                    file.write(image)
+            else:
+                shutil.copy(image, path)
+            images.append(path)
+
+        return images
+
+    def clear(self) -> None:
+        if self.folder:
+            shutil.rmtree(self.folder, ignore_errors=True)
+        self.pages = {}
+        self.paragraphs = []
+        self.paragraph_pages = []
@@ -1,6 +1,10 @@
 from components import Main
+from document_manager import DocumentManager
 from flet import *
 
+import multiprocessing
+import os
+
 
 def main(main_page: Page):
     main_page.window_top = 0
@@ -9,8 +13,28 @@ def main(main_page: Page):
     main_page.theme_mode = ThemeMode.LIGHT
     main_page.title = 'Formulário de Documento'
     main_page.window_title_bar_buttons_hidden = True
-    main_page.add(Main(main_page))
+
+    # PDFs are filled as PDF, DOCUMENT_FORMS_PDF_MODE=docx converts them to Word like before
+    DocumentManager.native_pdf = os.environ.get('DOCUMENT_FORMS_PDF_MODE', 'native') != 'docx'
+    # In that mode, DOCUMENT_FORMS_FIRST_PAGES=<n> opens longer PDFs with their first n pages while the others convert
+    DocumentManager.first_pages = int(os.environ.get('DOCUMENT_FORMS_FIRST_PAGES', '0'))
+    # DOCUMENT_FORMS_IN_MEMORY=1 keeps the open document in memory, writing files only when exporting
+    main_page.add(Main(main_page, in_memory=os.environ.get('DOCUMENT_FORMS_IN_MEMORY', '0') == '1'))
+
+    # Removes the working files of closed sessions and released documents in the background.
+    # DOCUMENT_FORMS_WORKSPACE_QUOTA sets the most disk it may use, in MB.
+    if quota := os.environ.get('DOCUMENT_FORMS_WORKSPACE_QUOTA'):
+        DocumentManager.workspace.quota = int(quota) * 1024 ** 2
+    DocumentManager.workspace.start()
+
+    # The converters are imported on first use, warm them up now that the window is shown.
+    # DOCUMENT_FORMS_WARM_UP=0 disables it and DOCUMENT_FORMS_WARM_UP=all also starts the conversion backend.
+    warm_up = os.environ.get('DOCUMENT_FORMS_WARM_UP', '1')
+    if warm_up != '0':
+        DocumentManager.warm_up(backend=warm_up == 'all')
 
 
 if __name__ == '__main__':
+    # The conversion workers are started with spawn, also from the bundled executable
+    multiprocessing.freeze_support()
     app(name='Document Form', target=main, view=FLET_APP)
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from typing import Tuple
+from io import BytesIO
+
+import base64
+import os
+import tempfile
+import threading
+import weakref
+
+
+class PageRenderer:
+    """
+    Rasterizes single pages of a PDF on demand and keeps the last rendered pages in a bounded LRU cache.
+
+    Pages are returned as base64 encoded PNGs, ready to be used as Image(src_base64=...).
+    The PDF is read from pdf_path, or from pdf_bytes when given. poppler only reads files, so pdf_bytes
+    are written once to a temporary file, removed by close or when the renderer is garbage collected,
+    instead of once per rendered page like pdf2image.convert_from_bytes does.
+    """
+    def __init__(self, pdf_path: str, poppler_path: str, dpi: int = 150, thumbnail_dpi: int = 24, cache_size: int = 24,
+                 pdf_bytes: bytes = b''):
+        from pdf2image import pdfinfo_from_path
+
+        self.pdf_path: str = pdf_path
+        self.poppler_path: str = poppler_path
+        self.dpi: int = dpi
+        self.thumbnail_dpi: int = thumbnail_dpi
+        self.cache_size: int = cache_size
+        self._temp: weakref.finalize | None = None
+
+        if pdf_bytes:
+            handle, self.pdf_path = tempfile.mkstemp(prefix='document-forms-', suffix='.pdf')
+            with os.fdopen(handle, 'wb') as file:
+                file.write(pdf_bytes)
+            self._temp = weakref.finalize(self, remove_file, self.pdf_path)
+
+        self.page_count: int = pdfinfo_from_path(self.pdf_path, poppler_path=poppler_path)['Pages']
+        self._cache: OrderedDict[Tuple[int, int], str] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def cached(self, page: int, dpi: int) -> str | None:
+        with self._lock:
+            if (page, dpi) not in self._cache:
+                return None
+            self._cache.move_to_end((page, dpi))
+            return self._cache[(page, dpi)]
+
+    def render(self, page: int, dpi: int = 0) -> str:
+        """
+        Returns the page (starting from 1) rendered at the given dpi as a base64 encoded PNG.
+        """
+        dpi = dpi or self.dpi
+
+        if (encoded := self.cached(page, dpi)) is not None:
+            return encoded
+
+        from pdf2image import convert_from_path
+
+        image = convert_from_path(self.pdf_path, dpi=dpi, first_page=page, last_page=page, poppler_path=self.poppler_path)[0]
+        buffer = BytesIO()
+        image.save(buffer, format='PNG')
+        encoded = base64.b64encode(buffer.getvalue()).decode()
+
+        with self._lock:
+            self._cache[(page, dpi)] = encoded
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return encoded
+
+    def close(self) -> None:
+        """ Removes the temporary file of pdf_bytes, if any. """
+        if self._temp is not None:
+            self._temp()
+
+
+def remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,147 @@
+from concurrent.futures import ProcessPoolExecutor, Future, as_completed
+from typing import List, Tuple, Dict, Callable, BinaryIO, Any
+
+from render_profile import available_cores
+
+import multiprocessing
+import os
+import tempfile
+import threading
+
+
+# Worker processes shared by every conversion, started on first use, see shutdown_pool
+_pool: ProcessPoolExecutor | None = None
+_pool_lock: threading.Lock = threading.Lock()
+
+
+def _open(pdf: str | bytes):
+    from pdf2docx import Converter
+
+    return Converter(stream=pdf) if isinstance(pdf, bytes) else Converter(pdf_file=pdf)
+
+
+def page_count(pdf: str | bytes) -> int:
+    import fitz
+
+    with (fitz.open(stream=pdf, filetype='pdf') if isinstance(pdf, bytes) else fitz.open(pdf)) as document:
+        return document.page_count
+
+
+def chunks(start: int, end: int, size: int) -> List[Tuple[int, int]]:
+    """ Splits the pages from start to end (starting from 0, end excluded) in (start, end) chunks of size pages. """
+    return [(first, min(first + size, end)) for first in range(start, end, max(size, 1))]
+
+
+def parse_chunk(pdf: str | bytes, start: int, end: int, json_path: str, options: Dict[str, Any]) -> int:
+    """
+    Parses the pages from start to end and saves their layout in json_path, see pdf2docx Converter.serialize.
+    Runs in the worker processes. Returns the number of parsed pages.
+    """
+    cv = _open(pdf)
+
+    try:
+        cv.parse(start=start, end=end, **options)
+        cv.serialize(json_path)
+    finally:
+        cv.close()
+
+    return end - start
+
+
+def pool(workers: int) -> ProcessPoolExecutor:
+    """ The shared worker pool, created with workers processes on first use. """
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            # spawn, like the conversion backend: the UI process has threads running
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def convert_pages(pdf: str | bytes, docx: str | BinaryIO, start: int = 0, end: int | None = None, workers: int = 0, chunk_size: int = 4,
+            on_progress: Callable[[int, int], None] | None = None, **options) -> int:
+    """
+    Converts the pages from start to end (starting from 0, end excluded) of a PDF to Word.
+
+    The pages are split in chunks of chunk_size pages parsed by a shared pool of worker processes, and the
+    parsed chunks are merged into a single Word file, like the multi_processing option of pdf2docx does.
+    That option is used directly when it works: for a PDF file, not bytes, without on_progress,
+    since it reports nothing until every page is parsed. Documents of a single chunk are converted
+    in this process.
+
+    Like with the multi_processing option, each chunk is parsed on its own, so layouts spanning chunks,
+    e.g. a table continued on the next page, may be split differently than in a serial conversion.
+
+    Parameters:
+    ----------
+    - pdf (str | bytes): The PDF file, or its bytes.
+    - docx (str | BinaryIO): The Word file to write, or a buffer.
+    - workers (int): How many chunks are parsed at the same time, the available cores by default.
+    - on_progress (Callable[[int, int], None]): Called with the number of parsed pages and the total
+      every time a chunk is parsed.
+    - options: pdf2docx conversion settings.
+
+    Returns:
+    -------
+    - int: The number of converted pages.
+    """
+    workers = workers or available_cores()
+    count = page_count(pdf)
+    end = count if end is None else min(end, count)
+    parts = chunks(start, end, chunk_size)
+    total = end - start
+    cv = _open(pdf)
+
+    try:
+        if len(parts) <= 1 or workers <= 1:
+            cv.convert(docx_filename=docx, start=start, end=end, **options)
+        elif isinstance(pdf, str) and on_progress is None:
+            cv.convert(docx_filename=docx, start=start, end=end, multi_processing=True, cpu_count=workers, **options)
+        else:
+            convert_chunks(cv, pdf, docx, parts, workers, on_progress, options)
+            return total
+    finally:
+        cv.close()
+
+    if on_progress and total:
+        on_progress(total, total)
+
+    return total
+
+
+def convert_chunks(cv, pdf: str | bytes, docx: str | BinaryIO, parts: List[Tuple[int, int]], workers: int,
+                   on_progress: Callable[[int, int], None] | None, options: Dict[str, Any]) -> None:
+    """ Parses the chunks in the worker pool, then merges them into the Word file with the converter cv. """
+    total = sum(end - start for start, end in parts)
+
+    with tempfile.TemporaryDirectory(prefix='document-forms-pdf2docx-') as folder:
+        paths = [os.path.join(folder, f'pages-{index:04d}.json') for index in range(len(parts))]
+        futures: List[Future] = [
+            pool(workers).submit(parse_chunk, pdf, start, end, path, options)
+            for (start, end), path in zip(parts, paths)
+        ]
+        parsed = 0
+
+        try:
+            for future in as_completed(futures):
+                parsed += future.result()
+                if on_progress:
+                    on_progress(parsed, total)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+        for path in paths:
+            cv.deserialize(path)
+        cv.make_docx(docx, **options)
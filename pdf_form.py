@@ -0,0 +1,210 @@
+from typing import List, Tuple, Dict, Iterator, NamedTuple, BinaryIO, Any
+
+from form_tokenizer import SpanKind
+from form_fields import fill_value
+
+
+# Fields overlaid on the page are written with a base 14 font, which every PDF reader has
+FONT = 'helv'
+# How much a text may be condensed horizontally to fit its field before it overflows, see fit_text
+MIN_CONDENSE = 0.85
+
+
+class PdfChar(NamedTuple):
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    baseline: float
+    size: float
+    color: int
+
+
+class PdfLine(NamedTuple):
+    page: int
+    index: int
+    text: str
+    align: str
+    chars: List[PdfChar]
+    limit: float
+
+
+def _open(pdf: str | bytes):
+    import fitz
+
+    return fitz.open(stream=pdf, filetype='pdf') if isinstance(pdf, bytes) else fitz.open(pdf)
+
+
+def line_alignment(x0: float, x1: float, left: float, right: float) -> str:
+    """
+    Guesses the alignment of a line from its margins inside the text area of the page (left to right),
+    with the same names as docx_stream.ALIGNMENTS.
+    """
+    width = right - left
+    before, after = x0 - left, right - x1
+
+    if before > width * 0.1 and abs(before - after) < width * 0.05:
+        return 'CENTER'
+    if before > width * 0.3 and after < width * 0.05:
+        return 'RIGHT'
+    return 'LEFT'
+
+
+def iter_lines(pdf: str | bytes, pages: Tuple[int, int] | None = None) -> Iterator[PdfLine]:
+    """
+    Streams the text lines of a PDF with the box of every character, in reading order, page by page.
+
+    Every line is a row of the form: the field rules of form_tokenizer run on its text and the boxes
+    of the characters of a field give its position on the page (see field_box).
+
+    Parameters:
+    ----------
+    - pdf (str | bytes): The PDF file, or its bytes.
+    - pages (Tuple[int, int] | None): The first and last pages to read, starting from 1. Every page by default.
+    """
+    with _open(pdf) as document:
+        first, last = (pages[0] - 1, min(pages[1], document.page_count)) if pages else (0, document.page_count)
+
+        for number in range(first, last):
+            page = document[number]
+            lines = []
+
+            for block in page.get_text('rawdict', sort=True)['blocks']:
+                for line in block.get('lines', []):
+                    chars = [
+                        PdfChar(*char['bbox'], char['origin'][1], span['size'], span['color'])
+                        for span in line['spans']
+                        for char in span['chars']
+                    ]
+                    text = ''.join(char['c'] for span in line['spans'] for char in span['chars'])
+
+                    if text.strip():
+                        lines.append((text, chars))
+
+            if not lines:
+                continue
+
+            # The text area is taken as symmetric, from the leftmost line to the same margin on the right
+            left = min(chars[0].x0 for _, chars in lines)
+            right = max(page.rect.x1 - (left - page.rect.x0), max(chars[-1].x1 for _, chars in lines))
+
+            for index, (text, chars) in enumerate(lines):
+                yield PdfLine(number, index, text, line_alignment(chars[0].x0, chars[-1].x1, left, right), chars, right)
+
+
+def field_box(line: PdfLine, start: int, end: int) -> Dict[str, Any]:
+    """
+    Returns where the characters from start to end of a line are on the page, saved in the fields
+    of a PDF form (see form_template.FormTemplate.compile_pdf): the page, rectangle, baseline, font size
+    and color of the field, and limit, how far right its new text can go before the next text of the line.
+    """
+    chars = line.chars[start:end]
+    following = [char.x0 for char, text in zip(line.chars[end:], line.text[end:]) if not text.isspace()]
+
+    return {
+        'page': line.page,
+        'rect': [min(char.x0 for char in chars), min(char.y0 for char in chars), max(char.x1 for char in chars), max(char.y1 for char in chars)],
+        'baseline': chars[0].baseline,
+        'size': chars[0].size,
+        'color': chars[0].color,
+        'limit': following[0] if following else line.limit,
+    }
+
+
+def changed_fields(fields: List[Dict[str, Any]], values: Dict[int, Any]) -> Dict[int, List[Tuple[Dict[str, Any], str]]]:
+    """ Returns the fields whose text changes with values (by field index) and their new text, by page. """
+    changes = {}
+
+    for field in fields:
+        if field['index'] not in values:
+            continue
+
+        text = fill_value(SpanKind(field['kind']), field['value'], values[field['index']])
+
+        if text != field['value']:
+            changes.setdefault(field['page'], []).append((field, text))
+
+    return changes
+
+
+def fit_text(field: Dict[str, Any], text: str) -> List[Tuple[float, str, float]]:
+    """
+    Lays out the new text of a field at its original font size, starting where the field starts.
+
+    Checkboxes keep their parentheses where they were and the mark is centered between them. Other text
+    is condensed horizontally, down to MIN_CONDENSE and keeping the height of its letters, to end before
+    the next text of the line (or the end of the field, if further). Past that it overflows to the right
+    instead of being shrunk.
+
+    Returns:
+    -------
+    - List[Tuple[float, str, float]]: The x position, text and horizontal scale (1 when not condensed) of each piece.
+    """
+    import fitz
+
+    size = field['size']
+    x0, _, x1, _ = field['rect']
+
+    if SpanKind(field['kind']) is SpanKind.CHECKBOX:
+        mark = text.strip('()').strip()
+        right = x1 - fitz.get_text_length(')', fontname=FONT, fontsize=size)
+        pieces = [(x0, '(', 1.0), (max(right, x0), ')', 1.0)]
+        if mark:
+            center = (x0 + x1 - fitz.get_text_length(mark, fontname=FONT, fontsize=size)) / 2
+            pieces.append((center, mark, 1.0))
+        return pieces
+
+    room = max(field['limit'], x1) - x0
+    width = fitz.get_text_length(text, fontname=FONT, fontsize=size)
+
+    if width <= room:
+        return [(x0, text, 1.0)]
+    return [(x0, text, max(room / width, MIN_CONDENSE))]
+
+
+def overlay_fields(pdf: str | bytes, dst: str | BinaryIO, fields: List[Dict[str, Any]], values: Dict[int, Any]) -> int:
+    """
+    Writes the values (by field index) over the fields of a PDF form and saves it in dst.
+
+    The original text of every changed field is removed from the page, keeping the images and lines
+    around it, and the new text is written at its baseline with its original font size and color,
+    see fit_text. The rest of the page is not touched.
+
+    Returns:
+    -------
+    - int: The number of changed fields.
+    """
+    import fitz
+
+    changes = changed_fields(fields, values)
+    options = {'images': fitz.PDF_REDACT_IMAGE_NONE}
+
+    if hasattr(fitz, 'PDF_REDACT_LINE_ART_NONE'):
+        # Table borders and underlines touching a field stay on the page
+        options['graphics'] = fitz.PDF_REDACT_LINE_ART_NONE
+
+    with _open(pdf) as document:
+        for number, items in changes.items():
+            page = document[number]
+
+            for field, _ in items:
+                x0, y0, x1, y1 = field['rect']
+                # Slightly inside the field, so the characters next to it are kept
+                page.add_redact_annot(fitz.Rect(x0 + 0.5, y0, x1 - 0.5, y1), fill=False)
+            page.apply_redactions(**options)
+
+            for field, text in items:
+                for x, piece, scale in fit_text(field, text):
+                    point = fitz.Point(x, field['baseline'])
+                    page.insert_text(
+                        point,
+                        piece,
+                        fontsize=field['size'],
+                        fontname=FONT,
+                        color=fitz.sRGB_to_pdf(field['color']),
+                        morph=(point, fitz.Matrix(scale, 1)) if scale < 1 else None,
+                    )
+
+        document.save(dst, garbage=3, deflate=True)
+
+    return sum(len(items) for items in changes.values())
@@ -0,0 +1,87 @@
+from typing import List, Dict, Tuple, Any, BinaryIO
+
+import os
+
+
+class RenderProfile:
+    """
+    How the pages of a PDF are rasterized by DocumentManager.pdf2images.
+
+    Pages are rendered by poppler in chunks of chunk_size pages, with up to workers chunks at a time,
+    and saved as soon as their chunk is done. Only the chunks in flight are held in memory and in the
+    temporary folder of poppler, so long documents never load every page at once.
+
+    Parameters:
+    ----------
+    - dpi (int): The render resolution.
+    - fmt (str): 'png', 'jpeg' or 'webp'.
+    - grayscale (bool): Renders the pages in shades of gray, smaller files for text forms.
+    - quality (int): The JPEG and WebP quality, from 1 to 100. PNG is always lossless.
+    - max_size (int): The largest width or height of a page, in pixels. Larger pages are scaled down, 0 keeps the dpi size.
+    - workers (int): How many chunks are rendered at the same time, the number of available cores by default.
+    - chunk_size (int): How many pages each poppler call renders.
+    """
+    FORMATS: Dict[str, Tuple[str, str]] = {
+        'png': ('PNG', '.png'),
+        'jpeg': ('JPEG', '.jpg'),
+        'webp': ('WEBP', '.webp'),
+    }
+
+    def __init__(self, dpi: int = 200, fmt: str = 'png', grayscale: bool = False, quality: int = 90, max_size: int = 0,
+                 workers: int = 0, chunk_size: int = 4):
+        fmt = fmt.lower().replace('jpg', 'jpeg')
+
+        if fmt not in self.FORMATS:
+            raise ValueError(f'Unknown image format "{fmt}", use one of {list(self.FORMATS)}')
+
+        self.dpi: int = dpi
+        self.fmt: str = fmt
+        self.grayscale: bool = grayscale
+        self.quality: int = min(max(quality, 1), 100)
+        self.max_size: int = max_size
+        self.workers: int = workers or available_cores()
+        self.chunk_size: int = max(chunk_size, 1)
+
+    @property
+    def ext(self) -> str:
+        return self.FORMATS[self.fmt][1]
+
+    def key(self) -> Dict[str, Any]:
+        """ The options that change the rendered images, e.g. for a cache key. """
+        return {'dpi': self.dpi, 'fmt': self.fmt, 'grayscale': self.grayscale, 'quality': self.quality, 'max_size': self.max_size}
+
+    def convert_options(self, poppler_path: str) -> Dict[str, Any]:
+        """
+        The pdf2image options of a chunk, without the page range. Pages are returned as PPM images,
+        the cheapest format for poppler to write, and encoded by save.
+        """
+        return {
+            'dpi': self.dpi,
+            'grayscale': self.grayscale,
+            'thread_count': 1,
+            'poppler_path': poppler_path,
+        }
+
+    def chunks(self, first: int, last: int) -> List[Tuple[int, int]]:
+        """ Splits the pages from first to last (starting from 1, inclusive) in (first, last) chunks. """
+        return [(start, min(start + self.chunk_size - 1, last)) for start in range(first, last + 1, self.chunk_size)]
+
+    def save(self, image, path: str | BinaryIO) -> None:
+        """ Saves a rendered page (a PIL image) to a path or a file with the format, quality and size of the profile. """
+        if self.max_size and max(image.size) > self.max_size:
+            image.thumbnail((self.max_size, self.max_size))
+
+        image_format = self.FORMATS[self.fmt][0]
+
+        if image_format == 'PNG':
+            image.save(path, format=image_format, compress_level=6)
+        else:
+            image.save(path, format=image_format, quality=self.quality)
+
+
+def available_cores() -> int:
+    """ The cores this process may run on, which may be fewer than os.cpu_count in containers. """
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except AttributeError:
+        return os.cpu_count() or 1
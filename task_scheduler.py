@@ -0,0 +1,188 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Callable, Any
+from enum import Enum
+from tracing import tracer
+
+import os
+import threading
+
+
+class StageStatus(Enum):
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    CANCELLED = 'CANCELLED'
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable[['Job'], Any], depends: List[str] = None, title: str = ''):
+        """
+        Parameters:
+        ----------
+        - name (str): Unique name of the stage inside the job, used by depends.
+        - func (Callable[[Job], Any]): The work, called with the job. Its return value is kept in job.results[name].
+        - depends (List[str]): The stages that must finish before this one starts.
+        - title (str): The text shown to the user while the stage runs.
+        """
+        self.name: str = name
+        self.func: Callable[['Job'], Any] = func
+        self.depends: List[str] = depends or []
+        self.title: str = title or name
+        self.status: StageStatus = StageStatus.PENDING
+        self.progress: float = 0.0
+        self.detail: str = ''
+
+
+class Job:
+    """
+    A set of stages run by the TaskScheduler. Independent stages run concurrently.
+
+    Cancelling is cooperative: running stages finish, but no other stage starts and on_done is not called.
+    Long stages may call job.check() between steps to stop earlier. A failed stage cancels the job.
+    Once a cancelled job has no running stage left, on_cancel is called, e.g. to remove temporary files,
+    or on_error instead when a stage failed, with the first error (also kept in job.error).
+    An exception raised by on_done is passed to on_error too.
+    Every stage is timed by the tracer as "<job name>.<stage name>".
+    """
+    def __init__(self, stages: List[Stage],
+                 on_progress: Callable[['Job', Stage], None] = None,
+                 on_done: Callable[['Job'], None] = None,
+                 on_error: Callable[['Job', Exception], None] = None,
+                 on_cancel: Callable[['Job'], None] = None,
+                 name: str = ''):
+        self.name: str = name
+        self.stages: Dict[str, Stage] = {stage.name: stage for stage in stages}
+        self.results: Dict[str, Any] = {}
+        self.on_progress: Callable[['Job', Stage], None] = on_progress or (lambda job, stage: None)
+        self.on_done: Callable[['Job'], None] = on_done or (lambda job: None)
+        self.on_error: Callable[['Job', Exception], None] = on_error or (lambda job, error: None)
+        self.on_cancel: Callable[['Job'], None] = on_cancel or (lambda job: None)
+        self.error: Exception | None = None
+        self.finished: threading.Event = threading.Event()
+        self._cancelled: threading.Event = threading.Event()
+        self._lock: threading.Lock = threading.Lock()
+
+        for stage in stages:
+            missing = [name for name in stage.depends if name not in self.stages]
+            if missing:
+                raise ValueError(f'Stage "{stage.name}" depends on unknown stages {missing}')
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def progress(self) -> float:
+        """ Fraction of the stages already finished, with the progress reported by running ones, between 0 and 1. """
+        done = sum(
+            1.0 if stage.status is StageStatus.DONE else stage.progress if stage.status is StageStatus.RUNNING else 0.0
+            for stage in self.stages.values()
+        )
+        return done / len(self.stages) if self.stages else 1.0
+
+    def report(self, name: str, progress: float, detail: str = '') -> None:
+        """
+        Reports the progress of a running stage, between 0 and 1, e.g. pages converted so far, and calls on_progress.
+        Raises JobCancelled if the job was cancelled, so long stages stop at their next report.
+        """
+        stage = self.stages[name]
+        stage.progress = progress
+        stage.detail = detail
+        self.on_progress(self, stage)
+        self.check()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def check(self) -> None:
+        """ Raises JobCancelled if the job was cancelled. """
+        if self.cancelled:
+            raise JobCancelled()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self.finished.wait(timeout)
+
+
+class TaskScheduler:
+    """
+    Runs jobs on a shared worker pool, starting each stage as soon as the stages it depends on are done.
+    """
+    def __init__(self, max_workers: int = 0):
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 4)
+
+    def submit(self, job: Job) -> Job:
+        self._start_ready(job)
+        return job
+
+    def _start_ready(self, job: Job) -> None:
+        if job.cancelled:
+            self._stop(job)
+            return
+
+        with job._lock:
+            if job.finished.is_set():
+                return
+
+            done = all(stage.status is StageStatus.DONE for stage in job.stages.values())
+            if done:
+                job.finished.set()
+
+            for stage in job.stages.values():
+                if stage.status is StageStatus.PENDING and all(job.stages[name].status is StageStatus.DONE for name in stage.depends):
+                    stage.status = StageStatus.RUNNING
+                    self.executor.submit(self._run, job, stage)
+
+        if done:
+            try:
+                job.on_done(job)
+            except Exception as error:
+                job.error = error
+                job.on_error(job, error)
+
+    def _run(self, job: Job, stage: Stage) -> None:
+        job.on_progress(job, stage)
+
+        try:
+            job.check()
+            with tracer.span(f'{job.name}.{stage.name}' if job.name else stage.name, category=job.name or 'job'):
+                job.results[stage.name] = stage.func(job)
+            job.check()
+            stage.status = StageStatus.DONE
+        except JobCancelled:
+            stage.status = StageStatus.CANCELLED
+        except Exception as error:
+            stage.status = StageStatus.FAILED
+            with job._lock:
+                job.error = job.error or error
+            job.cancel()
+
+        job.on_progress(job, stage)
+        self._start_ready(job)
+
+    @staticmethod
+    def _stop(job: Job) -> None:
+        """
+        Finishes a cancelled or failed job once every running stage returned, then calls on_cancel,
+        or on_error if a stage failed.
+        """
+        with job._lock:
+            if job.finished.is_set() or any(stage.status is StageStatus.RUNNING for stage in job.stages.values()):
+                return
+
+            for stage in job.stages.values():
+                if stage.status is StageStatus.PENDING:
+                    stage.status = StageStatus.CANCELLED
+            job.finished.set()
+
+        if job.error is not None:
+            job.on_error(job, job.error)
+        else:
+            job.on_cancel(job)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
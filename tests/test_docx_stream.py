@@ -0,0 +1,69 @@
+from io import BytesIO
+from unittest import mock
+
+import os
+import sys
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import docx_stream
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+DOCUMENT = (
+    f'<w:document xmlns:w="{W_NS}"><w:body>'
+    '<w:p><w:r><w:t xml:space="preserve">Nome: João</w:t></w:r></w:p>'
+    '<w:p><w:r><w:t xml:space="preserve">Data ____</w:t></w:r></w:p>'
+    '</w:body></w:document>'
+)
+
+
+def make_docx() -> bytes:
+    """ A minimal .docx with a stored member, a deflated one and one written with a data descriptor. """
+    buffer = BytesIO()
+
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as package:
+        package.writestr('[Content_Types].xml', '<Types/>', compress_type=zipfile.ZIP_STORED)
+        package.writestr('word/document.xml', DOCUMENT)
+        with package.open('word/media/image1.bin', 'w') as member:
+            member.write(os.urandom(64 * 1024))
+
+    return buffer.getvalue()
+
+
+class PatchParagraphsTest(unittest.TestCase):
+    def round_trip(self) -> bytes:
+        source = make_docx()
+        target = BytesIO()
+        docx_stream.patch_paragraphs(BytesIO(source), target, ['Nome: Maria', 'Data ____'])
+
+        with zipfile.ZipFile(BytesIO(source)) as original, zipfile.ZipFile(target) as saved:
+            self.assertIsNone(saved.testzip())
+            self.assertEqual(original.namelist(), saved.namelist())
+            self.assertEqual(original.read('word/media/image1.bin'), saved.read('word/media/image1.bin'))
+
+        return target.getvalue()
+
+    def test_round_trip(self):
+        with mock.patch.object(docx_stream, 'copy_stream', wraps=docx_stream.copy_stream) as copy_stream:
+            saved = self.round_trip()
+
+        # Every unchanged member was copied raw
+        self.assertFalse(copy_stream.called)
+        self.assertEqual([text for text, _ in docx_stream.iter_paragraphs(BytesIO(saved))], ['Nome: Maria', 'Data ____'])
+
+    def test_falls_back_to_stream_copy(self):
+        def copy_raw(package, output, info):
+            # As if the private internals of zipfile changed after the local header was written
+            output.fp.write(b'partial local header')
+            raise AttributeError('_didModify')
+
+        with mock.patch.object(docx_stream, 'copy_raw', side_effect=copy_raw):
+            with mock.patch.object(docx_stream, 'copy_stream', wraps=docx_stream.copy_stream) as copy_stream:
+                self.round_trip()
+
+        self.assertEqual(copy_stream.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+from typing import List, Dict, Tuple, Any
+from contextlib import contextmanager
+
+import json
+import os
+import threading
+import time
+
+
+class Span:
+    """ A timed stage, stored as a Chrome trace complete event ("ph": "X"). """
+    __slots__ = ('name', 'category', 'start', 'duration', 'thread', 'args')
+
+    def __init__(self, name: str, category: str, args: Dict[str, Any]):
+        self.name: str = name
+        self.category: str = category
+        self.start: float = time.perf_counter()
+        self.duration: float = 0.0
+        self.thread: int = threading.get_ident()
+        self.args: Dict[str, Any] = args
+
+    def event(self, origin: float) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'cat': self.category,
+            'ph': 'X',
+            'ts': (self.start - origin) * 1e6,
+            'dur': self.duration * 1e6,
+            'pid': os.getpid(),
+            'tid': self.thread,
+            'args': self.args,
+        }
+
+
+class Tracer:
+    """
+    Records timed spans of the stages of opening and saving documents, with their inputs
+    (file size, page, paragraph and field counts), and exports them as a Chrome trace
+    (chrome://tracing or https://ui.perfetto.dev).
+
+    When disabled, span returns a shared context manager that does nothing, so instrumented code
+    only pays for one attribute check. Set DOCUMENT_FORMS_TRACE=1 to enable it at startup.
+    """
+    def __init__(self, enabled: bool = False, max_spans: int = 100_000):
+        self.enabled: bool = enabled
+        self.max_spans: int = max_spans
+        self.spans: List[Span] = []
+        self.origin: float = time.perf_counter()
+        self._local: threading.local = threading.local()
+        self._lock: threading.Lock = threading.Lock()
+
+    @contextmanager
+    def _span(self, name: str, category: str, args: Dict[str, Any]):
+        span = Span(name, category, args)
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(span)
+
+        try:
+            yield span
+        finally:
+            span.duration = time.perf_counter() - span.start
+            stack.pop()
+
+            with self._lock:
+                self.spans.append(span)
+                if len(self.spans) > self.max_spans:
+                    del self.spans[:len(self.spans) - self.max_spans]
+
+    def span(self, name: str, category: str = 'stage', **args):
+        """
+        Times the code inside a with block.
+
+        Example:
+        -------
+            with tracer.span('pdf2images', file_size=size):
+                ...
+        """
+        if not self.enabled:
+            return _NO_SPAN
+        return self._span(name, category, args)
+
+    def annotate(self, **args) -> None:
+        """ Adds inputs to the innermost open span of the current thread, e.g. a page count only known at the end. """
+        if not self.enabled:
+            return
+
+        stack = getattr(self._local, 'stack', None)
+        if stack:
+            stack[-1].args.update(args)
+
+    def summary(self) -> List[Tuple[str, int, float, float]]:
+        """
+        Returns (name, count, total seconds, max seconds) for every span name, slowest total first.
+        """
+        totals = {}
+
+        with self._lock:
+            spans = list(self.spans)
+
+        for span in spans:
+            count, total, longest = totals.get(span.name, (0, 0.0, 0.0))
+            totals[span.name] = (count + 1, total + span.duration, max(longest, span.duration))
+
+        return sorted(((name, *values) for name, values in totals.items()), key=lambda item: item[2], reverse=True)
+
+    def export(self, path: str) -> str:
+        """ Saves the spans as a Chrome trace JSON file and returns its path. """
+        with self._lock:
+            events = [span.event(self.origin) for span in self.spans]
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file, default=str)
+
+        return path
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans = []
+
+
+class _NoSpan:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *_) -> bool:
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+tracer = Tracer(enabled=os.environ.get('DOCUMENT_FORMS_TRACE') == '1')
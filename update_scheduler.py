@@ -0,0 +1,56 @@
+from typing import Dict
+from flet import Page, Control
+
+import threading
+
+
+class UpdateScheduler:
+    """
+    Batches control updates and sends them to the Flet client at most once per interval.
+
+    Instead of calling control.update() or page.update() right away, callers mark the controls as dirty.
+    The first mark starts a timer, and when it fires every dirty control is sent in a single page.update,
+    so fast typing or bulk changes to many fields cost one round trip per interval.
+    """
+    def __init__(self, page: Page, interval: float = 1 / 30):
+        self.page: Page = page
+        self.interval: float = interval
+        self._dirty: Dict[int, Control] = {}
+        self._page_dirty: bool = False
+        self._timer: threading.Timer | None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def mark(self, *controls: Control) -> None:
+        """ Schedules the update of the controls. Without controls, the whole page is updated. """
+        with self._lock:
+            if controls:
+                for control in controls:
+                    self._dirty[id(control)] = control
+            else:
+                self._page_dirty = True
+
+            if self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """ Sends the pending updates now. """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            controls = list(self._dirty.values())
+            page_dirty = self._page_dirty
+            self._dirty.clear()
+            self._page_dirty = False
+
+        if page_dirty:
+            self.page.update()
+            return
+
+        # Controls removed from the page since they were marked, e.g. recycled rows, are skipped
+        controls = [control for control in controls if control.page]
+        if controls:
+            self.page.update(*controls)
@@ -0,0 +1,192 @@
+from typing import List, Set, Dict
+
+import errno
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+
+class Workspace:
+    """
+    The folders of the working files of the app (copied inputs, conversions, filled copies and images).
+
+    Every session, a running app, gets its own folder under root, and every document inside it a folder of
+    its own (see lease), so files with the same name never overwrite each other. Folders are not removed
+    when they are released but by a sweep, run in the background by start:
+
+    - the folders of this session that were released;
+    - the whole folder of other sessions that were closed, or stopped writing their heartbeat stale_after
+      seconds ago, e.g. after a crash;
+    - the legacy folders, shared by every session before there was a workspace.
+
+    After the sweep the workspace must fit in quota bytes, otherwise new folders are refused with ENOSPC
+    until enough is released, so the disk use of a long running kiosk stays bounded.
+    """
+    MARKER = 'session.json'
+
+    def __init__(self, root: str = './_internal/.sessions/', quota: int = 2 * 1024 ** 3, interval: float = 60,
+                 stale_after: float = 600, legacy: List[str] = None):
+        self.root: str = os.path.abspath(root)
+        self.quota: int = quota
+        self.interval: float = interval
+        self.stale_after: float = stale_after
+        self.legacy: List[str] = [os.path.abspath(folder) for folder in legacy or []]
+        self.session: str = f'{int(time.time())}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self.path: str = os.path.join(self.root, self.session)
+        self.leases: Set[str] = set()
+        self.usage: int = 0
+        self._counter: itertools.count = itertools.count(1)
+        self._lock: threading.Lock = threading.Lock()
+        self._wake: threading.Event = threading.Event()
+        self._stop: threading.Event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def lease(self) -> str:
+        """
+        Returns a new folder of this session for the working files of a document. It is created by the first
+        file written to it and removed by the sweep after release.
+
+        Raises:
+        ------
+        - OSError: ENOSPC when the workspace does not fit in the quota even after a sweep.
+        """
+        if self.usage > self.quota:
+            self.sweep()
+            if self.usage > self.quota:
+                raise OSError(errno.ENOSPC, f'A pasta de trabalho passou do limite de {self.quota // 1024 ** 2} MB', self.root)
+
+        with self._lock:
+            if not os.path.isfile(os.path.join(self.path, self.MARKER)):
+                self.write_marker(closed=False)
+
+            name = f'{next(self._counter):04d}'
+            self.leases.add(name)
+
+        return os.path.join(self.path, name)
+
+    def release(self, folder: str) -> None:
+        """ Gives a folder back, to be removed by the next sweep, which is started right away. """
+        with self._lock:
+            self.leases.discard(os.path.basename(os.path.normpath(folder)))
+        self._wake.set()
+
+    def write_marker(self, closed: bool) -> None:
+        """ Writes the marker of the session, whose modification time is also its heartbeat. """
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, self.MARKER), 'w', encoding='utf-8') as file:
+                json.dump({'pid': os.getpid(), 'started': self.session.split('-')[0], 'closed': closed}, file)
+        except OSError:
+            pass
+
+    def is_stale(self, path: str) -> bool:
+        """ Whether the folder of another session can be removed: the session was closed or stopped its heartbeat. """
+        marker = os.path.join(path, self.MARKER)
+
+        try:
+            with open(marker, encoding='utf-8') as file:
+                if json.load(file).get('closed'):
+                    return True
+            return time.time() - os.path.getmtime(marker) > self.stale_after
+        except (OSError, ValueError):
+            try:
+                # Without a marker, e.g. the session crashed while creating its folder
+                return time.time() - os.path.getmtime(path) > self.stale_after
+            except OSError:
+                return False
+
+    def sweep(self) -> Dict[str, int]:
+        """
+        Removes the folders no session uses and measures the workspace, see usage.
+
+        Returns:
+        -------
+        - Dict[str, int]: The number of removed folders and the bytes used by the workspace after the sweep.
+        """
+        removed = []
+
+        for folder in self.legacy:
+            if os.path.isdir(folder):
+                removed.append(folder)
+        self.legacy = []
+
+        try:
+            sessions = os.listdir(self.root)
+        except OSError:
+            sessions = []
+
+        for name in sessions:
+            path = os.path.join(self.root, name)
+
+            if name != self.session:
+                if self.is_stale(path):
+                    removed.append(path)
+                continue
+
+            try:
+                os.utime(os.path.join(path, self.MARKER))
+            except OSError:
+                pass
+
+            # Listed under the lock: every folder of this session on disk is then either leased or released
+            with self._lock:
+                try:
+                    released = [child for child in os.listdir(path) if child != self.MARKER and child not in self.leases]
+                except OSError:
+                    released = []
+            removed.extend(os.path.join(path, child) for child in released)
+
+        for path in removed:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        self.usage = folder_size(self.root)
+        return {'removed': len(removed), 'usage': self.usage}
+
+    def start(self) -> threading.Thread:
+        """ Sweeps in a daemon thread every interval seconds, and right after a folder is released. """
+        def run() -> None:
+            while not self._stop.is_set():
+                self.sweep()
+                self._wake.wait(self.interval)
+                self._wake.clear()
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=run, name='workspace-sweep', daemon=True)
+            self._thread.start()
+
+        return self._thread
+
+    def close(self) -> None:
+        """
+        Stops the sweep and marks the session as closed, without removing anything: its folder is removed
+        by the sweep of the next session.
+        """
+        self._stop.set()
+        self._wake.set()
+
+        with self._lock:
+            if os.path.isdir(self.path):
+                self.write_marker(closed=True)
+
+
+def folder_size(path: str) -> int:
+    total = 0
+
+    for folder, _, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(folder, file))
+            except OSError:
+                pass
+
+    return total